@@ -0,0 +1,142 @@
+"""
+EcoCode AI streaming
+Incremental parsing of a JSON answer that arrives from the model in pieces
+"""
+
+import json
+from typing import Optional, Dict, Any, List, Tuple
+
+JSON_FENCE = "```json"
+
+# (event, payload) pairs produced by StreamingJSONParser.feed
+Event = Tuple[str, Dict[str, Any]]
+
+
+class StreamingJSONParser:
+    """
+    Finds the JSON object in model output fed piece by piece, either in a
+    ```json fence or as the whole answer, and reports its parts as soon
+    as they are complete: every element of a top-level array as an
+    ("item", {"field", "index", "value"}) event and every top-level value
+    as a ("field", {"field", "value"}) event. Each character is examined
+    once, however the output is split.
+
+    This only drives early events; the final result should still come
+    from parsing the complete text.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.start: Optional[int] = None  # index of the opening brace
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._value_is_array = False
+        self._element_start: Optional[int] = None
+        self._index = 0
+
+    def feed(self, text: str) -> List[Event]:
+        """Add the next piece of output; returns the events it completes"""
+        self.buffer += text
+        if self.done:
+            return []
+        if self.start is None:
+            self.start = self._find_start()
+            if self.start is None:
+                return []
+            self._pos = self.start
+        return self._scan()
+
+    def _find_start(self) -> Optional[int]:
+        fence = self.buffer.find(JSON_FENCE)
+        if fence != -1:
+            brace = self.buffer.find("{", fence + len(JSON_FENCE))
+            return brace if brace != -1 else None
+        stripped = self.buffer.lstrip()
+        if stripped.startswith("{"):
+            return len(self.buffer) - len(stripped)
+        return None
+
+    def _scan(self) -> List[Event]:
+        events: List[Event] = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._key = self._decode(self._string_start, i + 1)
+                continue
+
+            if char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_is_array:
+                    self._end_element(i, events)
+                elif self._depth == 0:
+                    self._end_value(i, events)
+                    self.done = True
+                    self._pos = i + 1
+                    return events
+            elif char == ",":
+                if self._depth == 1:
+                    self._end_value(i, events)
+                    self._expect_key = True
+                elif self._depth == 2 and self._value_is_array:
+                    self._end_element(i, events)
+            elif char == ":" and self._depth == 1:
+                self._expect_key = False
+            elif not char.isspace():
+                self._begin(i, char)
+                if char in "{[":
+                    self._depth += 1
+                    if self._depth == 1:
+                        self._expect_key = True
+                elif char == '"':
+                    self._in_string = True
+                    self._string_start = i
+        self._pos = len(buffer)
+        return events
+
+    def _begin(self, i: int, char: str):
+        """Note where a top-level value or an element of a top-level array starts"""
+        if self._depth == 1 and not self._expect_key and self._value_start is None:
+            self._value_start = i
+            self._value_is_array = char == "["
+            self._index = 0
+        elif self._depth == 2 and self._value_is_array and self._element_start is None:
+            self._element_start = i
+
+    def _end_element(self, end: int, events: List[Event]):
+        if self._element_start is not None:
+            value = self._decode(self._element_start, end)
+            if value is not None:
+                events.append(("item", {"field": self._key, "index": self._index, "value": value}))
+            self._index += 1
+            self._element_start = None
+
+    def _end_value(self, end: int, events: List[Event]):
+        if self._value_start is not None and self._key is not None:
+            value = self._decode(self._value_start, end)
+            if value is not None:
+                events.append(("field", {"field": self._key, "value": value}))
+        self._key = None
+        self._value_start = None
+        self._value_is_array = False
+        self._element_start = None
+
+    def _decode(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self.buffer[start:end])
+        except ValueError:
+            return None
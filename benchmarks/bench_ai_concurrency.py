@@ -0,0 +1,159 @@
+"""
+Benchmark: event-loop responsiveness while /ai-optimize waits on Gemini.
+A stub model that sleeps stands in for the SDK; /health is polled while
+AI requests are in flight, first with the old blocking call on the event
+loop, then with call_gemini (thread pool + concurrency limit + timeout).
+Also checks the prompt-hash cache and single-flight coalescing: identical
+concurrent requests make one upstream call and fallbacks are not cached,
+and that calls abandoned on timeout hold their slot until the thread
+finishes.
+Run from the backend directory: python benchmarks/bench_ai_concurrency.py
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from cache import ResultCache  # noqa: E402
+from mock_github import ServerThread  # noqa: E402
+from stub_gemini import StubGeminiModel  # noqa: E402
+
+MODEL_LATENCY = 1.0
+AI_REQUESTS = 8
+PAYLOAD = {
+    "code": "for a in items:\n    for b in items:\n        print(a, b)",
+    "language": "python",
+    "analysis_results": {
+        "scores": {"cpu_score": 40, "network_score": 0, "memory_score": 10},
+        "metrics": {"loops": 2, "api_calls": 0}
+    }
+}
+
+
+async def legacy_call_gemini(prompt: str) -> str:
+    """The old behaviour: the blocking SDK call runs on the event loop"""
+    return main.model.generate_content(prompt).text
+
+
+def payload(i: int):
+    """A distinct snippet per request so the AI cache does not absorb the load"""
+    return {**PAYLOAD, "code": PAYLOAD["code"] + f"  # {i}"}
+
+
+async def run_load(base_url: str):
+    """Fire AI_REQUESTS /ai-optimize calls and poll /health until they finish"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        start = time.perf_counter()
+        ai = asyncio.gather(*(client.post("/ai-optimize", json=payload(i)) for i in range(AI_REQUESTS)))
+        ai_task = asyncio.ensure_future(ai)
+        health_latencies = []
+        while not ai_task.done():
+            t = time.perf_counter()
+            await client.get("/health")
+            health_latencies.append((time.perf_counter() - t) * 1000)
+            await asyncio.sleep(0.05)
+        responses = await ai_task
+        wall = time.perf_counter() - start
+    ok = sum(1 for r in responses if r.status_code == 200 and "ai_analysis" in r.json()["optimization"])
+    return health_latencies, wall, ok
+
+
+def report(name: str, health_latencies, wall: float, ok: int, peak: int):
+    print(f"{name:<22}{statistics.median(health_latencies):>12.1f}{max(health_latencies):>12.1f}"
+          f"{wall:>10.2f}{ok:>6}{peak:>6}")
+
+
+async def check_cache(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        main.model = StubGeminiModel(latency=0.5)
+        start = time.perf_counter()
+        await asyncio.gather(*(client.post("/ai-optimize", json=PAYLOAD) for _ in range(AI_REQUESTS)))
+        coalesced_time = time.perf_counter() - start
+        assert main.model.calls == 1, main.model.calls
+
+        start = time.perf_counter()
+        response = await client.post("/ai-optimize", json=PAYLOAD)
+        cached_time = time.perf_counter() - start
+        assert main.model.calls == 1 and "ai_analysis" in response.json()["optimization"]
+
+        main.model = StubGeminiModel(latency=0.05)
+        main.model.text = "Not JSON, just prose"
+        fallback = {**PAYLOAD, "code": "print('fallback')"}
+        for _ in range(2):
+            await client.post("/ai-optimize", json=fallback)
+        assert main.model.calls == 2, main.model.calls
+
+        stats = (await client.get("/health")).json()["ai_cache"]
+    print(f"\n{AI_REQUESTS} identical requests: 1 upstream call, {coalesced_time:.2f} s; "
+          f"cached repeat: {cached_time * 1000:.1f} ms; fallback answers not cached")
+    print("ai_cache:", {key: stats[key] for key in ("entries", "hits", "misses", "evictions", "hit_rate", "coalesced")})
+
+
+async def check_timeout():
+    main.model = StubGeminiModel(latency=0.5)
+    main.GEMINI_TIMEOUT = 0.1
+    result = await main.generate_ai_optimization("x = 1", "python", PAYLOAD["analysis_results"])
+    main.GEMINI_TIMEOUT = 30
+    assert "timed out" in result["error"], result
+    print("timeout:", result["error"])
+
+
+async def check_abandoned_calls():
+    main.close_gemini_executor()  # earlier checks may have left threads busy
+    main.model = StubGeminiModel(latency=0.5)
+    main.GEMINI_TIMEOUT = 0.1
+    limit = main.GEMINI_MAX_CONCURRENCY
+    results = await asyncio.gather(*(
+        main.generate_ai_optimization(f"x = {i}", "python", PAYLOAD["analysis_results"]) for i in range(limit)
+    ))
+    assert all("timed out" in result["error"] for result in results), results
+    # Every thread is still in its model call, so every slot is still taken
+    assert main.gemini_semaphore.locked()
+
+    main.GEMINI_TIMEOUT = 30
+    start = time.perf_counter()
+    result = await main.generate_ai_optimization("y = 1", "python", PAYLOAD["analysis_results"])
+    waited = time.perf_counter() - start
+    assert "ai_analysis" in result and main.model.peak_in_flight <= limit, (result, main.model.peak_in_flight)
+    assert waited >= 0.3, waited
+    print(f"abandoned calls: {limit} timed out, the next call waited {waited:.2f} s for a thread to finish, "
+          f"peak {main.model.peak_in_flight} in flight")
+
+
+def main_benchmark():
+    main.GEMINI_API_KEY = "stub"
+    main.WARM_UP_INTEGRATIONS = False  # the stub model stands in for the SDK
+    main.limiter.enabled = False
+    main.HEALTH_CACHE_TTL = 0  # ai_cache stats are read right after the requests they count
+    server = ServerThread(main.app).start()
+    print(f"{AI_REQUESTS} concurrent /ai-optimize calls, stub latency {MODEL_LATENCY:.1f} s, "
+          f"GEMINI_MAX_CONCURRENCY={main.GEMINI_MAX_CONCURRENCY}")
+    print(f"{'gemini call':<22}{'health p50':>12}{'health max':>12}{'wall s':>10}{'ok':>6}{'peak':>6}")
+    try:
+        call_gemini = main.call_gemini
+        main.call_gemini = legacy_call_gemini
+        main.model = StubGeminiModel(latency=MODEL_LATENCY)
+        report("blocking (old)", *asyncio.run(run_load(server.url)), main.model.peak_in_flight)
+
+        main.call_gemini = call_gemini
+        main.ai_cache = ResultCache()
+        main.model = StubGeminiModel(latency=MODEL_LATENCY)
+        report("thread pool + limit", *asyncio.run(run_load(server.url)), main.model.peak_in_flight)
+
+        asyncio.run(check_cache(server.url))
+        asyncio.run(check_timeout())
+        asyncio.run(check_abandoned_calls())
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,204 @@
+"""
+Benchmark: /ai-optimize vs. /ai-optimize/stream with a stub Gemini model
+that produces its answer in chunks. Checks that StreamingJSONParser reports
+the same parts however the output is split, then compares time to first
+byte, first suggestion and final result, and checks cached answers, model
+errors, timeouts and clients that disconnect mid-stream.
+Run from the backend directory: python benchmarks/bench_ai_stream.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("GITHUB_CACHE_PATH", "")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from ai_stream import StreamingJSONParser  # noqa: E402
+from mock_github import ServerThread  # noqa: E402
+from stub_gemini import StubGeminiModel  # noqa: E402
+
+MODEL_LATENCY = 2.0
+CHUNKS = 40
+RUNS = 5
+RESPONSE = {
+    "inefficiencies": ["Nested loop over the same \"items\" list", "print() inside the inner loop"],
+    "suggestions": ["Build a set once: {x for x in items}", "Collect output and write it once"],
+    "optimized_code": "seen = set(items)\nfor a in items:\n    if a in seen:\n        out.append(f\"{a}\")\n",
+    "explanations": ["Set lookups are O(1) \\ no inner loop", "One write instead of n² prints"],
+    "meta": {"nested": [1, {"deep": "]}"}], "score": 0.5}
+}
+
+
+def payload(i: int):
+    return {
+        "code": f"for a in items:\n    for b in items:\n        print(a, b, {i})",
+        "language": "python",
+        "analysis_results": {
+            "scores": {"cpu_score": 40, "network_score": 0, "memory_score": 10},
+            "metrics": {"loops": 2, "api_calls": 0}
+        }
+    }
+
+
+def parse_events(text: str):
+    events = []
+    for block in text.split("\n\n"):
+        if block.startswith("event: "):
+            name, data = block.split("\n", 1)
+            events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def check_parser():
+    text = "Here is the analysis:\n```json\n" + json.dumps(RESPONSE, indent=2) + "\n```\nDone."
+    whole = StreamingJSONParser().feed(text)
+    fields = {data["field"]: data["value"] for name, data in whole if name == "field"}
+    assert fields == RESPONSE, fields
+    items = [(data["field"], data["index"], data["value"]) for name, data in whole if name == "item"]
+    assert items == [
+        (field, index, value) for field, values in RESPONSE.items() if isinstance(values, list)
+        for index, value in enumerate(values)
+    ], items
+
+    rng = random.Random(5)
+    splits = 0
+    for size in list(range(1, 12)) + [None] * 200:
+        parser = StreamingJSONParser()
+        events, position = [], 0
+        while position < len(text):
+            step = size or rng.randint(1, 60)
+            events.extend(parser.feed(text[position:position + step]))
+            position += step
+        assert events == whole, size
+        splits += 1
+
+    bare = StreamingJSONParser()
+    assert bare.feed(json.dumps(RESPONSE)) == StreamingJSONParser().feed("```json" + json.dumps(RESPONSE))
+    assert StreamingJSONParser().feed("I could not produce JSON for this code.") == []
+    print(f"parser: {len(whole)} events, identical across {splits} ways of splitting the output")
+
+
+async def timed_sync(client: httpx.AsyncClient, body):
+    start = time.perf_counter()
+    async with client.stream("POST", "/ai-optimize", json=body) as response:
+        first_byte = None
+        content = b""
+        async for chunk in response.aiter_bytes():
+            first_byte = first_byte or time.perf_counter() - start
+            content += chunk
+    total = time.perf_counter() - start
+    assert response.status_code == 200 and "ai_analysis" in json.loads(content)["optimization"]
+    return first_byte, first_byte, total
+
+
+async def timed_stream(client: httpx.AsyncClient, body):
+    start = time.perf_counter()
+    first_byte = first_item = None
+    text = ""
+    async with client.stream("POST", "/ai-optimize/stream", json=body) as response:
+        async for chunk in response.aiter_text():
+            first_byte = first_byte or time.perf_counter() - start
+            text += chunk
+            if first_item is None and "event: item" in text:
+                first_item = time.perf_counter() - start
+    total = time.perf_counter() - start
+    events = parse_events(text)
+    assert events[-1][0] == "result", events[-1]
+    return first_byte, first_item, total, events
+
+
+async def compare(client: httpx.AsyncClient):
+    main.model = StubGeminiModel(latency=MODEL_LATENCY, response=RESPONSE, chunks=CHUNKS)
+    rows = {"sync": [], "stream": []}
+    for i in range(RUNS):
+        rows["sync"].append(await timed_sync(client, payload(i)))
+        *timings, events = await timed_stream(client, payload(RUNS + i))
+        rows["stream"].append(timings)
+    assert events[-1][1]["ai_analysis"] == RESPONSE
+    assert "".join(data["text"] for name, data in events if name == "delta") == main.model.text
+
+    print(f"{MODEL_LATENCY:g} s model answer in {CHUNKS} chunks, mean of {RUNS} requests")
+    print(f"{'endpoint':<22}{'first byte s':>14}{'first item s':>14}{'result s':>12}")
+    for name, path in (("sync", "/ai-optimize"), ("stream", "/ai-optimize/stream")):
+        means = [sum(row[column] for row in rows[name]) / RUNS for column in range(3)]
+        print(f"{path:<22}{means[0]:>14.3f}{means[1]:>14.3f}{means[2]:>12.3f}")
+
+
+async def check_cached(client: httpx.AsyncClient):
+    calls = main.model.calls
+    _, _, total, events = await timed_stream(client, payload(RUNS))
+    assert main.model.calls == calls, "cached answer went to the model again"
+    assert [name for name, _ in events] == ["field"] * len(RESPONSE) + ["result"]
+    assert events[-1][1]["ai_analysis"] == RESPONSE
+    print(f"cache: repeated request answered from ai_cache in {total * 1e3:.1f} ms, no model call")
+
+
+async def check_failures(client: httpx.AsyncClient):
+    main.model = StubGeminiModel(latency=0.2, error_rate=1.0, chunks=4)
+    response = await client.post("/ai-optimize/stream", json=payload(100))
+    name, data = parse_events(response.text)[-1]
+    assert name == "error" and "503" in data["error"], (name, data)
+
+    timeout = main.GEMINI_TIMEOUT
+    main.GEMINI_TIMEOUT = 0.5
+    try:
+        main.model = StubGeminiModel(latency=2.0, chunks=8)
+        start = time.perf_counter()
+        response = await client.post("/ai-optimize/stream", json=payload(101))
+        elapsed = time.perf_counter() - start
+    finally:
+        main.GEMINI_TIMEOUT = timeout
+    events = parse_events(response.text)
+    assert events[-1][0] == "error" and "timed out" in events[-1][1]["error"], events[-1]
+    assert elapsed < 1.0, elapsed
+    print(f"failures: model error -> error event; timeout -> error event after {elapsed:.2f} s "
+          f"({sum(name == 'delta' for name, _ in events)} deltas already sent)")
+
+
+async def check_disconnect(client: httpx.AsyncClient):
+    """A client leaving mid-stream stops the model thread and frees its Gemini slot"""
+    main.model = StubGeminiModel(latency=3.0, chunks=30)
+    async with client.stream("POST", "/ai-optimize/stream", json=payload(200)) as response:
+        async for chunk in response.aiter_text():
+            if "event: delta" in chunk:
+                break
+    start = time.perf_counter()
+    while main.model.in_flight and time.perf_counter() - start < 2:
+        await asyncio.sleep(0.01)
+    stopped = time.perf_counter() - start
+    assert main.model.in_flight == 0, "model thread kept running after the client left"
+    assert main.gemini_semaphore._value == main.GEMINI_MAX_CONCURRENCY
+    print(f"disconnect: model thread stopped {stopped * 1e3:.0f} ms after the client left "
+          f"(of a {main.model.latency:g} s answer)")
+
+
+async def run():
+    main.limiter.enabled = False
+    main.WARM_UP_INTEGRATIONS = False  # the stub model stands in for the SDK
+    main.GEMINI_API_KEY = "stub"
+    check_parser()
+    print()
+    # A real server: the in-process httpx transport buffers whole responses
+    server = ServerThread(main.app).start()
+    try:
+        async with httpx.AsyncClient(base_url=server.url, timeout=60) as client:
+            await compare(client)
+            print()
+            await check_cached(client)
+            await check_failures(client)
+            await check_disconnect(client)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
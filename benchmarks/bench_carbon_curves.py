@@ -0,0 +1,196 @@
+"""
+Benchmark: hourly carbon intensity curves. Compares opening the
+memory-mapped curves file with parsing the same data from CSV, NumPy
+integration of a year of traffic against a curve with an hour-by-hour
+Python loop, and the cumulative-sum low-carbon window search with summing
+every candidate window. Checks that the results agree, that a flat traffic
+profile reproduces the annual-average figures of /hosting-impact, that a
+missing curves file is never created and modelled curves are labelled, and
+times both endpoints end to end.
+Run from the backend directory: python benchmarks/bench_carbon_curves.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GITHUB_CACHE_PATH", "")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+import main  # noqa: E402
+from carbon_intensity import (  # noqa: E402
+    HOURS_PER_YEAR, MONTH_START_HOURS, TRAFFIC_PROFILES, load_curves, modelled_curves, profile_weights, write_curves
+)
+from hosting_impact import CARBON_INTENSITY, REGIONS  # noqa: E402
+
+WINDOW_CASES = [(4, 168), (24, 168), (4, 8760)]
+REQUESTS = 200
+
+
+def best_us(function, number: int = 20) -> float:
+    return min(timeit.repeat(function, repeat=5, number=number)) / number * 1e6
+
+
+def python_integrate(curve, weights):
+    """Grams per month for 1 kWh a year, one hour at a time"""
+    months = [0.0] * 12
+    month = 0
+    for hour in range(HOURS_PER_YEAR):
+        if month < 11 and hour >= MONTH_START_HOURS[month + 1]:
+            month += 1
+        months[month] += weights[hour] * curve[hour]
+    return months
+
+
+def python_windows(curve, start_hour, duration, horizon, count):
+    """Mean of every candidate window, then the lowest non-overlapping ones"""
+    series = [curve[(start_hour + hour) % HOURS_PER_YEAR] for hour in range(horizon)]
+    means = [sum(series[start:start + duration]) / duration for start in range(horizon - duration + 1)]
+    windows = []
+    for start in sorted(range(len(means)), key=lambda i: (means[i], i)):
+        if all(abs(start - taken) >= duration for taken, _ in windows):
+            windows.append((start, means[start]))
+            if len(windows) == count:
+                break
+    return windows, means[0]
+
+
+def compare_storage(directory: str):
+    curves = modelled_curves()
+    path = os.path.join(directory, "curves.bin")
+    csv_path = os.path.join(directory, "curves.csv")
+    write_curves(path, curves)
+    np.savetxt(csv_path, np.column_stack(list(curves.values())), delimiter=",", fmt="%.4f",
+               header=",".join(curves), comments="")
+
+    def from_csv():
+        with open(csv_path) as fh:
+            fh.readline()
+            return np.loadtxt(fh, delimiter=",")
+
+    print(f"{len(curves)} regions x {HOURS_PER_YEAR} hours")
+    print(f"{'storage':<26}{'bytes':>10}{'open us':>12}")
+    print(f"{'CSV, parsed':<26}{os.path.getsize(csv_path):>10}{best_us(from_csv, number=1):>12.0f}")
+    print(f"{'binary, memory-mapped':<26}{os.path.getsize(path):>10}{best_us(lambda: load_curves(path)):>12.0f}")
+
+    loaded = load_curves(path)
+    assert loaded.regions == tuple(curves)
+    assert np.allclose(from_csv().T, loaded.values, atol=1e-3)
+    for region, mean in CARBON_INTENSITY.items():
+        assert abs(float(loaded.curve(region).mean()) - mean) < 1e-3 * mean, region
+    return loaded
+
+
+def compare_integration(curves):
+    print(f"\n{'integration, 1 year':<26}{'python us':>12}{'numpy us':>12}")
+    for name in ("flat", "business"):
+        weights = profile_weights(TRAFFIC_PROFILES[name], curves.year)
+        curve, weight_list = curves.curve("eu-west").tolist(), weights.tolist()
+        expected = python_integrate(curve, weight_list)
+        assert np.allclose(curves.integrate(weights, ["eu-west"])[0], expected, rtol=1e-9)
+        print(f"{name + ', 1 region':<26}{best_us(lambda: python_integrate(curve, weight_list), 3):>12.0f}"
+              f"{best_us(lambda: curves.integrate(weights, ['eu-west'])):>12.1f}")
+    every = len(curves.regions)
+    print(f"{f'business, {every} regions':<26}{'':>12}{best_us(lambda: curves.integrate(weights)):>12.1f}")
+
+
+def compare_windows(curves):
+    print(f"\n{'windows (duration/horizon)':<26}{'python us':>12}{'numpy us':>12}")
+    curve = curves.curve("australia").tolist()
+    for duration, horizon in WINDOW_CASES:
+        for start_hour in (0, 3700, HOURS_PER_YEAR - 50):
+            windows, now = curves.low_carbon_windows("australia", start_hour, duration, horizon, 3)
+            expected, expected_now = python_windows(curve, start_hour, duration, horizon, 3)
+            assert [offset for offset, _ in windows] == [offset for offset, _ in expected], (windows, expected)
+            assert np.allclose([mean for _, mean in windows], [mean for _, mean in expected]) and \
+                np.isclose(now, expected_now)
+        print(f"{f'{duration} h in {horizon} h':<26}"
+              f"{best_us(lambda: python_windows(curve, 0, duration, horizon, 3), 1):>12.0f}"
+              f"{best_us(lambda: curves.low_carbon_windows('australia', 0, duration, horizon, 3)):>12.1f}")
+
+
+def use_curves(path: str, modelled: bool = False):
+    main.CARBON_INTENSITY_PATH = path
+    main.CARBON_INTENSITY_MODELLED = modelled
+    main.carbon_curves = None
+
+
+async def check_endpoints(served: str):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        business = {"provider": "aws", "region": "eu-west", "tier": "basic", "traffic_profile": "business"}
+
+        # No curves file: nothing is written, and profiles fall back to annual averages saying so
+        use_curves(served)
+        response = await client.post("/hosting-impact/low-carbon-windows", json={"region": "eu-west", "duration_hours": 6})
+        assert response.status_code == 503
+        impact = (await client.post("/hosting-impact", json=business)).json()["impact"]
+        assert impact["carbon_intensity_source"] == "annual_average" and "carbon_intensity_note" in impact
+        assert not os.path.exists(served) and main.health_status()["carbon_intensity"] == "annual averages"
+        print("\nwithout a curves file: none written, windows 503, traffic profiles fall back to annual averages")
+
+        # Modelled curves are opt-in and labelled as such everywhere
+        use_curves(served, modelled=True)
+        for region in REGIONS:
+            body = {"provider": "gcp", "region": region, "tier": "standard", "monthly_requests": 5000000}
+            static = (await client.post("/hosting-impact", json=body)).json()["impact"]
+            flat = (await client.post("/hosting-impact", json={**body, "traffic_profile": "flat"})).json()["impact"]
+            assert static["carbon_intensity_source"] == "annual_average" and flat["carbon_intensity_source"] == "modelled"
+            assert "carbon_intensity_note" in flat and "carbon_intensity_note" not in static
+            for key in ("monthly_co2_grams", "yearly_co2_kg", "carbon_intensity_region"):
+                assert abs(flat[key] - static[key]) <= 0.011, (region, key, flat[key], static[key])
+        windows = (await client.post("/hosting-impact/low-carbon-windows", json={"region": "eu-west", "duration_hours": 6})).json()
+        assert windows["carbon_intensity_source"] == "modelled" and "carbon_intensity_note" in windows
+        assert not os.path.exists(served) and main.health_status()["carbon_intensity"] == "modelled"
+        print(f"CARBON_INTENSITY_MODELLED: labelled 'modelled', flat profile reproduces the annual-average "
+              f"figures in all {len(REGIONS)} regions")
+
+        # A curves file on disk is reported as hourly data
+        write_curves(served, modelled_curves())
+        use_curves(served)
+        assert main.health_status()["carbon_intensity"] == "hourly"
+        timings = []
+        for path, body in (
+            ("/hosting-impact", {"provider": "aws", "region": "eu-west", "tier": "basic"}),
+            ("/hosting-impact", business),
+            ("/hosting-impact/low-carbon-windows", {"region": "eu-west", "duration_hours": 6, "energy_kwh": 40}),
+        ):
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                response = await client.post(path, json=body)
+                assert response.status_code == 200, response.text
+            timings.append((time.perf_counter() - start) / REQUESTS * 1e6)
+        windows = response.json()
+        assert windows["carbon_intensity_source"] == "hourly" and "carbon_intensity_note" not in windows
+        best = windows["windows"][0]
+        print(f"/hosting-impact: annual average {timings[0]:.0f} us, hourly 'business' profile {timings[1]:.0f} us; "
+              f"/hosting-impact/low-carbon-windows {timings[2]:.0f} us")
+        print(f"eu-west, 6 h job: now {windows['run_now']['average_intensity']} gCO2/kWh, best window "
+              f"{best['start']} at {best['average_intensity']} ({best['savings_percent']}% less)")
+
+        use_curves("")
+        response = await client.post("/hosting-impact/low-carbon-windows", json={"region": "eu-west", "duration_hours": 6})
+        assert response.status_code == 503
+        response = await client.post("/hosting-impact", json=business)
+        assert response.json()["impact"]["carbon_intensity_source"] == "annual_average"
+        print("without CARBON_INTENSITY_PATH: windows 503, traffic profiles fall back to annual averages")
+
+
+def main_benchmark():
+    main.limiter.enabled = False
+    with tempfile.TemporaryDirectory() as directory:
+        curves = compare_storage(directory)
+        compare_integration(curves)
+        compare_windows(curves)
+        asyncio.run(check_endpoints(os.path.join(directory, "served.bin")))
+
+
+if __name__ == "__main__":
+    main_benchmark()
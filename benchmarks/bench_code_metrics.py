@@ -0,0 +1,142 @@
+"""
+Benchmark: calculate_code_metrics single-pass scanner vs. legacy multi-pass
+Run from the backend directory: python benchmarks/bench_code_metrics.py
+"""
+
+import os
+import re
+import sys
+import timeit
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_metrics import calculate_code_metrics, analyze_loop_nesting  # noqa: E402
+
+
+PYTHON_SNIPPET = '''
+import requests
+
+def fetch_users(db, ids):
+    rows = []
+    for user_id in ids:
+        for attempt in range(3):
+            resp = requests.get(f"https://api.example.com/users/{user_id}")
+            if resp.ok:
+                break
+        rows.append(db.execute("SELECT * FROM users WHERE id = ?", (user_id,)))
+    with open("users.json") as fh:
+        cached = fh.read()
+    while len(rows) > 100:
+        rows.pop()
+    return rows
+'''
+
+JAVASCRIPT_SNIPPET = '''
+const fs = require('fs');
+
+async function loadOrders(db, ids) {
+    const orders = [];
+    for (const id of ids) {
+        for (let i = 0; i < 3; i++) {
+            const res = await axios.get(`/api/orders/${id}`);
+            orders.push(res.data);
+        }
+    }
+    ids.forEach(id => db.query('SELECT 1'));
+    const raw = fs.readFileSync('orders.json');
+    return orders.map(o => o.total);
+}
+'''
+
+SIZES_KB = (1, 10, 50)
+
+# Shapes that make the old nested_loops regexes backtrack
+ADVERSARIAL_INPUTS = {
+    'python': ('for while ' * 5000)[:50000],
+    'javascript': ('for ' * 12500),
+}
+
+LEGACY_NESTED_LOOPS = {
+    'python': re.compile(r'(for|while).*:\s*\n.*\s+(for|while)', re.MULTILINE | re.IGNORECASE),
+    'javascript': re.compile(r'(for|while).*{[^}]+(for|while)', re.MULTILINE | re.IGNORECASE),
+}
+
+# nested_loops is now structural, so it is not expected to match the regex
+PARITY_KEYS = ("lines_of_code", "loops", "api_calls", "file_io_operations", "recursion_count", "db_queries")
+
+
+def legacy_calculate_code_metrics(code: str, language: str) -> Dict[str, Any]:
+    """The original per-pattern implementation, kept as the reference"""
+    lines = code.split('\n')
+    patterns = {
+        'python': {
+            'loops': [r'\bfor\b', r'\bwhile\b'],
+            'nested_loops': r'(for|while).*:\s*\n.*\s+(for|while)',
+            'api_calls': [r'requests\.', r'urllib\.', r'httpx\.', r'fetch\('],
+            'file_io': [r'open\(', r'\.read\(', r'\.write\('],
+            'recursion': r'def\s+\w+',
+            'db_queries': [r'\.execute\(', r'\.query\(', r'SELECT', r'INSERT', r'UPDATE'],
+        },
+        'javascript': {
+            'loops': [r'\bfor\b', r'\bwhile\b', r'\.forEach\(', r'\.map\('],
+            'nested_loops': r'(for|while).*{[^}]+(for|while)',
+            'api_calls': [r'fetch\(', r'axios\.', r'\$\.ajax', r'\.get\(', r'\.post\('],
+            'file_io': [r'fs\.', r'readFile', r'writeFile'],
+            'recursion': r'function\s+\w+',
+            'db_queries': [r'\.query\(', r'\.find\(', r'\.findOne\(', r'\.save\('],
+        }
+    }
+    lang_patterns = patterns.get(language, patterns['python'])
+
+    def count(keys):
+        return sum(len(re.findall(p, code, re.IGNORECASE)) for p in keys)
+
+    return {
+        "lines_of_code": len(lines),
+        "loops": count(lang_patterns['loops']),
+        "nested_loops": len(re.findall(lang_patterns['nested_loops'], code, re.MULTILINE | re.IGNORECASE)),
+        "api_calls": count(lang_patterns['api_calls']),
+        "file_io_operations": count(lang_patterns['file_io']),
+        "recursion_count": len(re.findall(lang_patterns['recursion'], code, re.MULTILINE | re.IGNORECASE)),
+        "db_queries": count(lang_patterns['db_queries']),
+    }
+
+
+def build_input(snippet: str, size_kb: int) -> str:
+    """Repeat a snippet until it reaches the requested size"""
+    target = size_kb * 1024
+    return (snippet * (target // len(snippet) + 1))[:target]
+
+
+def best_of(func, repeat: int = 5, number: int = 20) -> float:
+    """Best per-call time in milliseconds"""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1000
+
+
+def main():
+    print(f"{'language':<12}{'size':>6}{'legacy ms':>12}{'scanner ms':>12}{'speedup':>10}")
+    for language, snippet in (('python', PYTHON_SNIPPET), ('javascript', JAVASCRIPT_SNIPPET)):
+        for size_kb in SIZES_KB:
+            code = build_input(snippet, size_kb)
+
+            expected = legacy_calculate_code_metrics(code, language)
+            metrics = calculate_code_metrics(code, language)['metrics']
+            actual = {key: metrics[key] for key in expected if key in PARITY_KEYS}
+            expected = {key: expected[key] for key in PARITY_KEYS}
+            assert actual == expected, f"metrics diverged for {language}/{size_kb}KB: {actual} != {expected}"
+
+            legacy_ms = best_of(lambda: legacy_calculate_code_metrics(code, language))
+            scanner_ms = best_of(lambda: calculate_code_metrics(code, language))
+            print(f"{language:<12}{size_kb:>4}KB{legacy_ms:>12.3f}{scanner_ms:>12.3f}{legacy_ms / scanner_ms:>9.1f}x")
+
+    print()
+    print(f"{'nested loops (adversarial 50KB)':<32}{'regex ms':>12}{'tracker ms':>12}")
+    for language, code in ADVERSARIAL_INPUTS.items():
+        regex_ms = best_of(lambda: LEGACY_NESTED_LOOPS[language].findall(code), repeat=1, number=1)
+        tracker_ms = best_of(lambda: analyze_loop_nesting(code, language), repeat=3, number=5)
+        print(f"{language:<32}{regex_ms:>12.1f}{tracker_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
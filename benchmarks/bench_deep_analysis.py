@@ -0,0 +1,155 @@
+"""
+Benchmark: deep repository analysis from a single streamed tarball,
+against a local mock GitHub serving a generated fixture archive.
+Compares download-then-analyze-sequentially with streaming decompression
+fanned out to the process pool, and checks both give the same per-file
+results and that the file/byte limits truncate the scan.
+Run from the backend directory: python benchmarks/bench_deep_analysis.py
+"""
+
+import asyncio
+import io
+import os
+import random
+import sys
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from code_metrics import calculate_code_metrics  # noqa: E402
+from mock_github import build_fixture_tarball, create_mock_github, ServerThread  # noqa: E402
+from repo_scanner import language_for_path  # noqa: E402
+
+FILES = 400
+LATENCY = 0.02
+CONCURRENT_SCANS = 8
+
+SNIPPETS = {
+    "py": [
+        "for item in items:\n    total += item\n",
+        "for row in rows:\n    for col in row:\n        grid.append(col)\n",
+        "response = requests.get(url)\n",
+        "with open(path) as fh:\n    data = fh.read()\n",
+        "cursor.execute('SELECT * FROM t')\n",
+        "def walk(node):\n    return walk(node.left)\n",
+        "value = compute(value) * 2\n",
+    ],
+    "js": [
+        "for (let i = 0; i < n; i++) {\n  sum += i;\n}\n",
+        "await fetch('/api/items');\n",
+        "items.forEach(item => {\n  console.log(item);\n});\n",
+        "const data = fs.readFileSync('a.txt');\n",
+        "let value = compute(value) * 2;\n",
+    ],
+    "java": [
+        "for (int i = 0; i < n; i++) {\n    sum += i;\n}\n",
+        "while (it.hasNext()) {\n    it.next();\n}\n",
+        "stmt.executeQuery(\"SELECT 1\");\n",
+    ],
+}
+
+
+def generate_corpus(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    files = {}
+    for i in range(count):
+        extension = rng.choice(["py", "py", "js", "ts", "java"])
+        pool = SNIPPETS["js" if extension == "ts" else extension]
+        body = "".join(rng.choice(pool) for _ in range(rng.randint(20, 200)))
+        files[f"src/pkg{i % 20}/module{i}.{extension}"] = body
+    files["docs/README.md"] = "# Fixture\n"
+    files["assets/logo.svg"] = "<svg/>\n"
+    return files
+
+
+def legacy_analyze(archive_bytes: bytes):
+    """Download the whole archive, then analyze every file one after another"""
+    results = {}
+    with tarfile.open(fileobj=io.BytesIO(archive_bytes), mode="r:gz") as archive:
+        for member in archive.getmembers():
+            path = member.name.split("/", 1)[-1]
+            language = language_for_path(path) if member.isfile() else None
+            if language is None:
+                continue
+            code = archive.extractfile(member).read().decode("utf-8", errors="replace")
+            results[path] = calculate_code_metrics(code, language)
+    return results
+
+
+async def run(base_url: str, files):
+    import httpx
+    import main
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        start = time.perf_counter()
+        response = await client.get("/repos/octo/fixture/tarball", follow_redirects=True)
+        legacy = legacy_analyze(response.content)
+        legacy_time = time.perf_counter() - start
+
+        # Warm the process pool so worker start-up is not measured
+        await main.analyze_in_pool([("x = 1", "python")] * main.ANALYSIS_WORKERS)
+
+        start = time.perf_counter()
+        deep = await main.analyze_repo_tarball(client, "octo", "fixture")
+        streaming_time = time.perf_counter() - start
+
+        expected_files = sum(1 for path in files if language_for_path(path))
+        assert deep["files_analyzed"] == expected_files == len(legacy), (deep["files_analyzed"], expected_files)
+        for entry in deep["files"]:
+            reference = legacy[entry["path"]]
+            assert entry["metrics"] == reference["metrics"], entry["path"]
+            assert entry["green_score"] == reference["green_score"], entry["path"]
+
+        print(f"{FILES} files, {len(response.content) / 1024:.0f} KB compressed, "
+              f"{main.ANALYSIS_WORKERS} workers")
+        print(f"{'mode':<36}{'seconds':>10}")
+        print(f"{'download, then sequential analysis':<36}{legacy_time:>10.3f}")
+        print(f"{'streamed tarball + process pool':<36}{streaming_time:>10.3f}")
+        print("languages:", {lang: totals["files"] for lang, totals in deep["languages"].items()})
+
+        main.GITHUB_DEEP_MAX_FILES = 25
+        limited = await main.analyze_repo_tarball(client, "octo", "fixture")
+        assert limited["files_analyzed"] == 25 and limited["truncated"] == "max_files"
+
+        main.GITHUB_DEEP_MAX_FILES = 2000
+        main.GITHUB_DEEP_MAX_DOWNLOAD_BYTES = 16 * 1024
+        limited = await main.analyze_repo_tarball(client, "octo", "fixture")
+        assert limited["truncated"] == "max_download_bytes"
+        print(f"limits: max_files -> 25 files, 16 KB download -> {limited['files_analyzed']} files")
+
+        # More concurrent scans than default-executor threads must not starve the loop's to_thread users
+        main.GITHUB_DEEP_MAX_DOWNLOAD_BYTES = 200 * 1024 * 1024
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+        start = time.perf_counter()
+        scans = asyncio.gather(*(main.analyze_repo_tarball(client, "octo", "fixture") for _ in range(CONCURRENT_SCANS)))
+        await asyncio.wait_for(asyncio.to_thread(time.sleep, 0.01), 10)
+        results = await asyncio.wait_for(scans, 60)
+        assert all(result["files_analyzed"] == expected_files for result in results)
+        print(f"{CONCURRENT_SCANS} concurrent scans on a 2-thread default executor: "
+              f"{time.perf_counter() - start:.2f} s, to_thread still served")
+
+        main.GITHUB_DEEP_TIMEOUT = 0.01
+        try:
+            await main.analyze_repo_tarball(client, "octo", "fixture")
+            raise AssertionError("scan did not time out")
+        except main.HTTPException as e:
+            assert e.status_code == 504, e.status_code
+        print("timeout: GITHUB_DEEP_TIMEOUT exceeded -> 504")
+
+    main.get_analysis_pool().shutdown()
+
+
+def main_benchmark():
+    files = generate_corpus(FILES)
+    server = ServerThread(create_mock_github(latency=LATENCY, tarball=build_fixture_tarball(files))).start()
+    try:
+        asyncio.run(run(server.url, files))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main_benchmark()
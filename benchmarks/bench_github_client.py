@@ -0,0 +1,143 @@
+"""
+Benchmark: analyze_github_repo with the shared pooled client vs. the old
+per-request client with sequential calls, against a local mock GitHub,
+plus warm runs through the ETag response cache, in memory and persisted to
+SQLite (checking that the file is only created on use, is read back
+after a restart, that a corrupt row counts as a miss and that rows past
+the retention are deleted)
+Run from the backend directory: python benchmarks/bench_github_client.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+from github_client import GitHubResponseCache  # noqa: E402
+from mock_github import create_mock_github, ServerThread  # noqa: E402
+
+LATENCY = 0.02  # seconds per mock GitHub response
+CALLS = 50
+CONCURRENCY = 10
+
+
+async def legacy_fetch(base_url: str, owner: str, repo: str):
+    """The old access pattern: a new client per call, calls one after another"""
+    async with httpx.AsyncClient() as client:
+        repo_response = await client.get(f"{base_url}/repos/{owner}/{repo}", timeout=30.0)
+        languages_response = await client.get(f"{base_url}/repos/{owner}/{repo}/languages", timeout=30.0)
+        return repo_response.json(), languages_response.json()
+
+
+async def measure(call, concurrency: int):
+    """Per-call latencies and total wall time for CALLS calls"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(CALLS)))
+    return latencies, time.perf_counter() - start
+
+
+def report(name: str, latencies, wall: float):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28}{statistics.mean(latencies):>10.1f}{p95:>10.1f}{CALLS / wall:>12.1f}")
+
+
+async def run(base_url: str):
+    import main
+
+    for concurrency in (1, CONCURRENCY):
+        print(f"\nconcurrency={concurrency}, mock latency={LATENCY * 1000:.0f} ms")
+        print(f"{'client':<28}{'mean ms':>10}{'p95 ms':>10}{'calls/s':>12}")
+
+        latencies, wall = await measure(lambda i: legacy_fetch(base_url, "octo", f"repo{i}"), concurrency)
+        report("per-request, sequential", latencies, wall)
+
+        def analyze(i):
+            return main.analyze_github_repo(f"https://github.com/octo/repo{i}")
+
+        main.github_cache = GitHubResponseCache(fresh_for=0)
+        latencies, wall = await measure(analyze, concurrency)
+        report("shared pool, concurrent", latencies, wall)
+
+        # Same repositories again: every call is revalidated with a 304
+        latencies, wall = await measure(analyze, concurrency)
+        report("  + ETag revalidation", latencies, wall)
+
+        main.github_cache.fresh_for = 60
+        latencies, wall = await measure(analyze, concurrency)
+        report("  + fresh cache hit", latencies, wall)
+
+    await run_persisted(main)
+    await main.close_github_client()
+
+
+async def run_persisted(main):
+    """The same runs with the SQLite tier, then again after a restart"""
+    print(f"\nconcurrency={CONCURRENCY}, SQLite cache")
+    print(f"{'client':<28}{'mean ms':>10}{'p95 ms':>10}{'calls/s':>12}")
+
+    def analyze(i):
+        return main.analyze_github_repo(f"https://github.com/octo/repo{i}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache", "github.sqlite3")
+        main.github_cache = GitHubResponseCache(path=path, fresh_for=0)
+        assert not os.path.exists(path)
+        report("shared pool, concurrent", *await measure(analyze, CONCURRENCY))
+        report("  + ETag revalidation", *await measure(analyze, CONCURRENCY))
+        await main.github_cache.aclose()
+        assert os.path.exists(path)
+
+        # A restarted worker reads the responses back from disk
+        main.github_cache = GitHubResponseCache(path=path, fresh_for=60, memory_entries=0)
+        report("  + fresh hit from SQLite", *await measure(analyze, CONCURRENCY))
+        assert main.github_cache.counters["fresh"] == 2 * CALLS, main.github_cache.counters
+        await main.github_cache.aclose()
+
+        # A row that cannot be decoded is fetched again instead of failing the request
+        with sqlite3.connect(path) as db:
+            db.execute("UPDATE responses SET body = '{not json' WHERE url = '/repos/octo/repo0'")
+        main.github_cache = GitHubResponseCache(path=path, fresh_for=60, memory_entries=0)
+        await main.analyze_github_repo("https://github.com/octo/repo0")
+        assert main.github_cache.counters["fetched"] == 1, main.github_cache.counters
+        await main.github_cache.aclose()
+
+        # Rows not refreshed within the retention are deleted
+        main.github_cache = GitHubResponseCache(path=path, retention=0)
+        main.github_cache.open()
+        await main.github_cache.aclose()
+        with sqlite3.connect(path) as db:
+            rows = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        assert rows == 0 and main.github_cache.pruned == 2 * CALLS, (rows, main.github_cache.pruned)
+    print("SQLite file created on first save and read back after a restart; corrupt rows are misses; "
+          "rows past the retention are deleted")
+
+
+def main_benchmark():
+    server = ServerThread(create_mock_github(latency=LATENCY)).start()
+    os.environ["GITHUB_API_URL"] = server.url
+    try:
+        asyncio.run(run(server.url))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main_benchmark()
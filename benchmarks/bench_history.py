@@ -0,0 +1,158 @@
+"""
+Benchmark: /history/{user_id} with the old sequential select("*") queries
+vs. concurrent summary-column queries, cold and with the per-user cache,
+against an in-memory Supabase stand-in with per-call latency. Also walks
+every page with the cursor, including a batch of rows saved with one
+created_at, and checks that a newly written analysis invalidates the
+cached history.
+Run from the backend directory: python benchmarks/bench_history.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from code_metrics import calculate_code_metrics  # noqa: E402
+from stub_supabase import StubSupabase  # noqa: E402
+
+STORE_LATENCY = 0.03
+ROWS_PER_TABLE = 150
+CALLS = 20
+USER = "user-1"
+BATCH_USER = "user-2"
+BATCH_SIZE = 7
+
+
+def populate(store: StubSupabase):
+    analysis = calculate_code_metrics("for a in x:\n    for b in y:\n        requests.get(b)\n" * 40, "python")
+    repo_analysis = {
+        "repo_info": {"name": "demo", "owner": "octo", "stars": 10},
+        "languages": {"Python": 1000},
+        "impact_estimate": {"total_co2_monthly_grams": 12.5},
+        "deep_analysis": {"files": [{"path": f"src/m{i}.py", "metrics": analysis["metrics"]} for i in range(50)]}
+    }
+    start = datetime(2025, 1, 1)
+    for i in range(ROWS_PER_TABLE):
+        store.tables.setdefault("code_analyses", []).append({
+            "id": i, "user_id": USER, "language": "python", "code_hash": f"{i:016x}",
+            "analysis_results": analysis, "created_at": (start + timedelta(minutes=2 * i)).isoformat()
+        })
+        store.tables.setdefault("github_analyses", []).append({
+            "id": 10000 + i, "user_id": USER, "repo_url": "https://github.com/octo/demo",
+            "analysis_results": repo_analysis, "created_at": (start + timedelta(minutes=2 * i + 1)).isoformat()
+        })
+    # A batch save: every row, in both tables, shares one created_at
+    batch_at = (start + timedelta(days=30)).isoformat()
+    for i in range(BATCH_SIZE):
+        store.tables["code_analyses"].append({
+            "id": 20000 + i, "user_id": BATCH_USER, "language": "python", "code_hash": f"{i:016x}",
+            "analysis_results": analysis, "created_at": batch_at
+        })
+    store.tables["github_analyses"].append({
+        "id": 30000, "user_id": BATCH_USER, "repo_url": "https://github.com/octo/demo",
+        "analysis_results": repo_analysis, "created_at": batch_at
+    })
+
+
+async def legacy_get_history(user_id: str):
+    """The old handler: two blocking select("*") queries, one after the other"""
+    code_analyses = main.supabase.table("code_analyses").select("*").eq("user_id", user_id)\
+        .order("created_at", desc=True).limit(20).execute()
+    github_analyses = main.supabase.table("github_analyses").select("*").eq("user_id", user_id)\
+        .order("created_at", desc=True).limit(20).execute()
+    return {"success": True, "code_analyses": code_analyses.data, "github_analyses": github_analyses.data}
+
+
+async def timed(client, path):
+    start = time.perf_counter()
+    response = await client.get(path)
+    assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) * 1000, len(response.content), response.json()
+
+
+async def walk(client, user_id: str, limit: int):
+    seen, cursor, pages = [], None, 0
+    while True:
+        path = f"/history/{user_id}?limit={limit}" + (f"&before={cursor}" if cursor else "")
+        _, _, page = await timed(client, path)
+        pages += 1
+        seen += [("code", r["id"]) for r in page["code_analyses"]] + [("github", r["id"]) for r in page["github_analyses"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return seen, pages
+
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        print(f"{'history':<26}{'mean ms':>10}{'bytes':>10}")
+
+        start = time.perf_counter()
+        legacy = await legacy_get_history(USER)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"{'sequential select * (old)':<26}{ms:>10.1f}{len(json.dumps(legacy)):>10}")
+
+        cold = []
+        for _ in range(CALLS):
+            main.history_cache = main.ResultCache(ttl=30)
+            ms, size, _ = await timed(client, f"/history/{USER}")
+            cold.append(ms)
+        print(f"{'concurrent summary, cold':<26}{sum(cold) / len(cold):>10.1f}{size:>10}")
+
+        warm = [(await timed(client, f"/history/{USER}"))[0] for _ in range(CALLS)]
+        print(f"{'  + per-user cache':<26}{sum(warm) / len(warm):>10.1f}{size:>10}")
+
+        # Walk every page with the cursor
+        seen, pages = await walk(client, USER, 25)
+        assert len(seen) == len(set(seen)) == 2 * ROWS_PER_TABLE, len(seen)
+        print(f"cursor pagination: {pages} pages, {len(seen)} rows, no duplicates")
+
+        # Rows sharing a created_at are split across pages without being skipped
+        seen, pages = await walk(client, BATCH_USER, 2)
+        assert len(seen) == len(set(seen)) == BATCH_SIZE + 1, seen
+        print(f"batch with one created_at: {pages} pages, {len(seen)} rows, no duplicates")
+
+        # A new analysis for the user drops the cached history once written
+        await client.post("/analyze-code", json={"code": "print('new')", "language": "python", "user_id": USER})
+        await main.write_queue.stop()
+        _, _, page = await timed(client, f"/history/{USER}")
+        assert page["code_analyses"][0]["code_hash"] == main.hashlib.sha256(b"print('new')").hexdigest()[:16]
+        print("cache invalidated after save:", json.dumps(page["code_analyses"][0]["analysis_results"]))
+
+        # A write that lands while a query is running keeps its result out of the cache
+        main.history_cache = main.ResultCache(ttl=30)
+        fetch = main.fetch_history_rows
+
+        def racing_fetch(table, user_id, cursor, limit):
+            rows = fetch(table, user_id, cursor, limit)
+            if table == "code_analyses":
+                main.invalidate_history(table, [{"user_id": user_id}])
+            return rows
+
+        main.fetch_history_rows = racing_fetch
+        await timed(client, f"/history/{USER}")
+        main.fetch_history_rows = fetch
+        assert main.history_cache.get(USER) is None
+        assert not main.history_inflight, main.history_inflight
+        print(f"write during query: result not cached, {len(main.history_inflight)} users tracked afterwards")
+
+
+def main_benchmark():
+    main.limiter.enabled = False
+    main.supabase = StubSupabase(latency=STORE_LATENCY)
+    populate(main.supabase)
+    print(f"{ROWS_PER_TABLE} rows per table, store latency {STORE_LATENCY * 1000:.0f} ms")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,97 @@
+"""
+Benchmark: the full provider x region x tier grid over several request
+volumes, computed as one calculate_hosting_impact call per cell (the old
+lookup dicts rebuilt on each call) vs. one vectorized hosting_impact_matrix
+pass. Checks every cell against calculate_hosting_impact and compares the
+JSON size of row-wise and columnar output.
+Run from the backend directory: python benchmarks/bench_hosting_matrix.py
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hosting_impact import PROVIDERS, REGIONS, TIERS, MATRIX_COLUMNS, hosting_impact_matrix, matrix_tables  # noqa: E402
+from main import calculate_hosting_impact  # noqa: E402
+
+VOLUMES = [1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000,
+           10_000_000, 25_000_000, 50_000_000, 100_000_000]
+REPEAT = 20
+
+
+def legacy_calculate_hosting_impact(provider, region, tier, monthly_requests):
+    """The old implementation: lookup dicts rebuilt on every call"""
+    carbon_intensity = {
+        'us-east': 415, 'us-west': 320, 'eu-west': 280, 'eu-north': 45,
+        'asia-east': 550, 'asia-south': 630, 'australia': 720, 'south-america': 180,
+    }
+    energy_per_request = {'serverless': 0.0000001, 'basic': 0.0000005, 'standard': 0.000001, 'premium': 0.000002}
+    provider_efficiency = {'aws': 1.0, 'gcp': 0.85, 'azure': 0.90, 'vercel': 0.88, 'netlify': 0.90, 'digitalocean': 1.05}
+    intensity = carbon_intensity.get(region, 400)
+    energy = energy_per_request.get(tier, 0.000001)
+    efficiency = provider_efficiency.get(provider, 1.0)
+    monthly_energy_kwh = monthly_requests * energy
+    monthly_co2_grams = monthly_energy_kwh * intensity * efficiency
+    cost_per_request = {'serverless': 0.0000002, 'basic': 0.000001, 'standard': 0.000003, 'premium': 0.000008}
+    monthly_cost = monthly_requests * cost_per_request.get(tier, 0.000001)
+    return {
+        "provider": provider, "region": region, "tier": tier, "monthly_requests": monthly_requests,
+        "monthly_energy_kwh": round(monthly_energy_kwh, 6),
+        "monthly_co2_grams": round(monthly_co2_grams, 2),
+        "monthly_co2_kg": round(monthly_co2_grams / 1000, 4),
+        "yearly_co2_kg": round((monthly_co2_grams * 12) / 1000, 2),
+        "estimated_monthly_cost_usd": round(monthly_cost, 2),
+        "carbon_intensity_region": intensity,
+        "provider_efficiency_score": efficiency,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def per_cell(fn):
+    rows = [fn(p, r, t, n) for p in PROVIDERS for r in REGIONS for t in TIERS for n in VOLUMES]
+    rows.sort(key=lambda row: row["monthly_co2_grams"])
+    return rows
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn()
+    return (time.perf_counter() - start) / REPEAT * 1000, result
+
+
+def main_benchmark():
+    matrix_tables()
+    legacy_ms, legacy_rows = timed(lambda: per_cell(legacy_calculate_hosting_impact))
+    current_ms, _ = timed(lambda: per_cell(calculate_hosting_impact))
+    matrix_ms, matrix = timed(lambda: hosting_impact_matrix(VOLUMES))
+
+    # Every cell must agree with the scalar calculation
+    columns = matrix["columns"]
+    dictionaries = matrix["dictionaries"]
+    mismatches = 0
+    for i in range(matrix["rows"]):
+        expected = calculate_hosting_impact(
+            dictionaries["provider"][columns["provider"][i]],
+            dictionaries["region"][columns["region"][i]],
+            dictionaries["tier"][columns["tier"][i]],
+            columns["monthly_requests"][i]
+        )
+        mismatches += any(expected[name] != columns[name][i] for name in MATRIX_COLUMNS)
+    sorted_ok = columns["monthly_co2_grams"] == sorted(columns["monthly_co2_grams"])
+
+    print(f"{matrix['rows']} cells ({len(PROVIDERS)} providers x {len(REGIONS)} regions x "
+          f"{len(TIERS)} tiers x {len(VOLUMES)} volumes)")
+    print(f"{'method':<34}{'ms':>10}{'json KB':>10}")
+    print(f"{'per cell, dicts per call (old)':<34}{legacy_ms:>10.2f}{len(json.dumps(legacy_rows)) / 1024:>10.1f}")
+    print(f"{'per cell, module tables':<34}{current_ms:>10.2f}")
+    print(f"{'vectorized matrix, columnar':<34}{matrix_ms:>10.2f}{len(json.dumps(matrix)) / 1024:>10.1f}")
+    print(f"mismatched cells: {mismatches}, sorted by monthly_co2_grams: {sorted_ok}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
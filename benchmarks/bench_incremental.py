@@ -0,0 +1,196 @@
+"""
+Benchmark: re-analysis after a small edit, as a full calculate_code_metrics
+scan vs. reanalyze_regions from the cached regions of the previous version.
+Checks on random edits (including ones that open strings, comments and
+loops, and def/function before blank lines at a region boundary) that
+the region counts equal a full scan_code, then times typical
+editor edits per language and the /analyze-code/incremental round trip
+(diff against the previous code_hash) against /analyze-code.
+Run from the backend directory: python benchmarks/bench_incremental.py
+"""
+
+import asyncio
+import difflib
+import json
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from bench_suite import generate_code  # noqa: E402
+from code_metrics import (  # noqa: E402
+    analyze_regions, calculate_code_metrics, reanalyze_regions, regions_counts, scan_code, score_metrics
+)
+from main import SUPPORTED_LANGUAGES, escaped_length, sanitize_input  # noqa: E402
+
+SIZE = 10000  # what /analyze-code analyzes at most
+FUZZ_EDITS = 2000
+REQUESTS = 200
+
+# Fragments that change the state carried between lines
+FRAGMENTS = [
+    "for x in y:\n", "    while True:\n", "'''\n", '"""', "/*", "*/", "`", "\\\n",
+    "def\n", "def fetch_rows():\n", "requests.get(", "{", "}", "(", ")", "do {",
+    "} while (x);\n", "for (int i = 0; i < n; i++) {\n", "select * from t\n", "\n", "  ",
+    "// Helper function\n\n", "def", "function", "\n\n",
+]
+
+# A JavaScript file whose first region ends after a comment and a blank
+# line; the edit makes the comment end in "function", which names the
+# recursive walk() on the far side of the boundary
+BOUNDARY_CODE = (
+    "let a = 1;\n" * 70 + "// Helper\n\n"
+    + ("walk(n) { return walk(n - 1) + " + " + ".join(["n"] * 80) + "; }\n") * 10
+)
+BOUNDARY_EDIT = BOUNDARY_CODE.replace("// Helper\n", "// Helper function\n", 1)
+
+
+def random_edit(code: str, rng: random.Random) -> str:
+    start = rng.randint(0, len(code))
+    end = min(len(code), start + rng.choice([0, 0, 1, 5, 40]))
+    insert = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 3)))
+    return code[:start] + insert + code[end:]
+
+
+def editor_edits(code: str):
+    """(name, new code) for typical single edits"""
+    lines = code.splitlines(keepends=True)
+    middle = len(lines) // 2
+    yield "change a line (middle)", "".join(lines[:middle] + ["    total += 1\n"] + lines[middle + 1:])
+    yield "insert a line (start)", "".join(lines[:2] + ["import os\n"] + lines[2:])
+    yield "delete 3 lines (end)", "".join(lines[:-4] + lines[-1:])
+    yield "paste 40 lines (middle)", "".join(lines[:middle] + lines[:40] + lines[middle:])
+
+
+def check_parity():
+    rng = random.Random(11)
+    for _ in range(FUZZ_EDITS):
+        language = rng.choice(SUPPORTED_LANGUAGES)
+        code = generate_code(language, rng.choice([500, 3000, SIZE]), seed=rng.randint(0, 99))
+        regions = analyze_regions(code, language)
+        assert regions_counts(regions) == scan_code(code, language)
+        regions = json.loads(json.dumps(regions))  # as read back from the disk tier
+        new_code = code
+        for _ in range(rng.randint(1, 3)):
+            new_code = random_edit(new_code, rng)
+        new_regions, _ = reanalyze_regions(code, regions, new_code, language)
+        assert regions_counts(new_regions) == scan_code(new_code, language), (language, new_code[:60])
+
+    regions = analyze_regions(BOUNDARY_CODE, "javascript")
+    assert len(regions) > 1 and regions[0]["length"] == BOUNDARY_CODE.index("walk(")
+    new_regions, _ = reanalyze_regions(BOUNDARY_CODE, regions, BOUNDARY_EDIT, "javascript")
+    assert regions_counts(new_regions) == scan_code(BOUNDARY_EDIT, "javascript")
+    assert scan_code(BOUNDARY_EDIT, "javascript")["recursion"] == 1
+    print(f"parity: {FUZZ_EDITS} random edits, and 'function' moved up to a blank-line boundary, "
+          f"give the same counts as a full scan")
+
+
+def per_edit_timings():
+    print(f"{'language':<12}{'edit':<26}{'full us':>10}{'incr us':>10}{'regions':>10}")
+    for language in SUPPORTED_LANGUAGES:
+        original = generate_code(language, SIZE)
+        code = sanitize_input(original)
+        regions = analyze_regions(code, language)
+        for name, new_original in editor_edits(original):
+            # Cut to SIZE like /analyze-code does, so the end of the text changes too
+            new_code = sanitize_input(new_original)
+            shift = escaped_length(new_original) - escaped_length(original)
+            full = min(timeit.repeat(lambda: calculate_code_metrics(new_code, language), repeat=5, number=20)) / 20
+
+            def incremental():
+                new_regions, _ = reanalyze_regions(code, regions, new_code, language, shift)
+                return score_metrics(regions_counts(new_regions))
+
+            incr = min(timeit.repeat(incremental, repeat=5, number=20)) / 20
+            new_regions, scanned = reanalyze_regions(code, regions, new_code, language, shift)
+            assert regions_counts(new_regions) == scan_code(new_code, language)
+            print(f"{language:<12}{name:<26}{full * 1e6:>10.1f}{incr * 1e6:>10.1f}{f'{scanned}/{len(new_regions)}':>10}")
+
+
+async def end_to_end():
+    """Mean us per request while editing one line at a time"""
+    code = generate_code("python", SIZE)
+    lines = code.splitlines(keepends=True)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/analyze-code/incremental", json={"code": code, "language": "python"})
+        code_hash = response.json()["code_hash"]
+
+        versions = []
+        for i in range(REQUESTS):
+            changed = list(lines)
+            changed[(i * 7) % len(lines)] = f"    count_{i} = {i}\n"
+            versions.append("".join(changed))
+
+        diffs = []
+        previous = code
+        for new_code in versions:
+            diffs.append("".join(difflib.unified_diff(
+                previous.splitlines(keepends=True), new_code.splitlines(keepends=True), n=0
+            )))
+            previous = new_code
+
+        timings = {}
+        start = time.perf_counter()
+        for new_code in versions:
+            response = await client.post("/analyze-code", json={"code": new_code, "language": "python"})
+            assert response.status_code == 200, response.text
+        timings["full"] = (time.perf_counter() - start) / REQUESTS * 1e6
+
+        expected = response.json()["analysis"]
+        start = time.perf_counter()
+        for diff in diffs:
+            response = await client.post("/analyze-code/incremental", json={
+                "code_hash": code_hash, "diff": diff, "language": "python"
+            })
+            assert response.status_code == 200, response.text
+            code_hash = response.json()["code_hash"]
+        timings["incremental"] = (time.perf_counter() - start) / REQUESTS * 1e6
+
+        actual = response.json()["analysis"]
+        expected.pop("timestamp")
+        actual.pop("timestamp")
+        assert actual == expected, "incremental and full analyses differ"
+
+        # The boundary case through the endpoint, against a full analysis
+        response = await client.post("/analyze-code/incremental", json={"code": BOUNDARY_CODE, "language": "javascript"})
+        diff = "".join(difflib.unified_diff(
+            BOUNDARY_CODE.splitlines(keepends=True), BOUNDARY_EDIT.splitlines(keepends=True), n=0
+        ))
+        incremental = (await client.post("/analyze-code/incremental", json={
+            "code_hash": response.json()["code_hash"], "diff": diff, "language": "javascript"
+        })).json()["analysis"]
+        full = (await client.post("/analyze-code", json={"code": BOUNDARY_EDIT, "language": "javascript"})).json()["analysis"]
+        incremental.pop("timestamp")
+        full.pop("timestamp")
+        assert incremental == full, (incremental, full)
+
+        # A diff that does not match the stored code is rejected
+        response = await client.post("/analyze-code/incremental", json={
+            "code_hash": code_hash, "diff": "@@ -1 +1 @@\n-not the first line\n+x = 1\n", "language": "python"
+        })
+        assert response.status_code == 422 and "Diff does not apply" in response.json()["detail"], response.text
+        return timings
+
+
+def main_benchmark():
+    main.limiter.enabled = False
+    check_parity()
+    print()
+    per_edit_timings()
+    print()
+    timings = asyncio.run(end_to_end())
+    print(f"end to end, {REQUESTS} one-line edits of {SIZE // 1000} KB of Python")
+    print(f"  /analyze-code              {timings['full']:>8.1f} us/request")
+    print(f"  /analyze-code/incremental  {timings['incremental']:>8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,221 @@
+"""
+Benchmark: synchronous /analyze-github vs. the /jobs background queue with
+a slow upstream (mock GitHub server and stub Gemini model). Compares how
+long HTTP connections stay open for the same batch of repositories, then
+checks deduplication of identical AI jobs, priority ordering, the
+server-sent event stream of a deep analysis, expiry of finished jobs and
+that cancelling a job before its task first runs frees its worker.
+Run from the backend directory: python benchmarks/bench_jobs.py
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("GITHUB_CACHE_PATH", "")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from job_queue import JobQueue  # noqa: E402
+from mock_github import create_mock_github, ServerThread  # noqa: E402
+from stub_gemini import StubGeminiModel  # noqa: E402
+
+UPSTREAM_LATENCY = 0.5
+REPOS = 40
+WORKERS = 4
+POLL_INTERVAL = 0.25
+AI_PAYLOAD = {
+    "code": "for a in items:\n    for b in items:\n        print(a, b)",
+    "language": "python",
+    "analysis_results": {
+        "scores": {"cpu_score": 40, "network_score": 0, "memory_score": 10},
+        "metrics": {"loops": 2, "api_calls": 0}
+    }
+}
+
+
+def fresh_queue(**kwargs) -> JobQueue:
+    main.job_queue = JobQueue(**{"workers": WORKERS, **kwargs})
+    return main.job_queue
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def sync_batch(client: httpx.AsyncClient):
+    results = await asyncio.gather(*(
+        timed(client.post("/analyze-github", json={"repo_url": f"https://github.com/octo/sync-{i}"}))
+        for i in range(REPOS)
+    ))
+    assert all(response.status_code == 200 for response, _ in results)
+    return [seconds for _, seconds in results]
+
+
+async def job_batch(client: httpx.AsyncClient):
+    """Submit every repository, then poll until all jobs finish; returns (submit, poll) seconds"""
+    submits = await asyncio.gather(*(
+        timed(client.post("/jobs/analyze-github", json={"repo_url": f"https://github.com/octo/job-{i}"}))
+        for i in range(REPOS)
+    ))
+    assert all(response.status_code == 202 for response, _ in submits)
+    pending = {response.json()["job_id"] for response, _ in submits}
+    polls = []
+    while pending:
+        await asyncio.sleep(POLL_INTERVAL)
+        for job_id in list(pending):
+            response, seconds = await timed(client.get(f"/jobs/{job_id}"))
+            polls.append(seconds)
+            status = response.json()["status"]
+            if status in ("succeeded", "failed"):
+                assert status == "succeeded", response.json()
+                pending.discard(job_id)
+    return [seconds for _, seconds in submits], polls
+
+
+async def check_dedup(client: httpx.AsyncClient):
+    fresh_queue()
+    main.model = StubGeminiModel(latency=UPSTREAM_LATENCY)
+    responses = await asyncio.gather(*(
+        client.post("/jobs/ai-optimize", json={**AI_PAYLOAD, "priority": "normal"}) for _ in range(20)
+    ))
+    job_ids = {response.json()["job_id"] for response in responses}
+    assert len(job_ids) == 1, job_ids
+    assert sum(response.json()["deduplicated"] for response in responses) == 19
+    job_id = job_ids.pop()
+    while (await client.get(f"/jobs/{job_id}")).json()["status"] != "succeeded":
+        await asyncio.sleep(0.05)
+    snapshot = (await client.get(f"/jobs/{job_id}")).json()
+    assert main.model.calls == 1 and snapshot["submissions"] == 20
+    assert "ai_analysis" in snapshot["result"]
+    print("dedup: 20 identical AI submissions -> 1 job, 1 model call")
+
+
+async def check_priorities(client: httpx.AsyncClient):
+    fresh_queue(workers=1)
+    order = []
+    for i, priority in enumerate(["normal", "low", "low", "normal", "high"]):
+        response = await client.post("/jobs/analyze-github", json={
+            "repo_url": f"https://github.com/octo/priority-{i}", "priority": priority
+        })
+        order.append((priority, response.json()["job_id"]))
+    while main.job_queue.stats()["succeeded"] < len(order):
+        await asyncio.sleep(0.05)
+    started = sorted(order, key=lambda item: main.job_queue.get(item[1]).started_at)
+    # The first job was already running; the rest start by priority, then submission order
+    assert [priority for priority, _ in started] == ["normal", "high", "normal", "low", "low"], started
+    print(f"priorities: start order {[priority for priority, _ in started]}")
+
+
+async def check_events(client: httpx.AsyncClient):
+    fresh_queue()
+    response = await client.post("/jobs/analyze-github", json={"repo_url": "https://github.com/octo/deep", "deep": True})
+    job_id = response.json()["job_id"]
+    events = []
+    async with client.stream("GET", f"/jobs/{job_id}/events") as stream:
+        async for line in stream.aiter_lines():
+            if line.startswith("data: "):
+                snapshot = json.loads(line[len("data: "):])
+                events.append((snapshot["status"], snapshot["progress"].get("stage")))
+    assert events[-1][0] == "succeeded", events
+    assert ("running", "fetching_metadata") in events and ("running", "analyzing_files") in events, events
+    stages = []
+    for event in events:
+        if not stages or stages[-1] != event:
+            stages.append(event)
+    print(f"events: {len(events)} updates, {' -> '.join(f'{status}/{stage}' for status, stage in stages)}")
+
+
+async def check_retention(client: httpx.AsyncClient):
+    fresh_queue(retention=0.5)
+    response = await client.post("/jobs/analyze-github", json={"repo_url": "https://github.com/octo/retained"})
+    job_id = response.json()["job_id"]
+    while (await client.get(f"/jobs/{job_id}")).json()["status"] != "succeeded":
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.6)
+    assert (await client.get(f"/jobs/{job_id}")).status_code == 404
+    assert main.job_queue.stats()["expired"] == 1
+    print("retention: finished job returned 404 once JOB_RETENTION_SECONDS passed")
+
+
+async def check_cancel_before_start():
+    queue = fresh_queue(workers=1)
+
+    async def work(job):
+        await asyncio.sleep(0.01)
+        return job.key
+
+    # The task exists but has not taken its first step yet
+    job, _ = queue.submit("probe", "cancelled", work)
+    assert job.status == "running"
+    queue.cancel(job.id)
+    await asyncio.gather(job._task, return_exceptions=True)
+    assert job.status == "cancelled" and queue.stats()["running"] == 0, queue.stats()
+    follower, _ = queue.submit("probe", "follower", work)
+    while not follower.done:
+        await asyncio.sleep(0.01)
+    assert follower.status == "succeeded"
+
+    for i in range(3):
+        queue.submit("probe", f"stopped-{i}", work)
+    await queue.stop()
+    stats = queue.stats()
+    assert stats["running"] == stats["queued"] == 0 and stats["cancelled"] == 4, stats
+    print("cancel before start: worker freed, next job ran; stop() left no running or queued jobs")
+
+
+async def run():
+    main.limiter.enabled = False
+    main.WARM_UP_INTEGRATIONS = False  # the stub model stands in for the SDK
+    server = ServerThread(create_mock_github(latency=UPSTREAM_LATENCY)).start()
+    try:
+        await main.close_github_client()
+        main.GITHUB_API_URL = server.url
+        main.github_cache = main.GitHubResponseCache(fresh_for=0)
+        main.GEMINI_API_KEY = "stub"
+        fresh_queue()
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            start = time.perf_counter()
+            sync = await sync_batch(client)
+            sync_wall = time.perf_counter() - start
+
+            start = time.perf_counter()
+            submits, polls = await job_batch(client)
+            jobs_wall = time.perf_counter() - start
+
+            print(f"{REPOS} repositories, {UPSTREAM_LATENCY:g} s upstream latency, {WORKERS} job workers")
+            print(f"{'mode':<8}{'requests':>10}{'p50 ms':>10}{'max ms':>10}{'open s':>10}{'wall s':>10}")
+            print(f"{'sync':<8}{len(sync):>10}{statistics.median(sync) * 1e3:>10.1f}{max(sync) * 1e3:>10.1f}"
+                  f"{sum(sync):>10.2f}{sync_wall:>10.2f}")
+            held = submits + polls
+            print(f"{'jobs':<8}{len(held):>10}{statistics.median(held) * 1e3:>10.1f}{max(held) * 1e3:>10.1f}"
+                  f"{sum(held):>10.2f}{jobs_wall:>10.2f}")
+            print(f"submit: p50 {statistics.median(submits) * 1e3:.1f} ms, max {max(submits) * 1e3:.1f} ms")
+            print()
+
+            await check_dedup(client)
+            await check_priorities(client)
+            await check_events(client)
+            await check_retention(client)
+            await check_cancel_before_start()
+    finally:
+        await main.job_queue.stop()
+        await main.close_github_client()
+        if main.analysis_pool is not None:
+            main.analysis_pool.shutdown()
+        server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,394 @@
+"""
+Load test: runs the API under uvicorn with each requested number of worker
+processes, with local stand-ins for GitHub (a mock server in its own
+process), Gemini and Supabase (stubs inside every worker) whose latency
+and error rates are configurable. Closed-loop clients drive mixed traffic
+across /analyze-code, /analyze-github, /ai-optimize, /hosting-impact and
+/history, then each endpoint alone, stepping the number of clients up
+until throughput stops growing. Reports p50/p95/p99 latency, throughput
+and the saturation point per endpoint and worker count.
+
+Rate limits are bypassed unless --rate-limits is given, in which case 429
+responses are counted and left out of the throughput. The load generator
+is a single process: when its CPU column nears 100% the figures are a
+floor for what the server can do.
+Run from the backend directory: python benchmarks/bench_load.py --help
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import product
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+from bench_suite import generate_code  # noqa: E402
+from hosting_impact import PROVIDERS, REGIONS, TIERS  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ["analyze-code", "analyze-github", "ai-optimize", "hosting-impact", "history"]
+DEFAULT_MIX = "analyze-code=40,analyze-github=15,ai-optimize=5,hosting-impact=25,history=15"
+
+# Distinct inputs per endpoint; repeats are answered from the API's caches
+CODE_VARIANTS = 200
+REPOS = 500
+AI_VARIANTS = 1000
+USERS = 20
+HISTORY_ROWS_PER_USER = 40
+
+# A step that raises goodput by less than this over the best so far adds no capacity
+SATURATION_GAIN = 0.10
+STARTUP_TIMEOUT = 60
+
+
+def create_app():
+    """
+    uvicorn factory run in every worker process: the API with the Gemini and
+    Supabase stubs swapped in, configured from LOADTEST_CONFIG
+    """
+    # Imported here so the load generator and the GitHub stand-in processes do not load the API
+    import main
+    from stub_gemini import StubGeminiModel
+    from stub_supabase import StubSupabase
+
+    config = json.loads(os.environ["LOADTEST_CONFIG"])
+    main.supabase = StubSupabase(config["supabase_latency"], config["supabase_error_rate"], seed=os.getpid())
+    populate_history(main.supabase)
+    main.model = StubGeminiModel(config["gemini_latency"], config["gemini_error_rate"], seed=os.getpid())
+    main.limiter.enabled = config["rate_limits"]
+    return main.app
+
+
+def create_github():
+    """uvicorn factory for the GitHub stand-in, configured from LOADTEST_CONFIG"""
+    from mock_github import create_mock_github
+
+    config = json.loads(os.environ["LOADTEST_CONFIG"])
+    return create_mock_github(
+        latency=config["github_latency"], rate_limit=10 ** 9, error_rate=config["github_error_rate"]
+    )
+
+
+def populate_history(store):
+    analysis = {
+        "metrics": {"loops": 3, "nested_loops": 1, "api_calls": 2},
+        "green_score": 71.5, "co2_estimate_grams": 0.0213, "rating": "Good"
+    }
+    for user in range(USERS):
+        for i in range(HISTORY_ROWS_PER_USER):
+            store.tables.setdefault("code_analyses", []).append({
+                "id": user * HISTORY_ROWS_PER_USER + i, "user_id": f"load-user-{user}", "language": "python",
+                "code_hash": f"{user:04x}{i:012x}", "analysis_results": analysis,
+                "created_at": f"2025-01-01T{i // 60:02d}:{i % 60:02d}:00"
+            })
+
+
+def build_payloads() -> Dict[str, List[Tuple[str, str, Optional[Dict[str, Any]]]]]:
+    """(method, path, JSON body) choices per endpoint"""
+    languages = ["python", "javascript", "java"]
+    comment = {"python": "#", "javascript": "//", "java": "//"}
+    code = [
+        generate_code(languages[i % len(languages)], 2000, seed=i) for i in range(CODE_VARIANTS)
+    ]
+    return {
+        "analyze-code": [
+            ("POST", "/analyze-code", {
+                "code": code[i], "language": languages[i % len(languages)], "user_id": f"load-user-{i % USERS}"
+            })
+            for i in range(CODE_VARIANTS)
+        ],
+        "analyze-github": [
+            ("POST", "/analyze-github", {"repo_url": f"https://github.com/load-org/repo-{i}"}) for i in range(REPOS)
+        ],
+        "ai-optimize": [
+            ("POST", "/ai-optimize", {
+                "code": f"{code[i % CODE_VARIANTS]}\n{comment[languages[i % len(languages)]]} variant {i}",
+                "language": languages[i % len(languages)],
+                "analysis_results": {
+                    "scores": {"cpu_score": 40, "network_score": 10, "memory_score": 5},
+                    "metrics": {"loops": 3, "api_calls": 1}
+                }
+            })
+            for i in range(AI_VARIANTS)
+        ],
+        "hosting-impact": [
+            ("POST", "/hosting-impact", {
+                "provider": provider, "region": region, "tier": tier, "monthly_requests": 10 ** (3 + i % 5)
+            })
+            for i, (provider, region, tier) in enumerate(product(PROVIDERS, REGIONS, TIERS))
+        ],
+        "history": [("GET", f"/history/load-user-{i}", None) for i in range(USERS)],
+    }
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(factory: str, workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """Start `uvicorn <factory>` in a subprocess and wait until it answers"""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", f"bench_load:{factory}", "--factory", "--app-dir", BENCH_DIR,
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log"
+        ],
+        env={**os.environ, **env}
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{factory} exited with status {process.returncode}")
+        try:
+            httpx.get(url + "/health", timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f"{factory} did not start within {STARTUP_TIMEOUT} s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return float("nan")
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: List[Tuple[int, float]], elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles (ms) of successful responses, goodput and status counts"""
+    ok = sorted(latency for status, latency in samples if 200 <= status < 300)
+    statuses: Dict[str, int] = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "throughput": len(ok) / elapsed,
+        "p50_ms": percentile(ok, 50) * 1e3,
+        "p95_ms": percentile(ok, 95) * 1e3,
+        "p99_ms": percentile(ok, 99) * 1e3,
+        "ok_ratio": len(ok) / len(samples) if samples else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def drive(
+    url: str,
+    payloads: Dict[str, list],
+    weights: Dict[str, float],
+    clients: int,
+    duration: float,
+    seed: int = 0
+) -> Tuple[Dict[str, List[Tuple[int, float]]], float, float]:
+    """
+    `clients` closed-loop clients send requests, picked by weight, for
+    `duration` seconds. Returns (status, seconds) samples per endpoint, the
+    elapsed time and the load generator's CPU use (1.0 = one core).
+    Connection failures and timeouts are recorded as status 0.
+    """
+    names = list(weights)
+    samples: Dict[str, List[Tuple[int, float]]] = {name: [] for name in names}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def run_client(number: int):
+            rng = random.Random(f"{seed}:{number}")
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, [weights[n] for n in names])[0]
+                method, path, body = rng.choice(payloads[name])
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    await response.aread()
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 0
+                samples[name].append((status, time.perf_counter() - start))
+
+        cpu = time.process_time()
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(run_client(number) for number in range(clients)))
+        elapsed = time.perf_counter() - start
+    return samples, elapsed, (time.process_time() - cpu) / elapsed
+
+
+def step_load(
+    url: str,
+    payloads: Dict[str, list],
+    weights: Dict[str, float],
+    levels: List[int],
+    duration: float
+) -> Dict[str, Any]:
+    """
+    Run each client count in turn until two steps in a row fail to raise
+    goodput by SATURATION_GAIN over the best step. The saturation point is
+    that best step: the fewest clients reaching the highest throughput.
+    """
+    steps = []
+    best = None
+    stalled = 0
+    for clients in levels:
+        samples, elapsed, cpu = asyncio.run(drive(url, payloads, weights, clients, duration, seed=clients))
+        every = [sample for endpoint in samples.values() for sample in endpoint]
+        step = {
+            "clients": clients,
+            "client_cpu": cpu,
+            **summarize(every, elapsed),
+            "endpoints": {name: summarize(endpoint, elapsed) for name, endpoint in samples.items()},
+        }
+        steps.append(step)
+        print_step(step)
+        if best is None or step["throughput"] > best["throughput"] * (1 + SATURATION_GAIN):
+            best = step
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled == 2:
+                break
+    return {"steps": steps, "saturation": best, "saturated": best is not steps[-1]}
+
+
+def print_step(step: Dict[str, Any]):
+    errors = ", ".join(f"{status}: {count}" for status, count in sorted(step["statuses"].items())
+                       if not status.startswith("2"))
+    print(f"  {step['clients']:>7}{step['throughput']:>10.1f}{step['p50_ms']:>9.1f}{step['p95_ms']:>9.1f}"
+          f"{step['p99_ms']:>9.1f}{step['ok_ratio'] * 100:>7.1f}%{step['client_cpu'] * 100:>8.0f}%  {errors}")
+
+
+def run_workers(args, workers: int, github_url: str, payloads, mix: Dict[str, float]) -> Dict[str, Any]:
+    rate_limit_path = os.path.join(tempfile.gettempdir(), f"ecocode-loadtest-{os.getpid()}-{workers}")
+    app, url = start_server("create_app", workers, {
+        "LOADTEST_CONFIG": json.dumps(stand_in_config(args)),
+        "GITHUB_API_URL": github_url,
+        "GITHUB_CACHE_PATH": "",
+        "GEMINI_API_KEY": "loadtest",
+        "WARM_UP_INTEGRATIONS": "false",
+        "RATE_LIMIT_PATH": rate_limit_path,
+    })
+    results = {}
+    try:
+        # Start the analysis pools and fill the import caches before measuring
+        asyncio.run(drive(url, payloads, mix, clients=4, duration=args.warmup))
+        scenarios = [("mixed", mix)] + [(name, {name: 1.0}) for name in ENDPOINTS if name in args.endpoints]
+        for name, weights in scenarios:
+            print(f"\n{workers} worker(s), {name}")
+            print(f"  {'clients':>7}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'2xx':>8}"
+                  f"{'gen cpu':>9}  other statuses")
+            results[name] = step_load(url, payloads, weights, args.levels, args.duration)
+    finally:
+        stop_server(app)
+        if os.path.exists(rate_limit_path):
+            os.remove(rate_limit_path)
+    return results
+
+
+def stand_in_config(args) -> Dict[str, Any]:
+    return {
+        "github_latency": args.github_latency,
+        "github_error_rate": args.github_errors,
+        "gemini_latency": args.gemini_latency,
+        "gemini_error_rate": args.gemini_errors,
+        "supabase_latency": args.supabase_latency,
+        "supabase_error_rate": args.supabase_errors,
+        "rate_limits": args.rate_limits,
+    }
+
+
+def print_summary(results: Dict[int, Dict[str, Any]]):
+    print("\nsaturation points (fewest clients reaching the highest throughput)")
+    print(f"{'workers':>7}  {'scenario':<16}{'clients':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for workers, scenarios in results.items():
+        for name, result in scenarios.items():
+            point = result["saturation"]
+            clients = f"{point['clients']}" if result["saturated"] else f">={point['clients']}"
+            print(f"{workers:>7}  {name:<16}{clients:>8}{point['throughput']:>10.1f}{point['p50_ms']:>9.1f}"
+                  f"{point['p95_ms']:>9.1f}{point['p99_ms']:>9.1f}")
+            if name == "mixed":
+                for endpoint, stats in point["endpoints"].items():
+                    print(f"{'':>9}  {endpoint:<14}{'':>8}{stats['throughput']:>10.1f}{stats['p50_ms']:>9.1f}"
+                          f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    print("(\">=\": throughput was still growing at the largest client count)")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; choose from {ENDPOINTS}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_ints(text: str) -> List[int]:
+    return [int(value) for value in text.split(",")]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=parse_ints, default=[1, 2, 4], help="uvicorn worker counts (default 1,2,4)")
+    parser.add_argument("--levels", type=parse_ints, default=[1, 2, 4, 8, 16, 32, 64],
+                        help="concurrent client counts to step through (default 1,2,...,64)")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per step (default 3)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured traffic after start-up")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"weights of the mixed traffic (default {DEFAULT_MIX})")
+    parser.add_argument("--endpoints", type=lambda text: text.split(",") if text else [], default=ENDPOINTS,
+                        help="endpoints to also load on their own (default all; empty for mixed traffic only)")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the API's rate limits (bypassed by default)")
+    parser.add_argument("--github-latency", type=float, default=0.05, help="seconds (default 0.05)")
+    parser.add_argument("--github-errors", type=float, default=0.0, help="fraction of 502 responses")
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="seconds (default 1.0)")
+    parser.add_argument("--gemini-errors", type=float, default=0.0, help="fraction of failed calls")
+    parser.add_argument("--supabase-latency", type=float, default=0.02, help="seconds (default 0.02)")
+    parser.add_argument("--supabase-errors", type=float, default=0.0, help="fraction of failed calls")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    payloads = build_payloads()
+    github, github_url = start_server("create_github", 1, {"LOADTEST_CONFIG": json.dumps(stand_in_config(args))})
+    results = {}
+    try:
+        print(f"stand-ins: GitHub {args.github_latency * 1e3:.0f} ms / {args.github_errors:.0%} errors, "
+              f"Gemini {args.gemini_latency * 1e3:.0f} ms / {args.gemini_errors:.0%}, "
+              f"Supabase {args.supabase_latency * 1e3:.0f} ms / {args.supabase_errors:.0%}; "
+              f"rate limits {'on' if args.rate_limits else 'bypassed'}; {os.cpu_count()} CPUs")
+        for workers in args.workers:
+            results[workers] = run_workers(args, workers, github_url, payloads, args.mix)
+    finally:
+        stop_server(github)
+
+    print_summary(results)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"config": stand_in_config(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,118 @@
+"""
+Benchmark: cost of the /metrics instrumentation. Times a bare timer block,
+then /analyze-code end to end with metrics on and off (rate limiting
+disabled, in-process ASGI transport), and checks that the scraped
+/metrics output has the per-stage histograms, request counts and GitHub
+(mock server) and Gemini (stub model) upstream timings.
+Run from the backend directory: python benchmarks/bench_metrics.py
+"""
+
+import asyncio
+import os
+import re
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("GITHUB_CACHE_PATH", "")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from metrics import MetricsRegistry, STAGE_BUCKETS  # noqa: E402
+from mock_github import create_mock_github, ServerThread  # noqa: E402
+from stub_gemini import StubGeminiModel  # noqa: E402
+
+REQUESTS = 1000
+ROUNDS = 8
+CODE = "for row in rows:\n    for col in row:\n        total += col\n" * 20
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]\w*="([^"\\]|\\.)*",?)*\})? \S+$')
+
+
+def timer_cost_ns() -> float:
+    registry = MetricsRegistry()
+    registry.histogram("stage", "stage", ["route", "stage"], buckets=STAGE_BUCKETS)
+
+    def timed():
+        with registry.time("stage", "/analyze-code", "sanitize"):
+            pass
+
+    number = 200000
+    return min(timeit.repeat(timed, repeat=5, number=number)) / number * 1e9
+
+
+async def request_latency(client: httpx.AsyncClient, enabled: bool) -> float:
+    """Mean seconds per /analyze-code request"""
+    main.metrics.enabled = enabled
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = await client.post("/analyze-code", json={"code": CODE, "language": "python"})
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) / REQUESTS
+
+
+async def run():
+    main.limiter.enabled = False
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await request_latency(client, True)  # warm up
+
+        off, on = [], []
+        for _ in range(ROUNDS):
+            off.append(await request_latency(client, False))
+            on.append(await request_latency(client, True))
+        best_off, best_on = min(off), min(on)
+
+        print(f"timer block: {timer_cost_ns():.0f} ns")
+        print(f"/analyze-code, {REQUESTS} requests x {ROUNDS} rounds (cache hits after the first)")
+        print(f"{'metrics':<12}{'us/request':>12}")
+        print(f"{'off':<12}{best_off * 1e6:>12.1f}")
+        print(f"{'on':<12}{best_on * 1e6:>12.1f}")
+        print(f"overhead: {(best_on - best_off) * 1e6:.1f} us/request ({(best_on - best_off) / best_off:+.1%})")
+
+        # Upstream timings: GitHub against the mock server, Gemini against the stub model
+        server = ServerThread(create_mock_github(latency=0.02)).start()
+        try:
+            await main.close_github_client()
+            main.GITHUB_API_URL = server.url
+            main.github_cache = main.GitHubResponseCache(fresh_for=0)
+            main.model = StubGeminiModel(latency=0.05)
+            main.GEMINI_API_KEY = "stub"
+            response = await client.post("/analyze-github", json={"repo_url": "https://github.com/octo/demo"})
+            assert response.status_code == 200, response.text
+            response = await client.post("/ai-optimize", json={
+                "code": CODE, "language": "python", "analysis_results": main.calculate_code_metrics(CODE, "python")
+            })
+            assert response.status_code == 200, response.text
+        finally:
+            await main.close_github_client()
+            server.stop()
+
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        text = response.text
+
+    for line in text.splitlines():
+        assert line.startswith("# ") or SAMPLE_LINE.match(line), f"not Prometheus text format: {line!r}"
+
+    total = 1 + ROUNDS
+    expected = f'ecocode_http_requests_total{{method="POST",route="/analyze-code",status="200"}} {total * REQUESTS}'
+    assert expected in text, expected
+    for stage in ("validate", "sanitize", "hash", "cache_lookup", "code_metrics"):
+        assert f'route="/analyze-code",stage="{stage}",le="+Inf"' in text, stage
+    for upstream in ('upstream="github",outcome="2xx"', 'upstream="gemini",outcome="ok"'):
+        assert upstream in text, upstream
+
+    print()
+    print(f"/metrics: {len(text.splitlines())} lines, {len(text) / 1024:.1f} KB")
+    for line in text.splitlines():
+        if "_duration_seconds_count{" in line and "http_request" not in line:
+            print(" ", line)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
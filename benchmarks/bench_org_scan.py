@@ -0,0 +1,181 @@
+"""
+Benchmark: footprint estimates for every repository of an organization,
+as one /analyze-github call per repository (what clients did before) vs.
+a single streamed /analyze-github/org scan at several concurrency limits,
+against the mock GitHub server. Reports wall time, time to the first
+result, upstream requests and the peak number in flight, then checks
+parity with /analyze-github, the user listing fallback, unknown owners,
+max_repos, failed repositories in a deep scan and clients that leave
+mid-scan.
+Run from the backend directory: python benchmarks/bench_org_scan.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("GITHUB_CACHE_PATH", "")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from mock_github import create_mock_github, ServerThread  # noqa: E402
+
+UPSTREAM_LATENCY = 0.05
+ORG = "octo-org"
+ORG_REPOS = 250
+CONCURRENCY = [1, 4, 8, 16]
+ORGS = {
+    ORG: [f"repo-{i:03d}" for i in range(ORG_REPOS)],
+    "broken-org": ["service-a", "missing", "service-b"],
+}
+USERS = {"octocat": ["dotfiles", "hello-world", "spoon-knife"]}
+
+
+def reset_upstream(mock):
+    """Empty the GitHub response cache so every run goes upstream, and zero the mock's counters"""
+    main.github_cache = main.GitHubResponseCache(fresh_for=0)
+    mock.state.requests = 0
+    mock.state.peak_in_flight = 0
+
+
+async def scan(client: httpx.AsyncClient, body, limit_lines: int = None):
+    """(status, parsed NDJSON lines, seconds to the first line, total seconds)"""
+    start = time.perf_counter()
+    first = None
+    lines = []
+    async with client.stream("POST", "/analyze-github/org", json=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return response.status_code, [], None, time.perf_counter() - start
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            first = first or time.perf_counter() - start
+            lines.append(json.loads(line))
+            if limit_lines is not None and len(lines) >= limit_lines:
+                break
+    return response.status_code, lines, first, time.perf_counter() - start
+
+
+async def one_by_one(client: httpx.AsyncClient):
+    start = time.perf_counter()
+    first = None
+    results = {}
+    for name in ORGS[ORG]:
+        response = await client.post("/analyze-github", json={"repo_url": f"https://github.com/{ORG}/{name}"})
+        assert response.status_code == 200, response.text
+        results[name] = response.json()["analysis"]
+        first = first or time.perf_counter() - start
+    return results, first, time.perf_counter() - start
+
+
+def without_timestamp(analysis):
+    return {key: value for key, value in analysis.items() if key != "timestamp"}
+
+
+async def compare(client: httpx.AsyncClient, mock):
+    print(f"{ORG_REPOS} repositories, {UPSTREAM_LATENCY * 1e3:.0f} ms upstream latency")
+    print(f"{'mode':<32}{'first s':>9}{'wall s':>9}{'requests':>10}{'peak':>6}")
+
+    reset_upstream(mock)
+    expected, first, wall = await one_by_one(client)
+    print(f"{'/analyze-github per repo':<32}{first:>9.2f}{wall:>9.2f}{mock.state.requests:>10}"
+          f"{mock.state.peak_in_flight:>6}")
+
+    for concurrency in CONCURRENCY:
+        main.ORG_SCAN_CONCURRENCY = concurrency
+        reset_upstream(mock)
+        status, lines, first, wall = await scan(client, {"owner": ORG})
+        assert status == 200
+        summary = lines[-1]
+        assert summary["type"] == "summary" and summary["analyzed"] == ORG_REPOS and summary["failed"] == 0, summary
+        # Listing pages are fetched while analyses run, so one extra request can be in flight
+        assert mock.state.peak_in_flight <= concurrency + 1, mock.state.peak_in_flight
+        print(f"{f'/analyze-github/org, {concurrency:>2} at once':<32}{first:>9.2f}{wall:>9.2f}"
+              f"{mock.state.requests:>10}{mock.state.peak_in_flight:>6}")
+
+    repos = {line["repo_url"].rsplit("/", 1)[1]: line["analysis"] for line in lines[:-1]}
+    assert set(repos) == set(expected)
+    assert all(without_timestamp(repos[name]) == without_timestamp(expected[name]) for name in expected)
+    total = round(sum(analysis["impact_estimate"]["total_co2_monthly_grams"] for analysis in expected.values()), 4)
+    assert summary["total_co2_monthly_grams"] == total, (summary, total)
+    print(f"parity: all {ORG_REPOS} results equal /analyze-github; summary total {total} g CO2/month")
+
+
+async def check_edge_cases(client: httpx.AsyncClient, mock):
+    main.ORG_SCAN_CONCURRENCY = 8
+    _, lines, _, _ = await scan(client, {"owner": "octocat"})
+    assert lines[-1]["analyzed"] == len(USERS["octocat"]), lines[-1]
+    status, _, _, _ = await scan(client, {"owner": "nobody-here"})
+    assert status == 404, status
+    status, _, _, _ = await scan(client, {"owner": "bad--name"})
+    assert status == 422, status
+    _, lines, _, _ = await scan(client, {"owner": ORG, "max_repos": 10})
+    assert lines[-1]["analyzed"] == 10 and len(lines) == 11, lines[-1]
+    print("owners: user listing fallback, 404 for unknown owners, 422 for invalid names, max_repos honoured")
+
+    _, lines, _, _ = await scan(client, {"owner": "broken-org", "deep": True})
+    errors = [line for line in lines if line["type"] == "error"]
+    assert [line["repo_url"] for line in errors] == ["https://github.com/broken-org/missing"], errors
+    assert lines[-1]["analyzed"] == 2 and lines[-1]["failed"] == 1, lines[-1]
+    assert all("deep_analysis" in line["analysis"] for line in lines if line["type"] == "repo")
+    print(f"deep scan: 2 repositories analyzed, 1 error line ({errors[0]['error']})")
+
+    tarball_scan = main.analyze_repo_tarball
+    deep_running, deep_peak = 0, 0
+
+    async def counted_scan(*args, **kwargs):
+        nonlocal deep_running, deep_peak
+        deep_running += 1
+        deep_peak = max(deep_peak, deep_running)
+        try:
+            return await tarball_scan(*args, **kwargs)
+        finally:
+            deep_running -= 1
+
+    main.analyze_repo_tarball = counted_scan
+    try:
+        _, lines, _, _ = await scan(client, {"owner": ORG, "deep": True, "max_repos": 12})
+    finally:
+        main.analyze_repo_tarball = tarball_scan
+    assert lines[-1]["analyzed"] == 12 and deep_peak <= main.ORG_SCAN_DEEP_CONCURRENCY, (lines[-1], deep_peak)
+    print(f"deep scan, 12 repositories, {main.ORG_SCAN_CONCURRENCY} at once: "
+          f"at most {deep_peak} tarball scans in flight (ORG_SCAN_DEEP_CONCURRENCY={main.ORG_SCAN_DEEP_CONCURRENCY})")
+
+    main.ORG_SCAN_CONCURRENCY = 4
+    reset_upstream(mock)
+    await scan(client, {"owner": ORG}, limit_lines=5)
+    await asyncio.sleep(0.5)
+    sent = mock.state.requests
+    await asyncio.sleep(0.5)
+    assert mock.state.requests == sent, "upstream requests continued after the client left"
+    assert mock.state.in_flight == 0
+    print(f"disconnect: scan stopped after {sent} upstream requests of {ORG_REPOS + 3}")
+
+
+async def run():
+    main.limiter.enabled = False
+    main.WARM_UP_INTEGRATIONS = False
+    mock_app = create_mock_github(latency=UPSTREAM_LATENCY, rate_limit=100000, orgs=ORGS, users=USERS)
+    mock = ServerThread(mock_app).start()
+    main.GITHUB_API_URL = mock.url
+    # A real server: the in-process httpx transport buffers whole responses
+    server = ServerThread(main.app).start()
+    try:
+        async with httpx.AsyncClient(base_url=server.url, timeout=120) as client:
+            await compare(client, mock_app)
+            print()
+            await check_edge_cases(client, mock_app)
+    finally:
+        server.stop()
+        mock.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,122 @@
+"""
+Benchmark: rate-limit checks with slowapi's in-memory fixed windows vs.
+token buckets shared through a memory-mapped table. Measures hits/second
+in one process and across worker processes (distinct clients and one hot
+client), checks how many of a burst get through when several workers
+enforce the same "20/minute" limit, and that the app returns 429 once a
+route's bucket is empty.
+Run from the backend directory: python benchmarks/bench_rate_limit.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse  # noqa: E402
+from slowapi import Limiter  # noqa: E402
+
+from rate_limit import SharedLimiter, SharedTokenBuckets  # noqa: E402
+
+HITS = 50000
+WORKERS = 4
+CLIENTS = 1000
+TABLE = os.path.join(tempfile.gettempdir(), "ecocode-ratelimit-bench")
+
+
+def make_limiter(backend: str):
+    key_func = lambda request: "unused"  # noqa: E731
+    if backend == "memory":
+        return Limiter(key_func=key_func).limiter
+    return SharedLimiter(key_func, SharedTokenBuckets(TABLE, 65536)).limiter
+
+
+def hammer(backend: str, hits: int, hot: bool, worker: int = 0) -> float:
+    """Seconds taken for `hits` checks against a limit nobody reaches"""
+    limiter = make_limiter(backend)
+    item = parse("100000000/minute")
+    keys = [f"10.{worker}.{i // 256}.{i % 256}" for i in range(CLIENTS)]
+    start = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(item, "/analyze-code", "10.0.0.1" if hot else keys[i % CLIENTS])
+    return time.perf_counter() - start
+
+
+def burst(backend: str, attempts: int, results):
+    limiter = make_limiter(backend)
+    item = parse("20/minute")
+    results.put(sum(limiter.hit(item, "/analyze-code", "203.0.113.9") for _ in range(attempts)))
+
+
+def run_workers(target, args_list):
+    context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+    results = context.Queue()
+    processes = [context.Process(target=target, args=(*args, results)) for args in args_list]
+    for process in processes:
+        process.start()
+    values = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return values
+
+
+def timed_worker(backend: str, hits: int, hot: bool, worker: int, results):
+    results.put(hammer(backend, hits, hot, worker))
+
+
+def reset_table():
+    if os.path.exists(TABLE):
+        os.remove(TABLE)
+
+
+async def check_app():
+    import httpx
+
+    os.environ["RATE_LIMIT_PATH"] = TABLE
+    import main
+
+    main.limiter.reset()
+    transport = httpx.ASGITransport(app=main.app)
+    payload = {"provider": "gcp", "region": "eu-north", "tier": "basic", "monthly_requests": 1000}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [(await client.post("/hosting-impact", json=payload)).status_code for _ in range(32)]
+    assert statuses[:30] == [200] * 30 and statuses[30:] == [429, 429], statuses
+    print(f"app ({type(main.limiter).__name__}): 30 x 200 then 429 on /hosting-impact (30/minute)")
+
+
+def main_benchmark():
+    print(f"{'backend':<22}{'clients':<10}{'processes':>10}{'hits/s':>14}")
+    for backend, label in (("memory", "memory (slowapi)"), ("shared", "shared token bucket")):
+        for hot in (False, True):
+            reset_table()
+            hammer(backend, 1000, hot)  # warm up
+            elapsed = hammer(backend, HITS, hot)
+            clients = "1 hot" if hot else str(CLIENTS)
+            print(f"{label:<22}{clients:<10}{1:>10}{HITS / elapsed:>14,.0f}")
+
+            reset_table()
+            times = run_workers(timed_worker, [(backend, HITS, hot, w) for w in range(WORKERS)])
+            print(f"{label:<22}{clients:<10}{WORKERS:>10}{HITS * WORKERS / max(times):>14,.0f}")
+
+    print()
+    print(f"{WORKERS} workers x 30 requests from one client against 20/minute:")
+    for backend in ("memory", "shared"):
+        reset_table()
+        allowed = run_workers(burst, [(backend, 30)] * WORKERS)
+        print(f"  {backend:<8} allowed {sum(allowed):>3} (per worker {allowed})")
+        if backend == "shared":
+            assert sum(allowed) == 20, allowed
+        else:
+            assert sum(allowed) == 20 * WORKERS, allowed
+
+    reset_table()
+    asyncio.run(check_app())
+    reset_table()
+
+
+if __name__ == "__main__":
+    main_benchmark()
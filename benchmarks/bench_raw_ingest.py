@@ -0,0 +1,136 @@
+"""
+Benchmark: ingesting a code submission as JSON (decode, CodeAnalysisRequest
+validators, sanitize_input, encode + sha256) vs. a raw text/plain body
+through ingest_raw_code. Checks both give the same sanitized code and
+hash (or both reject) over the generated corpus plus markup, non-ASCII
+and dangerous inputs, then compares time and peak memory per submission
+and end-to-end latency of /analyze-code vs. /analyze-code/raw.
+Run from the backend directory: python benchmarks/bench_raw_ingest.py
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from pydantic import ValidationError  # noqa: E402
+
+import main  # noqa: E402
+from bench_suite import SIZES, generate_code  # noqa: E402
+from main import CodeAnalysisRequest, SUPPORTED_LANGUAGES, ingest_raw_code, sanitize_input  # noqa: E402
+
+REQUESTS = 300
+
+
+def legacy_sanitize_input(text: str) -> str:
+    text = text.replace('<', '&lt;').replace('>', '&gt;')
+    return text[:10000]
+
+
+def json_ingest(body: bytes):
+    """What /analyze-code does before analysis: JSON decode, validate, sanitize, hash"""
+    payload = CodeAnalysisRequest(**json.loads(body))
+    sanitized = sanitize_input(payload.code)
+    return sanitized, hashlib.sha256(sanitized.encode()).hexdigest()
+
+
+def outcome(func, *args):
+    try:
+        return func(*args)
+    except (ValidationError, HTTPException):
+        return "rejected"
+
+
+def parity_inputs():
+    for language in SUPPORTED_LANGUAGES:
+        for size in SIZES.values():
+            code = generate_code(language, size)
+            yield code
+            yield code.replace("(", "<(>")                       # escaped markup
+            yield "# café ✓ ı\n" + code[:size - 12]               # non-ASCII
+            yield code[:size // 2] + "EVAL(x)" + code[size // 2:]  # dangerous, mixed case
+    yield "x" * main.CODE_MAX_LENGTH
+    yield "x" * (main.CODE_MAX_LENGTH + 1)
+    yield "é" * main.CODE_MAX_LENGTH                              # 100 KB of UTF-8, 50,000 characters
+    yield "é" * (main.CODE_MAX_LENGTH + 1)
+    yield "é" + "__import__('os')"
+    yield "<" * 20000
+
+
+def measure(func, body: bytes):
+    seconds = min(timeit.repeat(lambda: func(body), repeat=5, number=20)) / 20
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds * 1e6, peak
+
+
+async def end_to_end(size: int):
+    code = generate_code("python", size)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def json_request():
+            return await client.post("/analyze-code", json={"code": code, "language": "python"})
+
+        async def raw_request():
+            return await client.post(
+                "/analyze-code/raw?language=python",
+                content=code.encode(),
+                headers={"content-type": "text/plain; charset=utf-8"}
+            )
+
+        first_json, first_raw = (await json_request()).json(), (await raw_request()).json()
+        for result in (first_json, first_raw):
+            result["analysis"].pop("timestamp")
+        assert first_json == first_raw, "raw and JSON analyses differ"
+
+        timings = {}
+        for name, send in (("json", json_request), ("raw", raw_request)):
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                assert (await send()).status_code == 200
+            timings[name] = (time.perf_counter() - start) / REQUESTS * 1e6
+        return timings
+
+
+def main_benchmark():
+    main.limiter.enabled = False
+
+    checked = 0
+    for code in parity_inputs():
+        assert sanitize_input(code) == legacy_sanitize_input(code)
+        expected = outcome(json_ingest, json.dumps({"code": code, "language": "python"}).encode())
+        actual = outcome(ingest_raw_code, code.encode())
+        assert expected == actual, (code[:40], expected if expected == "rejected" else "accepted",
+                                    actual if actual == "rejected" else "accepted")
+        checked += 1
+    print(f"parity: {checked} inputs give the same sanitized code and hash (or both are rejected)")
+    print()
+
+    print(f"{'size':<8}{'json us':>10}{'raw us':>10}{'json peak KB':>14}{'raw peak KB':>13}")
+    for label, size in SIZES.items():
+        code = generate_code("python", size)
+        json_us, json_peak = measure(json_ingest, json.dumps({"code": code, "language": "python"}).encode())
+        raw_us, raw_peak = measure(ingest_raw_code, code.encode())
+        print(f"{label:<8}{json_us:>10.1f}{raw_us:>10.1f}{json_peak / 1024:>14.1f}{raw_peak / 1024:>13.1f}")
+
+    print()
+    print(f"end to end, {REQUESTS} requests each (cache hits)")
+    print(f"{'size':<8}{'/analyze-code us':>18}{'/raw us':>10}")
+    for label, size in SIZES.items():
+        timings = asyncio.run(end_to_end(size))
+        print(f"{label:<8}{timings['json']:>18.1f}{timings['raw']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
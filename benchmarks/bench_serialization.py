@@ -0,0 +1,133 @@
+"""
+Benchmark: response serialization and compression. For typical payloads
+(/, /health, an /analyze-code result, a hosting matrix, a history page and
+the old 40-row select("*") history) compares FastAPI's default path
+(jsonable_encoder + JSONResponse) with FastJSONResponse, and the bytes on
+the wire with gzip and brotli. Then checks end to end that large
+responses are compressed, small and streamed ones are not, and that the
+pre-serialized /health body is reused.
+Run from the backend directory: python benchmarks/bench_serialization.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("GITHUB_CACHE_PATH", "")
+
+import httpx  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import main  # noqa: E402
+import http_encoding  # noqa: E402
+from bench_history import USER, legacy_get_history, populate  # noqa: E402
+from bench_suite import generate_code  # noqa: E402
+from http_encoding import FastJSONResponse, compress  # noqa: E402
+from stub_supabase import StubSupabase  # noqa: E402
+
+HEALTH_HITS = 500
+
+
+def best_us(function, number: int = 200) -> float:
+    return min(timeit.repeat(function, repeat=5, number=number)) / number * 1e6
+
+
+async def collect_payloads(client: httpx.AsyncClient):
+    """(name, decoded JSON) of real responses"""
+    payloads = [("/", (await client.get("/")).json()), ("/health", (await client.get("/health")).json())]
+    response = await client.post("/analyze-code", json={"code": generate_code("python", 8000), "language": "python"})
+    payloads.append(("/analyze-code", response.json()))
+    response = await client.post("/hosting-impact/matrix", json={"monthly_requests": [10000, 1000000, 100000000]})
+    payloads.append(("/hosting-impact/matrix", response.json()))
+    payloads.append((f"/history (page of {main.HISTORY_PAGE_SIZE})", (await client.get(f"/history/{USER}")).json()))
+    payloads.append(("history, 40 full rows (old)", await legacy_get_history(USER)))
+    return payloads
+
+
+def serialization_table(payloads):
+    encodings = ["gzip"] + (["br"] if http_encoding.brotli is not None else [])
+    header = f"{'payload':<30}{'default us':>12}{'orjson us':>11}{'bytes':>9}"
+    for encoding in encodings:
+        header += f"{encoding + ' bytes':>12}{encoding + ' us':>9}"
+    print(header)
+    for name, payload in payloads:
+        default = JSONResponse(jsonable_encoder(payload)).body
+        fast = FastJSONResponse(payload).body
+        assert main.json.loads(default) == main.json.loads(fast), name
+        row = (f"{name:<30}{best_us(lambda: JSONResponse(jsonable_encoder(payload))):>12.1f}"
+               f"{best_us(lambda: FastJSONResponse(payload)):>11.1f}{len(fast):>9}")
+        for encoding in encodings:
+            compressed = compress(fast, encoding, main.GZIP_LEVEL, main.BROTLI_QUALITY)
+            us = best_us(lambda: compress(fast, encoding, main.GZIP_LEVEL, main.BROTLI_QUALITY), number=50)
+            row += f"{len(compressed):>12}{us:>9.1f}"
+        print(row)
+    if http_encoding.brotli is None:
+        print("(brotli is not installed: br is never offered)")
+
+
+async def check_wire(client: httpx.AsyncClient):
+    path = f"/history/{USER}"
+    plain = await client.get(path, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["vary"] == "Accept-Encoding"
+    sizes = [f"identity {plain.num_bytes_downloaded} B"]
+    for encoding in ["gzip"] + (["br"] if http_encoding.brotli is not None else []):
+        response = await client.get(path, headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert response.json() == plain.json()
+        sizes.append(f"{encoding} {response.num_bytes_downloaded} B")
+    print(f"{path}: {', '.join(sizes)} on the wire")
+
+    small = await client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers, "responses under COMPRESSION_MIN_SIZE are sent as they are"
+    async with client.stream("POST", "/ai-optimize/stream", headers={"Accept-Encoding": "gzip"}, json={
+        "code": "print(1)", "language": "python",
+        "analysis_results": {"scores": {"cpu_score": 1, "network_score": 0, "memory_score": 0},
+                             "metrics": {"loops": 0, "api_calls": 0}}
+    }) as stream:
+        assert "content-encoding" not in stream.headers, "streamed responses are not compressed"
+        await stream.aread()
+    print(f"not compressed: / ({small.num_bytes_downloaded} B, under {main.COMPRESSION_MIN_SIZE}), "
+          "server-sent events")
+
+
+async def check_health(client: httpx.AsyncClient):
+    timings = {}
+    for ttl in (0, 1):
+        main.HEALTH_CACHE_TTL = ttl
+        start = time.perf_counter()
+        for _ in range(HEALTH_HITS):
+            response = await client.get("/health")
+        timings[ttl] = (time.perf_counter() - start) / HEALTH_HITS * 1e6
+    assert response.json()["status"] == "healthy"
+    build = best_us(lambda: http_encoding.dumps(main.health_status()))
+    print(f"/health, {HEALTH_HITS} hits: rebuilt every hit {timings[0]:.0f} us/request, "
+          f"pre-serialized for 1 s {timings[1]:.0f} us/request (building the body takes {build:.0f} us)")
+
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        payloads = await collect_payloads(client)
+        serialization_table(payloads)
+        print()
+        await check_wire(client)
+        await check_health(client)
+
+
+def main_benchmark():
+    main.limiter.enabled = False
+    main.supabase = StubSupabase(latency=0)
+    populate(main.supabase)
+    print(f"orjson {'installed' if http_encoding.orjson is not None else 'not installed (json fallback)'}, "
+          f"brotli {'installed' if http_encoding.brotli is not None else 'not installed'}")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,87 @@
+"""
+Benchmark: cold start. Reports how long `import main` takes in a fresh
+interpreter and how long a fresh uvicorn process takes to answer /health,
+with Gemini configured. "eager" reproduces the old start-up, which imported
+the Gemini and Supabase SDKs (and NumPy) at module load and configured
+Gemini there; "lazy" is the current behaviour, where they load in the
+background after start-up. Supabase is left unconfigured so no client is
+built, but its import cost is still counted in the eager run.
+Run from the backend directory: python benchmarks/bench_startup.py
+"""
+
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+ENV = {
+    **os.environ,
+    "GEMINI_API_KEY": "stub",
+    "GITHUB_CACHE_PATH": "",
+}
+
+EAGER_PRELUDE = (
+    "import google.generativeai as genai, numpy\n"
+    "from supabase import create_client\n"
+    "genai.configure(api_key='stub'); genai.GenerativeModel('gemini-pro')\n"
+)
+
+IMPORT_SCRIPT = "import time\nstart = time.perf_counter()\n{prelude}import main\nprint((time.perf_counter() - start) * 1000)\n"
+
+SERVE_SCRIPT = "{prelude}import uvicorn\nuvicorn.run('main:app', host='127.0.0.1', port={port}, log_level='warning')\n"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_ms(prelude: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(prelude=prelude)],
+        cwd=BACKEND_DIR, env=ENV, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_response_ms(prelude: str) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVE_SCRIPT.format(prelude=prelude, port=port)],
+        cwd=BACKEND_DIR, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError("server exited before answering")
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main_benchmark():
+    print(f"median of {RUNS} fresh processes, Gemini configured")
+    print(f"{'start-up':<10}{'import main ms':>16}{'first /health ms':>18}")
+    for name, prelude in (("eager", EAGER_PRELUDE), ("lazy", "")):
+        imports = statistics.median(import_ms(prelude) for _ in range(RUNS))
+        first = statistics.median(first_response_ms(prelude) for _ in range(RUNS))
+        print(f"{name:<10}{imports:>16.0f}{first:>18.0f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
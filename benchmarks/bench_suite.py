@@ -0,0 +1,286 @@
+"""
+Microbenchmark suite for the analysis hot paths: calculate_code_metrics,
+sanitize_input, the CodeAnalysisRequest validators and the hosting impact
+model. Inputs come from a seeded corpus across all supported languages
+and sizes up to the 50 KB request limit, plus adversarial shapes for the
+loop-nesting tracker (and the regexes it replaced).
+
+Results can be saved as a JSON baseline and later runs compared against
+it; any case slower than the baseline by more than --threshold is flagged
+and the script exits with status 1, so it can gate CI.
+
+Run from the backend directory:
+    python benchmarks/bench_suite.py --save            # record a baseline
+    python benchmarks/bench_suite.py                   # compare against it
+    python benchmarks/bench_suite.py -k code_metrics   # only matching cases
+Baselines are only comparable on the same machine and Python version.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import ValidationError  # noqa: E402
+
+from code_metrics import calculate_code_metrics  # noqa: E402
+from hosting_impact import PROVIDERS, REGIONS, TIERS, hosting_impact_matrix  # noqa: E402
+from main import CodeAnalysisRequest, SUPPORTED_LANGUAGES, calculate_hosting_impact, sanitize_input  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "bench_suite.json")
+DEFAULT_THRESHOLD = 0.15
+
+# Sizes in characters; 50000 is the CodeAnalysisRequest limit
+SIZES = {"1KB": 1000, "10KB": 10000, "50KB": 50000}
+
+# Regressions smaller than this many microseconds per call are timer noise
+NOISE_FLOOR_US = 2.0
+
+# Seconds spent on each timing repeat
+TARGET_REPEAT_SECONDS = 0.05
+REPEATS = 5
+
+# Blocks the generated corpus is assembled from, per language. Python
+# blocks are emitted at a random indent so loops really nest.
+CORPUS_BLOCKS = {
+    "python": [
+        "for item in items:\n    total += item\n",
+        "for row in rows:\n    for col in row:\n        grid.append(col)\n",
+        "while queue:\n    node = queue.pop()\n    for child in node.children:\n        queue.append(child)\n",
+        "response = requests.get(url, timeout=5)\n",
+        "with open(path) as fh:\n    data = fh.read()\n",
+        "cursor.execute('SELECT * FROM users WHERE id = ?', (uid,))\n",
+        "def walk(node):\n    return walk(node.left) + walk(node.right)\n",
+        "text = '''multi\nline for while\nstring'''\n",
+        "values = [x * 2 for x in range(10)]  # for comprehension\n",
+        "result = compute(\n    value,\n    for_each=True,\n)\n",
+    ],
+    "javascript": [
+        "for (let i = 0; i < n; i++) {\n  sum += i;\n}\n",
+        "for (const a of list) {\n  for (const b of a) {\n    out.push(b);\n  }\n}\n",
+        "const res = await fetch('/api/items');\n",
+        "items.forEach(item => {\n  console.log(item);\n});\n",
+        "const data = fs.readFileSync('a.txt');\n",
+        "db.query('SELECT 1').then(rows => rows.map(r => r.id));\n",
+        "function walk(node) {\n  return node ? walk(node.next) : null;\n}\n",
+        "/* for (;;) { while (true) {} } */\n",
+        "const msg = `for ${name} while\n waiting`;\n",
+    ],
+    "typescript": [
+        "for (const key of Object.keys(map)) {\n  total += map[key];\n}\n",
+        "while (it.hasNext()) {\n  for (const x of it.next()) {\n    seen.add(x);\n  }\n}\n",
+        "const user: User = await axios.get(`/users/${id}`);\n",
+        "export function sum(xs: number[]): number {\n  return xs.reduce((a, b) => a + b, 0);\n}\n",
+        "// for loop in a comment\nlet count: number = 0;\n",
+    ],
+    "java": [
+        "for (int i = 0; i < n; i++) {\n    sum += i;\n}\n",
+        "while (it.hasNext()) {\n    for (String s : it.next()) {\n        out.add(s);\n    }\n}\n",
+        "ResultSet rs = stmt.executeQuery(\"SELECT 1\");\n",
+        "do {\n    line = reader.readLine();\n} while (line != null);\n",
+        "String text = \"for while do\";\n",
+    ],
+    "cpp": [
+        "for (int i = 0; i < n; ++i) {\n    sum += v[i];\n}\n",
+        "for (auto& row : grid) {\n    for (auto& cell : row) {\n        cell = 0;\n    }\n}\n",
+        "while (std::getline(file, line)) {\n    lines.push_back(line);\n}\n",
+        "/* block comment\n   for (;;) */\nint x = 0;\n",
+        "std::string s = \"while (true)\";\n",
+    ],
+}
+
+# Inputs aimed at the loop-nesting tracker: the shapes that made the old
+# nested_loops regexes backtrack, plus deep nesting, unterminated strings
+# and spans, and one enormous line
+ADVERSARIAL_INPUTS = {
+    "python": {
+        "for_while_run": ("for while " * 5000)[:50000],
+        "deep_indent": "".join(" " * (i % 200) + "for x in y:\n" for i in range(2000))[:50000],
+        "unterminated_strings": ("x = 'for while\n" * 4000)[:50000],
+        "open_triple_quote": ('"""' + "for i in x:\n    while y:\n" * 3000)[:50000],
+        "open_brackets": ("(" * 10000 + "\nfor x in y:\n") * 3,
+        "single_line": ("for(" * 12500)[:50000],
+    },
+    "javascript": {
+        "for_run": "for " * 12500,
+        "deep_braces": ("for(;;){" * 6000)[:50000],
+        "unbalanced_close": ("}" * 100 + "for (;;) {\n") * 450,
+        "open_block_comment": ("/*" + "for (;;) { while (x) {} }\n" * 2000)[:50000],
+        "template_toggles": ("`${for(;;){`" * 4500)[:50000],
+        "unterminated_strings": ("let s = \"for (;;) {\n" * 2500)[:50000],
+    },
+}
+
+
+def generate_code(language: str, size: int, seed: int = 7) -> str:
+    """Deterministic source of exactly `size` characters in `language`"""
+    rng = random.Random(f"{language}:{size}:{seed}")
+    blocks = CORPUS_BLOCKS[language]
+    parts = []
+    length = 0
+    while length < size:
+        block = rng.choice(blocks)
+        if language == "python" and rng.random() < 0.3:
+            indent = " " * (4 * rng.randint(1, 3))
+            block = "".join(indent + line if line else line for line in block.splitlines(True))
+        parts.append(block)
+        length += len(block)
+    return "".join(parts)[:size]
+
+
+def build_cases() -> List[Tuple[str, int, Callable[[], Any]]]:
+    """(name, input bytes, zero-argument callable) for every benchmark case"""
+    cases = []
+
+    for language in SUPPORTED_LANGUAGES:
+        for label, size in SIZES.items():
+            code = generate_code(language, size)
+            cases.append((f"code_metrics/{language}/{label}", size,
+                          lambda code=code, language=language: calculate_code_metrics(code, language)))
+
+    for language, inputs in ADVERSARIAL_INPUTS.items():
+        for name, code in inputs.items():
+            cases.append((f"code_metrics/adversarial/{language}/{name}", len(code),
+                          lambda code=code, language=language: calculate_code_metrics(code, language)))
+
+    for label, size in SIZES.items():
+        text = generate_code("javascript", size).replace("++", "<b>")
+        cases.append((f"sanitize_input/{label}", size, lambda text=text: sanitize_input(text)))
+
+    for label, size in SIZES.items():
+        code = generate_code("python", size)
+        cases.append((f"validators/CodeAnalysisRequest/{label}", size,
+                      lambda code=code: CodeAnalysisRequest(code=code, language="Python")))
+
+    # The dangerous-pattern search has to scan the whole body before it rejects
+    rejected = generate_code("python", SIZES["50KB"] - 10) + "eval(x)\n"
+
+    def reject():
+        try:
+            CodeAnalysisRequest(code=rejected, language="python")
+        except ValidationError:
+            return
+        raise AssertionError("dangerous code was accepted")
+
+    cases.append(("validators/CodeAnalysisRequest/rejected_50KB", len(rejected), reject))
+
+    cases.append(("hosting_impact/single", 0,
+                  lambda: calculate_hosting_impact("gcp", "eu-north", "standard", 1_000_000)))
+
+    def full_grid():
+        for provider in PROVIDERS:
+            for region in REGIONS:
+                for tier in TIERS:
+                    calculate_hosting_impact(provider, region, tier, 1_000_000)
+
+    cases.append(("hosting_impact/grid_192", 0, full_grid))
+    volumes = [10 ** exponent for exponent in range(3, 9)]
+    cases.append(("hosting_impact/matrix_1152", 0, lambda: hosting_impact_matrix(volumes)))
+    return cases
+
+
+def measure(func: Callable[[], Any]) -> Dict[str, Any]:
+    """Per-call time in microseconds: best and median of REPEATS timing runs"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * TARGET_REPEAT_SECONDS / max(elapsed, 1e-9)))
+    runs = [total / number * 1e6 for total in timer.repeat(repeat=REPEATS, number=number)]
+    return {
+        "us_per_call": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+        "calls": number * REPEATS,
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print current vs baseline timings and return the names of regressed cases"""
+    base_results = baseline.get("results", {})
+    if baseline.get("environment") != environment():
+        print(f"warning: baseline was recorded on {baseline.get('environment')}, "
+              f"this run is {environment()}")
+
+    regressions = []
+    print(f"{'case':<60}{'base us':>12}{'now us':>12}{'change':>9}")
+    for name, current in results.items():
+        previous = base_results.get(name)
+        if previous is None:
+            print(f"{name:<60}{'-':>12}{current['us_per_call']:>12.2f}{'new':>9}")
+            continue
+        before, after = previous["us_per_call"], current["us_per_call"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold and after - before > NOISE_FLOOR_US:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<60}{before:>12.2f}{after:>12.2f}{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown flagged as a regression (default 0.15 = 15%%)")
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose name contains this")
+    args = parser.parse_args()
+
+    results = {}
+    for name, size, func in build_cases():
+        if args.filter not in name:
+            continue
+        results[name] = {**measure(func), "input_bytes": size}
+        if args.save or not os.path.exists(args.baseline):
+            print(f"{name:<60}{results[name]['us_per_call']:>12.2f} us")
+
+    if args.save:
+        if args.filter and os.path.exists(args.baseline):
+            # Refresh only the selected cases
+            with open(args.baseline) as fh:
+                results = {**json.load(fh).get("results", {}), **results}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as fh:
+            json.dump({
+                "created": datetime.utcnow().isoformat(),
+                "environment": environment(),
+                "results": results
+            }, fh, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save to record one")
+        return 0
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    regressions = compare(results, baseline, args.threshold)
+    missing = sorted(set(baseline.get("results", {})) - set(results))
+    if missing and not args.filter:
+        print("in the baseline but no longer measured:", ", ".join(missing))
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
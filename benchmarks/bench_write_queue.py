@@ -0,0 +1,104 @@
+"""
+Benchmark: /analyze-code throughput with user_id set, saving through the
+old synchronous insert on the event loop vs. the write-behind queue,
+against an in-memory Supabase stand-in with per-call latency. Also checks
+that every record lands after shutdown drains the queue, including when
+the store fails intermittently and batches are retried, and that a
+failing on_written hook never inserts a batch twice.
+Run from the backend directory: python benchmarks/bench_write_queue.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from stub_supabase import StubSupabase  # noqa: E402
+
+STORE_LATENCY = 0.03
+REQUESTS = 200
+CONCURRENCY = 20
+
+
+def legacy_save_to_supabase(table, data):
+    """The old behaviour: one blocking insert per record on the event loop"""
+    result = main.supabase.table(table).insert(data).execute()
+    return {"success": True, "id": result.data[0]['id'] if result.data else None}
+
+
+async def run_load():
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one(i):
+            async with semaphore:
+                response = await client.post("/analyze-code", json={
+                    "code": f"for x in range({i}):\n    print(x)",
+                    "language": "python",
+                    "user_id": f"user-{i % 10}"
+                })
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+        wall = time.perf_counter() - start
+    await main.write_queue.stop()
+    return wall
+
+
+def rows_written(store):
+    return len(store.tables.get("code_analyses", []))
+
+
+def main_benchmark():
+    main.limiter.enabled = False
+    print(f"{REQUESTS} /analyze-code requests, concurrency {CONCURRENCY}, store latency {STORE_LATENCY * 1000:.0f} ms")
+    print(f"{'persistence':<26}{'req/s':>10}{'rows':>8}{'store calls':>13}")
+
+    save_to_supabase = main.save_to_supabase
+    main.save_to_supabase = legacy_save_to_supabase
+    main.supabase = store = StubSupabase(latency=STORE_LATENCY)
+    main.analysis_cache = main.ResultCache(ttl=0)
+    wall = asyncio.run(run_load())
+    print(f"{'sync insert (old)':<26}{REQUESTS / wall:>10.1f}{rows_written(store):>8}{store.calls:>13}")
+
+    main.save_to_supabase = save_to_supabase
+    main.supabase = store = StubSupabase(latency=STORE_LATENCY)
+    wall = asyncio.run(run_load())
+    assert rows_written(store) == REQUESTS
+    print(f"{'write-behind queue':<26}{REQUESTS / wall:>10.1f}{rows_written(store):>8}{store.calls:>13}")
+
+    main.supabase = store = StubSupabase(latency=STORE_LATENCY, error_rate=0.3, seed=3)
+    main.write_queue.retry_backoff = 0.01
+    main.write_queue.max_retries = 10
+    asyncio.run(run_load())
+    assert rows_written(store) == REQUESTS
+    stats = main.write_queue.stats()
+    print(f"{'queue, 30% store errors':<26}{'':>10}{rows_written(store):>8}{store.calls:>13}")
+    print("write_queue:", {key: stats[key] for key in ("depth", "written", "retries", "failed", "flushes", "avg_flush_ms", "max_flush_ms")})
+
+    def failing_hook(table, rows):
+        raise RuntimeError("hook failed")
+
+    on_written = main.write_queue.on_written
+    main.write_queue.on_written = failing_hook
+    main.supabase = store = StubSupabase(latency=STORE_LATENCY)
+    before = main.write_queue.stats()
+    asyncio.run(run_load())
+    main.write_queue.on_written = on_written
+    after = main.write_queue.stats()
+    assert rows_written(store) == REQUESTS, rows_written(store)
+    assert after["written"] - before["written"] == REQUESTS and after["retries"] == before["retries"]
+    assert after["failed"] == before["failed"] and after["hook_errors"] > before["hook_errors"]
+    print(f"failing on_written hook: {rows_written(store)} rows, none inserted twice, "
+          f"{after['hook_errors'] - before['hook_errors']} hook errors counted")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,208 @@
+"""
+Local stand-in for the GitHub REST API used by the benchmarks
+Serves canned repository data with configurable latency
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import random
+import socket
+import tarfile
+import threading
+import time
+from typing import Optional, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, RedirectResponse, StreamingResponse
+
+
+FIXTURE_FILES = {
+    "app/main.py": (
+        "import requests\n\n"
+        "def fetch_all(urls):\n"
+        "    results = []\n"
+        "    for url in urls:\n"
+        "        for attempt in range(3):\n"
+        "            results.append(requests.get(url))\n"
+        "    return results\n"
+    ),
+    "app/db.py": (
+        "def load(cursor):\n"
+        "    cursor.execute('SELECT * FROM users')\n"
+        "    with open('dump.txt', 'w') as fh:\n"
+        "        fh.write(str(cursor.fetchall()))\n"
+    ),
+    "web/src/index.js": (
+        "async function load(ids) {\n"
+        "  for (const id of ids) {\n"
+        "    await fetch(`/api/items/${id}`);\n"
+        "  }\n"
+        "}\n"
+    ),
+    "web/src/types.ts": "export interface Item { id: number }\n",
+    "README.md": "# Mock repository\n",
+}
+
+
+def build_fixture_tarball(files: Optional[Dict[str, str]] = None, prefix: str = "octo-mock-abc1234") -> bytes:
+    """
+    Gzipped tarball laid out like GitHub's archive downloads, with every
+    file under a single "<owner>-<repo>-<sha>/" directory
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, content in (files or FIXTURE_FILES).items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(f"{prefix}/{path}")
+            info.size = len(data)
+            info.mtime = 1700000000
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def create_mock_github(
+    latency: float = 0.05,
+    rate_limit: int = 5000,
+    tarball: Optional[bytes] = None,
+    orgs: Optional[Dict[str, List[str]]] = None,
+    users: Optional[Dict[str, List[str]]] = None,
+    error_rate: float = 0.0,
+    seed: int = 0
+) -> FastAPI:
+    """
+    GitHub API stand-in; every response is delayed by latency seconds.
+    Responses carry ETags and rate-limit headers, and If-None-Match is
+    answered with 304 without spending quota, like the real API.
+    Tarball downloads redirect to a codeload-style URL serving `tarball`
+    (build_fixture_tarball() by default) in chunks. `orgs` and `users`
+    map owners to the repository names their paginated listings return.
+    A fraction `error_rate` of API responses are 502 errors.
+    Tracks the peak number of requests in flight.
+    """
+    app = FastAPI()
+    app.state.remaining = rate_limit
+    app.state.requests = 0
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+    app.state.tarball = tarball if tarball is not None else build_fixture_tarball()
+    app.state.random = random.Random(seed)
+
+    @app.middleware("http")
+    async def track_in_flight(request: Request, call_next):
+        app.state.in_flight += 1
+        app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+        try:
+            return await call_next(request)
+        finally:
+            app.state.in_flight -= 1
+
+    def repo_data(owner: str, repo: str) -> dict:
+        return {
+            "name": repo,
+            "full_name": f"{owner}/{repo}",
+            "owner": {"login": owner},
+            "description": f"Mock repository {owner}/{repo}",
+            "stargazers_count": 120,
+            "forks_count": 30,
+            "size": 2048,
+            "language": "Python",
+            "default_branch": "main",
+            "created_at": "2020-01-01T00:00:00Z",
+            "updated_at": "2025-01-01T00:00:00Z"
+        }
+
+    def respond(request: Request, data) -> Response:
+        app.state.requests += 1
+        if app.state.random.random() < error_rate:
+            return JSONResponse({"message": "Server Error"}, status_code=502)
+        body = json.dumps(data).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers = {"ETag": etag, "X-RateLimit-Reset": "4102444800"}
+        if request.headers.get("if-none-match") == etag:
+            headers["X-RateLimit-Remaining"] = str(app.state.remaining)
+            return Response(status_code=304, headers=headers)
+        if app.state.remaining <= 0:
+            headers["X-RateLimit-Remaining"] = "0"
+            return JSONResponse({"message": "API rate limit exceeded"}, status_code=403, headers=headers)
+        app.state.remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(app.state.remaining)
+        return Response(body, media_type="application/json", headers=headers)
+
+    @app.get("/repos/{owner}/{repo}")
+    async def get_repo(owner: str, repo: str, request: Request):
+        await asyncio.sleep(latency)
+        if repo == "missing":
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        return respond(request, repo_data(owner, repo))
+
+    def listing(request: Request, owners: Optional[Dict[str, List[str]]], owner: str, page: int, per_page: int):
+        if owner not in (owners or {}):
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        names = owners[owner][(page - 1) * per_page:page * per_page]
+        return respond(request, [repo_data(owner, name) for name in names])
+
+    @app.get("/orgs/{owner}/repos")
+    async def list_org_repos(owner: str, request: Request, page: int = 1, per_page: int = 30):
+        await asyncio.sleep(latency)
+        return listing(request, orgs, owner, page, per_page)
+
+    @app.get("/users/{owner}/repos")
+    async def list_user_repos(owner: str, request: Request, page: int = 1, per_page: int = 30):
+        await asyncio.sleep(latency)
+        return listing(request, users, owner, page, per_page)
+
+    @app.get("/repos/{owner}/{repo}/languages")
+    async def get_languages(owner: str, repo: str, request: Request):
+        await asyncio.sleep(latency)
+        return respond(request, {"Python": 52000, "JavaScript": 15000})
+
+    @app.get("/repos/{owner}/{repo}/tarball")
+    async def get_tarball(owner: str, repo: str):
+        await asyncio.sleep(latency)
+        app.state.requests += 1
+        if repo == "missing":
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        return RedirectResponse(f"/codeload/{owner}/{repo}/tar.gz/main", status_code=302)
+
+    @app.get("/codeload/{owner}/{repo}/tar.gz/{ref}")
+    async def get_codeload(owner: str, repo: str, ref: str):
+        data = app.state.tarball
+
+        async def chunks():
+            for start in range(0, len(data), 64 * 1024):
+                yield data[start:start + 64 * 1024]
+
+        return StreamingResponse(chunks(), media_type="application/x-gzip")
+
+    return app
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a free local port in a background thread"""
+
+    def __init__(self, app: FastAPI):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "ServerThread":
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.sock]}, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        if self.thread:
+            self.thread.join(timeout=5)
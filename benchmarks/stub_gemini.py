@@ -0,0 +1,80 @@
+"""
+Local stand-in for the Gemini model used by the benchmarks
+Blocks like the real SDK call, with configurable latency and failures
+"""
+
+import json
+import random
+import threading
+import time
+
+
+DEFAULT_RESPONSE = {
+    "inefficiencies": ["Nested loop over the same collection"],
+    "suggestions": ["Build a set once and test membership against it"],
+    "optimized_code": "seen = set(items)",
+    "explanations": ["Set lookups are O(1), so the inner loop disappears"]
+}
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGeminiModel:
+    """
+    Drop-in for genai.GenerativeModel: generate_content sleeps for latency
+    seconds (blocking the calling thread, as the SDK does) and fails with
+    probability error_rate. With stream=True it returns an iterator of
+    `chunks` partial responses spread evenly over the latency instead.
+    Tracks calls and peak concurrency.
+    """
+
+    def __init__(self, latency: float = 1.0, error_rate: float = 0.0, response: dict = None, seed: int = 0,
+                 chunks: int = 20):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.text = "```json\n" + json.dumps(response or DEFAULT_RESPONSE) + "\n```"
+        self.chunks = chunks
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream()
+        fail = self._start()
+        try:
+            time.sleep(self.latency)
+            if fail:
+                raise RuntimeError("503 Service Unavailable")
+            return StubResponse(self.text)
+        finally:
+            self._end()
+
+    def _stream(self):
+        fail = self._start()
+        try:
+            size = -(-len(self.text) // self.chunks)
+            for start in range(0, len(self.text), size):
+                time.sleep(self.latency / self.chunks)
+                if fail:
+                    raise RuntimeError("503 Service Unavailable")
+                yield StubResponse(self.text[start:start + size])
+        finally:
+            self._end()
+
+    def _start(self) -> bool:
+        """Count a call; returns whether it should fail"""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self._random.random() < self.error_rate
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
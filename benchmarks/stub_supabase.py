@@ -0,0 +1,163 @@
+"""
+Local stand-in for the Supabase client used by the benchmarks
+In-memory tables behind the same blocking query-builder calls the API uses
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+
+def _select_column(row: Dict[str, Any], spec: str):
+    """Resolve a PostgREST column spec such as "alias:col->key->>leaf" against a row"""
+    alias, _, path = spec.rpartition(":")
+    parts = path.replace("->>", "->").split("->")
+    value = row.get(parts[0])
+    for key in parts[1:]:
+        value = value.get(key) if isinstance(value, dict) else None
+    return alias or parts[-1], value
+
+
+def _split_terms(text: str) -> List[str]:
+    """Split a PostgREST logic tree on the commas outside parentheses and quotes"""
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and depth == 0 and char == ",":
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return terms
+
+
+def _compile_filter(text: str):
+    """Row predicate for a PostgREST filter such as 'a.lt.1,and(a.eq.1,id.lt."x")'"""
+    if text.startswith(("and(", "or(")):
+        combine = all if text.startswith("and(") else any
+        parts = [_compile_filter(term) for term in _split_terms(text[text.index("(") + 1:-1])]
+        return lambda row: combine(part(row) for part in parts)
+    column, operator, value = text.split(".", 2)
+    value = value[1:-1] if value.startswith('"') else value
+    compare = {
+        "eq": lambda a, b: a == b, "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+        "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+    }[operator]
+
+    def predicate(row):
+        current = row.get(column)
+        if current is None:
+            return False
+        return compare(current, type(current)(value))
+    return predicate
+
+
+class StubResult:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class StubQuery:
+    """Chainable subset of the postgrest query builder"""
+
+    def __init__(self, store: "StubSupabase", table: str):
+        self.store = store
+        self.table = table
+        self.rows: List[Dict[str, Any]] = []
+        self.columns = "*"
+        self.filters = []
+        self.order_by = []
+        self.row_limit = None
+        self.operation = None
+
+    def insert(self, rows):
+        self.operation = "insert"
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def select(self, columns: str = "*"):
+        self.operation = "select"
+        self.columns = columns
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lt(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def lte(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def or_(self, filters: str):
+        self.filters.append(_compile_filter(f"or({filters})"))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def execute(self) -> StubResult:
+        return self.store.execute(self)
+
+
+class StubSupabase:
+    """
+    Drop-in for supabase.Client: every execute() blocks for latency seconds
+    and fails with probability error_rate. Counts calls and rows written.
+    """
+
+    def __init__(self, latency: float = 0.02, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls = 0
+        self.failures = 0
+        self._next_id = 1
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> StubQuery:
+        return StubQuery(self, name)
+
+    def execute(self, query: StubQuery) -> StubResult:
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+        time.sleep(self.latency)
+        if fail:
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError("503 Service Unavailable")
+
+        with self._lock:
+            rows = self.tables.setdefault(query.table, [])
+            if query.operation == "insert":
+                inserted = []
+                for row in query.rows:
+                    row = {"id": self._next_id, **row}
+                    self._next_id += 1
+                    rows.append(row)
+                    inserted.append(row)
+                return StubResult(inserted)
+
+            selected = [row for row in rows if all(f(row) for f in query.filters)]
+        # Stable sorts, least significant column first
+        for column, desc in reversed(query.order_by):
+            selected.sort(key=lambda row: row.get(column), reverse=desc)
+        if query.row_limit is not None:
+            selected = selected[:query.row_limit]
+        if query.columns != "*":
+            columns = [c.strip() for c in query.columns.split(",")]
+            selected = [dict(_select_column(row, c) for c in columns) for row in selected]
+        return StubResult(selected)
@@ -0,0 +1,287 @@
+"""
+EcoCode result caching
+In-process LRU cache with TTL, a memory budget and an optional shared disk tier
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable, List
+
+# Temp files older than this were left by a writer that died mid-write
+STALE_TEMP_SECONDS = 60
+
+# A sweep over the disk budget evicts down to this share of it, so the next
+# few writes do not trigger another sweep straight away
+DISK_LOW_WATER = 0.9
+
+
+class ResultCache:
+    """
+    LRU cache for JSON-serializable results.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once their serialized size exceeds `max_bytes`. When `disk_dir`
+    is set, entries are also written there so that several uvicorn workers
+    on the same host can reuse each other's results.
+
+    The disk tier is swept on a background thread every `sweep_interval`
+    seconds, and as soon as this worker's writes may have pushed it over
+    `disk_max_bytes`: expired entries are deleted, then the oldest written
+    ones until the directory is back under budget.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_bytes: int = 32 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: Optional[int] = None,
+        sweep_interval: float = 300
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_expired = 0
+        # Size of the disk tier at the last sweep plus what this worker wrote since
+        self._disk_bytes = 0
+        self._next_sweep = 0.0  # the first write sweeps what earlier runs left
+        self._sweeping = False
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.hits += 1
+        self._store(key, value, now)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Cache a value in memory and, if configured, on disk"""
+        now = time.time()
+        self._store(key, value, now)
+        self._write_disk(key, value)
+
+    def invalidate(self, key: str):
+        """Drop a key from both tiers"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_tier": bool(self.disk_dir),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+                "disk_evictions": self.disk_evictions,
+                "disk_expired": self.disk_expired
+            }
+
+    def sweep_disk(self):
+        """
+        Delete expired disk entries and abandoned temp files, then evict the
+        oldest entries while the tier is over `disk_max_bytes`; blocking
+        """
+        now = time.time()
+        entries, total, expired, evicted = [], 0, 0, 0
+        try:
+            with os.scandir(self.disk_dir) as scan:
+                for item in scan:
+                    try:
+                        if not item.is_file():
+                            continue
+                        stat = item.stat()
+                        if item.name.endswith('.tmp'):
+                            if stat.st_mtime + STALE_TEMP_SECONDS <= now:
+                                os.remove(item.path)
+                        elif stat.st_mtime + self.ttl <= now:
+                            os.remove(item.path)
+                            expired += 1
+                        else:
+                            entries.append((stat.st_mtime, stat.st_size, item.path))
+                            total += stat.st_size
+                    except OSError:
+                        continue  # removed by another worker meanwhile
+
+            if self.disk_max_bytes is not None and total > self.disk_max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.disk_max_bytes * DISK_LOW_WATER:
+                        break
+                    try:
+                        os.remove(path)
+                        evicted += 1
+                    except OSError:
+                        pass
+                    total -= size
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._disk_bytes = total
+                self.disk_expired += expired
+                self.disk_evictions += evicted
+                self._next_sweep = now + self.sweep_interval
+                self._sweeping = False
+
+    # ---------- in-memory tier ----------
+
+    def _store(self, key: str, value: Any, now: float):
+        size = len(json.dumps(value, separators=(',', ':')))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    # ---------- disk tier ----------
+
+    def _disk_path(self, key: str) -> str:
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in key)
+        return os.path.join(self.disk_dir, f"{safe_key}.json")
+
+    def _read_disk(self, key: str, now: float) -> Optional[Any]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl <= now:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: Any):
+        if not self.disk_dir:
+            return
+        # Write to a temp file and rename so readers in other workers never
+        # see a partially written entry
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                json.dump(value, fh, separators=(',', ':'))
+                size = fh.tell()
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._schedule_sweep(size)
+
+    def _schedule_sweep(self, written: int):
+        """Start a background sweep if one is due or the tier may be over budget"""
+        now = time.time()
+        with self._lock:
+            self._disk_bytes += written
+            over_budget = self.disk_max_bytes is not None and self._disk_bytes > self.disk_max_bytes
+            if self._sweeping or (now < self._next_sweep and not over_budget):
+                return
+            self._sweeping = True
+        threading.Thread(target=self.sweep_disk, name="cache-sweep", daemon=True).start()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls with the same key into one upstream
+    call whose result (or exception) every caller receives. The shared
+    call is cancelled only once all callers waiting on it are cancelled.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, List[Any]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(factory())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if call[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
+
+    def _forget(self, key: str, task: "asyncio.Future"):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
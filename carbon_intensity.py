@@ -0,0 +1,265 @@
+"""
+EcoCode hourly carbon intensity
+Per-region hourly grid intensity curves stored in a memory-mapped binary
+file, emissions integrated against traffic profiles, and low-carbon
+windows for batch workloads
+"""
+
+import os
+import struct
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+
+from hosting_impact import CARBON_INTENSITY
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+HOURS_PER_YEAR = 8760
+CURVE_YEAR = 2023
+
+# File layout: header, one fixed-width UTF-8 name per region, then a
+# little-endian float32 matrix of regions x hours (gCO2/kWh). The header
+# and names are multiples of 16 bytes, so the matrix is aligned.
+MAGIC = b"ECOCI\x00\x01\x00"
+HEADER = struct.Struct("<8sIHH")  # magic, region count, year, hours per curve
+NAME_BYTES = 32
+
+# First hour of each calendar month in a non-leap year
+MONTH_START_HOURS = tuple(
+    24 * sum((31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)[:month]) for month in range(12)
+)
+
+# Shape of the modelled curves per region: UTC offset of the grid (hours),
+# daily swing (midday solar dip, evening peak) and seasonal swing (winter
+# high; negative in the southern hemisphere), as shares of the annual mean
+MODEL_SHAPES = {
+    'us-east': (-5, 0.10, 0.08),
+    'us-west': (-8, 0.30, 0.05),
+    'eu-west': (0, 0.20, 0.15),
+    'eu-north': (1, 0.10, 0.25),
+    'asia-east': (8, 0.08, 0.06),
+    'asia-south': (5.5, 0.12, -0.05),
+    'australia': (10, 0.35, -0.08),
+    'south-america': (-3, 0.10, -0.10),
+}
+
+
+def _week(weekday: List[float], weekend: List[float]) -> Tuple[float, ...]:
+    return tuple(weekday * 5 + weekend * 2)
+
+
+# Relative request volume by UTC hour: 24 values repeat daily, 168 weekly
+# starting Monday 00:00
+TRAFFIC_PROFILES = {
+    "flat": (1.0,) * 24,
+    # Office tools: weekdays 08:00-18:00, quiet nights and weekends
+    "business": _week([0.2] * 8 + [1.0] * 10 + [0.2] * 6, [0.1] * 24),
+    # Consumer apps: low overnight, climbing to an evening peak
+    "consumer": (
+        0.30, 0.20, 0.15, 0.10, 0.10, 0.15, 0.30, 0.50, 0.60, 0.65, 0.70, 0.75,
+        0.80, 0.80, 0.80, 0.85, 0.90, 1.00, 1.00, 1.00, 0.95, 0.85, 0.65, 0.45
+    ),
+    # Scheduled jobs running between midnight and 06:00
+    "nightly": (1.0,) * 6 + (0.05,) * 18,
+}
+
+TrafficProfile = Union[str, Sequence[float]]
+
+
+class CarbonCurves:
+    """
+    Hourly carbon intensity (gCO2/kWh) of a typical year, one row per
+    region; `values` is normally a read-only memory map of a curves file.
+    Hour 0 is 1 January 00:00 UTC of `year`. `source` is "hourly" for
+    curves read from a file and "modelled" for modelled_curves().
+    """
+
+    def __init__(
+        self,
+        regions: Sequence[str],
+        values: "np.ndarray",
+        year: int = CURVE_YEAR,
+        source: str = "hourly"
+    ):
+        if values.shape != (len(regions), HOURS_PER_YEAR):
+            raise ValueError(f"Expected {len(regions)} x {HOURS_PER_YEAR} values, got {values.shape}")
+        self.regions = tuple(regions)
+        self.values = values
+        self.year = year
+        self.source = source
+        self._rows = {region: row for row, region in enumerate(self.regions)}
+
+    def __contains__(self, region: str) -> bool:
+        return region in self._rows
+
+    def curve(self, region: str) -> "np.ndarray":
+        return self.values[self._rows[region]]
+
+    def integrate(self, weights: "np.ndarray", regions: Optional[Sequence[str]] = None) -> "np.ndarray":
+        """
+        Traffic-weighted intensity per region (rows) and calendar month
+        (columns): sum of weight x intensity over the month's hours. With
+        weights summing to 1, a row sums to the year's effective intensity,
+        and multiplying by the yearly energy gives grams per month.
+        """
+        import numpy as np
+
+        rows = self.values if regions is None else self.values[[self._rows[r] for r in regions]]
+        return np.add.reduceat(rows * weights, MONTH_START_HOURS, axis=1)
+
+    def low_carbon_windows(
+        self,
+        region: str,
+        start_hour: int,
+        duration_hours: int,
+        horizon_hours: int,
+        count: int = 3
+    ) -> Tuple[List[Tuple[int, float]], float]:
+        """
+        Up to `count` non-overlapping windows of `duration_hours` inside the
+        `horizon_hours` from hour-of-year `start_hour` (wrapping into the
+        next year), lowest mean intensity first, as (hours after start, mean
+        intensity). Also returns the mean for starting straight away.
+        """
+        import numpy as np
+
+        hours = (start_hour + np.arange(horizon_hours)) % HOURS_PER_YEAR
+        totals = np.concatenate(([0.0], np.cumsum(self.curve(region)[hours], dtype=np.float64)))
+        means = (totals[duration_hours:] - totals[:-duration_hours]) / duration_hours
+
+        available = means.copy()
+        windows = []
+        for _ in range(count):
+            offset = int(np.argmin(available))
+            if available[offset] == np.inf:
+                break
+            windows.append((offset, float(means[offset])))
+            available[max(0, offset - duration_hours + 1):offset + duration_hours] = np.inf
+        return windows, float(means[0])
+
+
+def hour_of_year(moment: datetime) -> int:
+    """Hours since 1 January 00:00 of the moment's year (naive UTC); leap days shift by a day"""
+    return int((moment - datetime(moment.year, 1, 1)).total_seconds() // 3600) % HOURS_PER_YEAR
+
+
+def resolve_profile(profile: TrafficProfile) -> Tuple[float, ...]:
+    """
+    The hourly pattern of a named profile, or a custom one checked to hold
+    24 or 168 non-negative values that are not all zero
+    """
+    if isinstance(profile, str):
+        if profile not in TRAFFIC_PROFILES:
+            raise ValueError(f"Traffic profile must be one of {list(TRAFFIC_PROFILES)} or 24/168 weights")
+        return TRAFFIC_PROFILES[profile]
+    pattern = tuple(float(value) for value in profile)
+    if len(pattern) not in (24, 168):
+        raise ValueError("A custom traffic profile needs 24 (daily) or 168 (weekly) weights")
+    if min(pattern) < 0 or not sum(pattern) > 0:
+        raise ValueError("Traffic profile weights must be non-negative and not all zero")
+    return pattern
+
+
+@lru_cache(maxsize=32)
+def profile_weights(pattern: Tuple[float, ...], year: int = CURVE_YEAR) -> "np.ndarray":
+    """Share of a year's requests falling in each hour of `year` under a daily or weekly pattern"""
+    import numpy as np
+
+    hours = np.arange(HOURS_PER_YEAR)
+    if len(pattern) == 168:
+        hours = hours + 24 * date(year, 1, 1).weekday()
+    weights = np.asarray(pattern, dtype=np.float64)[hours % len(pattern)]
+    weights /= weights.sum()
+    weights.setflags(write=False)
+    return weights
+
+
+def modelled_curves(year: int = CURVE_YEAR) -> Dict[str, "np.ndarray"]:
+    """
+    Illustrative curves for the built-in regions: MODEL_SHAPES applied to
+    each region's annual mean in CARBON_INTENSITY, rescaled so the mean is
+    unchanged. Replace them with measured data through write_curves().
+    """
+    import numpy as np
+
+    hours = np.arange(HOURS_PER_YEAR, dtype=np.float64)
+    season = np.cos(2 * np.pi * (hours / 24 - 15) / 365)
+    curves = {}
+    for region, mean in CARBON_INTENSITY.items():
+        offset, daily, seasonal = MODEL_SHAPES.get(region, (0, 0.0, 0.0))
+        local = (hours + offset) % 24
+        # Signed distance in hours to 13:00 and 19:00 local time, wrapping at midnight
+        solar = np.exp(-((((local - 13) + 12) % 24 - 12) / 3) ** 2)
+        evening = np.exp(-((((local - 19) + 12) % 24 - 12) / 2) ** 2)
+        shape = evening / 2 - solar
+        shape = (shape - shape.mean()) / np.abs(shape - shape.mean()).max()
+        curve = mean * (1 + daily * shape + seasonal * season)
+        curves[region] = curve * (mean / curve.mean())
+    return curves
+
+
+def write_curves(path: str, curves: Dict[str, Sequence[float]], year: int = CURVE_YEAR):
+    """Write hourly curves (region -> 8,760 gCO2/kWh values) to a curves file, replacing it atomically"""
+    import numpy as np
+
+    values = np.asarray([np.asarray(curve, dtype="<f4") for curve in curves.values()], dtype="<f4")
+    if values.shape != (len(curves), HOURS_PER_YEAR):
+        raise ValueError(f"Every curve needs {HOURS_PER_YEAR} hourly values")
+    names = b"".join(region.encode("utf-8")[:NAME_BYTES].ljust(NAME_BYTES, b"\x00") for region in curves)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as fh:
+        fh.write(HEADER.pack(MAGIC, len(curves), year, HOURS_PER_YEAR))
+        fh.write(names)
+        fh.write(values.tobytes())
+    os.replace(partial, path)
+
+
+def load_curves(path: str) -> CarbonCurves:
+    """Memory-map a curves file; pages are read from disk as regions are used"""
+    import numpy as np
+
+    with open(path, "rb") as fh:
+        magic, count, year, hours = HEADER.unpack(fh.read(HEADER.size))
+        if magic != MAGIC or hours != HOURS_PER_YEAR:
+            raise ValueError(f"{path} is not a carbon intensity curves file")
+        names = fh.read(count * NAME_BYTES)
+    regions = [names[i:i + NAME_BYTES].rstrip(b"\x00").decode("utf-8") for i in range(0, len(names), NAME_BYTES)]
+    values = np.memmap(path, dtype="<f4", mode="r", offset=HEADER.size + len(names), shape=(count, hours))
+    return CarbonCurves(regions, values, year)
+
+
+def open_curves(path: Optional[str], modelled: bool = False) -> Optional[CarbonCurves]:
+    """
+    load_curves(path) if the file exists. Otherwise the modelled curves,
+    held in memory and labelled "modelled", when `modelled` is set, or
+    None. Nothing is written to disk.
+    """
+    if path and os.path.exists(path):
+        return load_curves(path)
+    if not modelled:
+        return None
+    import numpy as np
+
+    curves = modelled_curves()
+    return CarbonCurves(list(curves), np.asarray(list(curves.values()), dtype="<f4"), source="modelled")
+
+
+if __name__ == "__main__":
+    # python carbon_intensity.py hourly.csv curves.bin [year]
+    # The CSV has a header row of region names and 8,760 rows of gCO2/kWh
+    import sys
+
+    import numpy
+
+    if len(sys.argv) not in (3, 4):
+        sys.exit(__doc__.strip() + "\n\nusage: python carbon_intensity.py HOURLY_CSV CURVES_FILE [YEAR]")
+    with open(sys.argv[1]) as fh:
+        header = [name.strip() for name in fh.readline().split(",")]
+        table = numpy.loadtxt(fh, delimiter=",", ndmin=2)
+    write_curves(sys.argv[2], dict(zip(header, table.T)), int(sys.argv[3]) if len(sys.argv) == 4 else CURVE_YEAR)
+    print(f"wrote {len(header)} regions to {sys.argv[2]}")
@@ -0,0 +1,692 @@
+"""
+EcoCode code metrics engine
+Precompiled single-pass scanner behind calculate_code_metrics
+"""
+
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# ==================== Pattern Tables ====================
+
+# Patterns are matched against the lowercased source (one allocation instead
+# of IGNORECASE on every branch), so all literals here are lowercase.
+# Trailing separators that can begin another pattern (e.g. the "." in
+# "axios.") are lookaheads so that "axios.get(" still counts as both an API
+# call and a ".get(" call, exactly like separate findall passes would. The
+# name after def/function is looked ahead at for the same reason
+# ("def update_row" is also an UPDATE query).
+PATTERN_TABLES = {
+    'python': {
+        'loops': [r'\bfor\b', r'\bwhile\b'],
+        'api_calls': [r'requests(?=\.)', r'urllib(?=\.)', r'httpx(?=\.)', r'fetch\('],
+        'file_io': [r'open\(', r'\.read\(', r'\.write\('],
+        'recursion': [r'def\s+(?=(?P<recursion_name>\w+))'],
+        'db_queries': [r'\.execute\(', r'\.query\(', r'select', r'insert', r'update'],
+    },
+    'javascript': {
+        'loops': [r'\bfor\b', r'\bwhile\b', r'\.foreach\(', r'\.map\('],
+        'api_calls': [r'fetch\(', r'axios(?=\.)', r'\$\.ajax', r'\.get\(', r'\.post\('],
+        'file_io': [r'fs(?=\.)', r'readfile', r'writefile'],
+        'recursion': [r'function\s+(?=(?P<recursion_name>\w+))'],
+        'db_queries': [r'\.query\(', r'\.find\(', r'\.findone\(', r'\.save\('],
+    },
+}
+
+METRIC_CATEGORIES = ('loops', 'api_calls', 'file_io', 'recursion', 'db_queries')
+
+
+def _split_leading_char(pattern: str) -> Tuple[str, str]:
+    """
+    Split a pattern into its leading literal character and the remainder.
+    A leading \\b becomes a lookbehind placed after that character.
+    """
+    if pattern.startswith(r'\b'):
+        char, rest = _split_leading_char(pattern[2:])
+        return char, rf'(?<!\w{re.escape(char)}){rest}'
+    if pattern.startswith('\\'):
+        return pattern[1], pattern[2:]
+    return pattern[0], pattern[1:]
+
+
+def _compile_scanner(table: Dict[str, List[str]]) -> Tuple['re.Pattern', Dict[str, str]]:
+    """
+    Fold a language pattern table into one alternation dispatched on the
+    first character. Every alternative then starts with a literal, which
+    lets the regex engine skip ahead to candidate positions instead of
+    trying every branch at every offset.
+    """
+    by_char: Dict[str, List[str]] = {}
+    group_categories: Dict[str, str] = {}
+
+    for category in METRIC_CATEGORIES:
+        for index, pattern in enumerate(table[category]):
+            group = f"{category}{index}"
+            group_categories[group] = category
+            char, rest = _split_leading_char(pattern)
+            by_char.setdefault(char, []).append(f"(?P<{group}>{rest})")
+
+    branches = [
+        f"{re.escape(char)}(?:{'|'.join(alternatives)})"
+        for char, alternatives in by_char.items()
+    ]
+    return re.compile('|'.join(branches)), group_categories
+
+
+# Compiled once at import; unknown languages fall back to the Python table
+SCANNERS = {lang: _compile_scanner(table) for lang, table in PATTERN_TABLES.items()}
+
+
+# ==================== Loop Nesting ====================
+
+# Languages whose blocks are delimited by braces; everything else is
+# treated as indentation-based like Python
+BRACE_LANGUAGES = {'javascript', 'typescript', 'java', 'cpp'}
+
+# Every branch starts with a literal so the regex engine can skip straight
+# to candidate characters, and tokens are dispatched on that character.
+# Single-line strings and comments always match (running to the end of the
+# line when unterminated). Spans that can cover many lines (triple-quoted
+# strings, block comments, template literals) are only opened here and
+# closed with _SPAN_ENDS, so a tracker can resume inside one when its
+# input arrives in pieces. Nothing can make the tokenizer rescan a span.
+_PYTHON_TOKENS = re.compile(
+    r"""\n(?P<indent>[ \t]*)(?P<head>(?:async[ \t]+)?(?:for|while)\b)?"""
+    r"""|'''(?P<triple_single>)|\"\"\"(?P<triple_double>)"""
+    r"""|'[^'\\\n]*(?:\\.[^'\\\n]*)*'?"""
+    r'''|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?'''
+    r"""|#[^\n]*"""
+    r"""|\(|\[|\{|\)|\]|\}""",
+    re.DOTALL
+)
+
+_PYTHON_LINE_HEAD = re.compile(r"""(?P<indent>[ \t]*)(?P<head>(?:async[ \t]+)?(?:for|while)\b)?""")
+
+_BRACE_TOKENS = re.compile(
+    r"""//[^\n]*|/\*(?P<block_comment>)"""
+    r"""|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?"""
+    r"""|'[^'\\\n]*(?:\\.[^'\\\n]*)*'?"""
+    r"""|`(?P<template>)"""
+    r"""|f(?<![\w$]f)or\b|w(?<![\w$]w)hile\b|d(?<![\w$]d)o\b"""
+    r"""|\{|\}|\(|\)|;""",
+    re.DOTALL
+)
+
+# Remainder of an open multi-line span up to and including its terminator
+_SPAN_ENDS = {
+    "'''": re.compile(r"""[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''""", re.DOTALL),
+    '"""': re.compile(r'''[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""''', re.DOTALL),
+    '`': re.compile(r"""[^`\\]*(?:\\.[^`\\]*)*`""", re.DOTALL),
+    '*/': re.compile(r""".*?\*/""", re.DOTALL),
+}
+
+_SPAN_OPENERS = {
+    'triple_single': "'''",
+    'triple_double': '"""',
+    'block_comment': '*/',
+    'template': '`',
+}
+
+
+class _LoopDepthCounts:
+    """Number of loops at each nesting depth, and the metrics derived from it"""
+
+    def __init__(self):
+        self.depth_counts: Dict[int, int] = {}
+
+    def _record(self, depth: int, count: int = 1):
+        self.depth_counts[depth] = self.depth_counts.get(depth, 0) + count
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'nested_loops': sum(n for depth, n in self.depth_counts.items() if depth > 1),
+            'max_loop_depth': max(self.depth_counts, default=0),
+            'loop_depth_counts': dict(sorted(self.depth_counts.items())),
+        }
+
+
+class _NestingTracker(_LoopDepthCounts, ABC):
+    """
+    Loop depth of source fed in pieces. Subclasses follow one language's
+    syntax; strings and comments left open at the end of a piece are
+    carried over here.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.open_span: Optional[str] = None
+
+    @abstractmethod
+    def feed(self, text: str):
+        """Consume the next piece of source, recording each loop at its depth"""
+
+    def _resume_span(self, text: str) -> Optional[int]:
+        """Skip the rest of a span left open by the previous piece"""
+        close = _SPAN_ENDS[self.open_span].match(text)
+        if close is None:
+            return None
+        self.open_span = None
+        return close.end()
+
+    def _open_span(self, text: str, token: 're.Match') -> Optional[int]:
+        """Skip a span starting at token; returns None if it runs past the end"""
+        terminator = _SPAN_OPENERS[token.lastgroup]
+        close = _SPAN_ENDS[terminator].match(text, token.end())
+        if close is None:
+            self.open_span = terminator
+            return None
+        return close.end()
+
+    @abstractmethod
+    def state(self) -> List[Any]:
+        """Everything but the loop counts, as JSON-compatible values"""
+
+    @abstractmethod
+    def restore(self, state: List[Any]):
+        """Resume from a state() snapshot"""
+
+
+class _PythonNestingTracker(_NestingTracker):
+    """
+    Loop depth tracked by indentation. Continuation lines (open brackets,
+    trailing backslash) and lines inside strings never start a statement,
+    so they are skipped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.loop_indents: List[int] = []
+        self.bracket_depth = 0
+        self.tail = ''  # last characters of the previous piece
+        self.at_line_start = True
+
+    def state(self) -> List[Any]:
+        return [self.open_span, list(self.loop_indents), self.bracket_depth, self.tail, self.at_line_start]
+
+    def restore(self, state: List[Any]):
+        self.open_span, loop_indents, self.bracket_depth, self.tail, self.at_line_start = state
+        self.loop_indents = list(loop_indents)
+
+    def feed(self, text: str):
+        pos = 0
+        if self.open_span:
+            pos = self._resume_span(text)
+        elif self.at_line_start:
+            self._line(text, _PYTHON_LINE_HEAD.match(text), self.tail[:-1])
+
+        search = _PYTHON_TOKENS.search
+        while pos is not None:
+            token = search(text, pos)
+            if token is None:
+                break
+            start = token.start()
+            pos = token.end()
+            char = text[start]
+            if char == '\n':
+                before = text[start - 2:start] if start >= 2 else (self.tail + text[:start])[-2:]
+                self._line(text, token, before)
+            elif char in '([{':
+                self.bracket_depth += 1
+            elif char in ')]}':
+                self.bracket_depth = max(0, self.bracket_depth - 1)
+            elif token.lastgroup:
+                pos = self._open_span(text, token)
+
+        self.tail = (self.tail + text)[-3:]
+        self.at_line_start = text.endswith('\n')
+
+    def _line(self, text: str, head: 're.Match', before_newline: str):
+        """Handle the start of a physical line"""
+        if self.bracket_depth or before_newline.endswith(('\\', '\\\r')):
+            return
+        line_start = head.end('indent')
+        if text[line_start:line_start + 1] in ('', '\n', '\r', '#'):
+            return  # blank and comment-only lines do not close blocks
+
+        indent = len(head.group('indent').expandtabs(8))
+        while self.loop_indents and self.loop_indents[-1] >= indent:
+            self.loop_indents.pop()
+        if head.group('head'):
+            self.loop_indents.append(indent)
+            self._record(len(self.loop_indents))
+
+
+class _BraceNestingTracker(_NestingTracker):
+    """
+    Loop depth tracked by braces. Brace-less bodies (for (...) for (...) x;)
+    last until the statement's semicolon, and the while of a do/while is
+    not counted twice.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.frames: List[Tuple[int, bool]] = []  # (loops closed by this brace, is a do body)
+        self.open_loops = 0
+        self.pending = 0  # loop headers whose body has not started yet
+        self.pending_do = False
+        self.paren_depth = 0
+        self.header_depth: Optional[int] = None  # paren depth at which a for/while condition closes
+        self.after_do_body = False
+
+    def state(self) -> List[Any]:
+        return [
+            self.open_span, [list(frame) for frame in self.frames], self.open_loops, self.pending,
+            self.pending_do, self.paren_depth, self.header_depth, self.after_do_body
+        ]
+
+    def restore(self, state: List[Any]):
+        (self.open_span, frames, self.open_loops, self.pending,
+         self.pending_do, self.paren_depth, self.header_depth, self.after_do_body) = state
+        self.frames = [tuple(frame) for frame in frames]
+
+    def feed(self, text: str):
+        pos = 0
+        if self.open_span:
+            pos = self._resume_span(text)
+
+        search = _BRACE_TOKENS.search
+        while pos is not None:
+            token = search(text, pos)
+            if token is None:
+                break
+            pos = token.end()
+            char = text[token.start()]
+            if char in '/"\'`':
+                if token.lastgroup:
+                    pos = self._open_span(text, token)
+                continue  # comments and strings
+            closed_do, self.after_do_body = self.after_do_body, False
+
+            if char in 'fwd':
+                if char == 'w' and closed_do:
+                    self.header_depth = self.paren_depth  # trailer of do { } while (...);
+                    continue
+                self._record(self.open_loops + self.pending + 1)
+                self.pending += 1
+                self.pending_do = char == 'd'
+                self.header_depth = None if self.pending_do else self.paren_depth
+            elif char == '(':
+                self.paren_depth += 1
+            elif char == ')':
+                self.paren_depth = max(0, self.paren_depth - 1)
+                if self.paren_depth == self.header_depth:
+                    self.header_depth = None
+            elif char == '{':
+                if self.pending and self.header_depth is None:
+                    self.frames.append((self.pending, self.pending_do))
+                    self.open_loops += self.pending
+                    self.pending = 0
+                else:
+                    self.frames.append((0, False))
+            elif char == '}':
+                if self.frames:
+                    loops, is_do = self.frames.pop()
+                    self.open_loops -= loops
+                    self.after_do_body = is_do
+            elif self.header_depth is None:  # ';' ends a brace-less loop body
+                self.pending = 0
+
+
+def _nesting_tracker(language: str) -> _NestingTracker:
+    if language in BRACE_LANGUAGES:
+        return _BraceNestingTracker()
+    return _PythonNestingTracker()
+
+
+def analyze_loop_nesting(code: str, language: str) -> Dict[str, Any]:
+    """
+    Structural loop nesting in linear time: nested loop count (loops at
+    depth 2 or more), maximum loop depth and the number of loops per depth
+    """
+    tracker = _nesting_tracker(language)
+    tracker.feed(code)
+    return tracker.result()
+
+
+# ==================== Scanning ====================
+
+# Longest unfinished line StreamingCodeAnalyzer buffers between chunks
+STREAM_MAX_LINE_LENGTH = 1024 * 1024
+
+
+def _lower(code: str) -> str:
+    """
+    Lowercase without changing the length. str.lower() expands U+0130 to two
+    code points, which would move word boundaries, so map it the way
+    IGNORECASE does.
+    """
+    if '\u0130' in code:
+        code = code.replace('\u0130', 'i')
+    return code.lower()
+
+
+def _scan_patterns(code: str, language: str, counts: Dict[str, int]):
+    """Add the pattern category counts for code to counts"""
+    scanner, group_categories = SCANNERS.get(language, SCANNERS['python'])
+    recursion_end = -1
+
+    for match in scanner.finditer(_lower(code)):
+        category = group_categories[match.lastgroup]
+        if category == 'recursion':
+            # The name is only looked ahead at, so skip definitions that
+            # start inside the previous name to keep findall semantics
+            if match.start() < recursion_end:
+                continue
+            recursion_end = match.end('recursion_name')
+        counts[category] += 1
+
+
+def scan_code(code: str, language: str) -> Dict[str, int]:
+    """
+    Walk the source once and tally every pattern category
+    """
+    counts = dict.fromkeys(METRIC_CATEGORIES, 0)
+    _scan_patterns(code, language, counts)
+    counts.update(analyze_loop_nesting(code, language))
+    counts['lines'] = code.count('\n') + 1
+    return counts
+
+
+def _segment_end(buffer: str) -> int:
+    """
+    End of the longest prefix of buffer that can be scanned on its own:
+    complete lines only, not ending in a backslash-newline (which continues
+    strings and statements) or in def/function whose name may still be on
+    the next line (def\\s+ spans newlines)
+    """
+    end = buffer.rfind('\n') + 1
+    while end:
+        newline = end - 1
+        if buffer.endswith(('\\', '\\\r'), 0, newline):
+            end = buffer.rfind('\n', 0, newline) + 1
+            continue
+        content_end = end
+        while content_end and buffer[content_end - 1].isspace():
+            content_end -= 1
+        if not buffer[max(0, content_end - 8):content_end].lower().endswith(('def', 'function')):
+            break
+        end = buffer.rfind('\n', 0, content_end) + 1
+    return end
+
+
+class StreamingCodeAnalyzer:
+    """
+    Incremental scan_code for sources that arrive in chunks.
+
+    Chunks are split into line-aligned segments, so pattern matches and
+    loop nesting carry over chunk boundaries exactly, while only the
+    unfinished last line is buffered. Lines longer than max_line_length
+    are cut at whitespace to keep memory bounded.
+    """
+
+    def __init__(self, language: str, max_line_length: int = STREAM_MAX_LINE_LENGTH):
+        self.language = language
+        self.max_line_length = max_line_length
+        self.counts = dict.fromkeys(METRIC_CATEGORIES, 0)
+        self.newlines = 0
+        self.nesting = _nesting_tracker(language)
+        self._buffer = ''
+
+    def feed(self, chunk: str):
+        """Consume the next piece of source text"""
+        buffer = self._buffer + chunk
+        end = _segment_end(buffer)
+        if len(buffer) - end > self.max_line_length:
+            whitespace = max(buffer.rfind(' '), buffer.rfind('\t'))
+            end = whitespace + 1 if whitespace >= end else len(buffer)
+        if end:
+            self._process(buffer[:end])
+        self._buffer = buffer[end:]
+
+    def finish(self) -> Dict[str, Any]:
+        """Flush the buffered tail and return the same counts as scan_code"""
+        if self._buffer:
+            self._process(self._buffer)
+            self._buffer = ''
+        counts = dict(self.counts)
+        counts.update(self.nesting.result())
+        counts['lines'] = self.newlines + 1
+        return counts
+
+    def _process(self, segment: str):
+        _scan_patterns(segment, self.language, self.counts)
+        self.nesting.feed(segment)
+        self.newlines += segment.count('\n')
+
+
+# ==================== Incremental Analysis ====================
+
+# Regions are cut at the last safe line boundary within this many characters
+REGION_SIZE = 1024
+
+
+def _is_boundary(text: str, pos: int) -> bool:
+    """Whether text can be split at pos without changing any count"""
+    if pos == len(text):
+        return True
+    if pos == 0 or text[pos - 1] != '\n':
+        return False
+    # Judged from the last line with content: def\s+ and function\s+ match
+    # across the blank lines in between, as in _segment_end
+    content_end = pos
+    while content_end and text[content_end - 1].isspace():
+        content_end -= 1
+    line_start = text.rfind('\n', 0, content_end) + 1
+    return _segment_end(text[line_start:pos]) == pos - line_start
+
+
+def _next_region_end(text: str, start: int) -> int:
+    window_end = start + REGION_SIZE
+    if window_end >= len(text):
+        return len(text)
+    end = _segment_end(text[start:window_end])
+    if end:
+        return start + end
+    # No boundary within the window (very long lines): take the first one after it
+    newline = text.find('\n', window_end)
+    while newline != -1 and not _is_boundary(text, newline + 1):
+        newline = text.find('\n', newline + 1)
+    return len(text) if newline == -1 else newline + 1
+
+
+def _analyze_region(text: str, start: int, end: int, language: str, tracker: _NestingTracker) -> Dict[str, Any]:
+    """Counts for text[start:end], fed to tracker; the tracker state on entry is kept for resuming"""
+    entry = tracker.state()
+    segment = text[start:end]
+    counts = dict.fromkeys(METRIC_CATEGORIES, 0)
+    _scan_patterns(segment, language, counts)
+    tracker.depth_counts = {}
+    tracker.feed(segment)
+    return {
+        "length": end - start,
+        "newlines": segment.count('\n'),
+        "counts": [counts[category] for category in METRIC_CATEGORIES],
+        "depths": [[depth, n] for depth, n in sorted(tracker.depth_counts.items())],
+        "entry": entry,
+    }
+
+
+def analyze_regions(code: str, language: str) -> List[Dict[str, Any]]:
+    """
+    scan_code split into regions of about REGION_SIZE characters at line
+    boundaries, each with its own counts and the nesting tracker state it
+    starts in. Regions are JSON-serializable so they can be cached.
+    """
+    tracker = _nesting_tracker(language)
+    regions = []
+    start = 0
+    while start < len(code):
+        end = _next_region_end(code, start)
+        regions.append(_analyze_region(code, start, end, language, tracker))
+        start = end
+    return regions
+
+
+def reanalyze_regions(old_code: str, regions: List[Dict[str, Any]], new_code: str, language: str,
+                      shift: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    analyze_regions(new_code) from the regions of old_code. An old region
+    is reused where the same text starts in the same tracker state, either
+    at its old offset (before the edit) or moved by `shift` (after it);
+    everything else is rescanned, resuming from the state the previous
+    region left. shift defaults to the change in length; pass it when both
+    texts were cut to a maximum length. Returns the regions and how many
+    of them were scanned.
+    """
+    if shift is None:
+        shift = len(new_code) - len(old_code)
+    old_starts = []
+    offset = 0
+    for region in regions:
+        old_starts.append(offset)
+        offset += region["length"]
+    index_of = {offset: index for index, offset in enumerate(old_starts)}
+
+    tracker = _nesting_tracker(language)
+    state = tracker.state()
+    new_regions = []
+    scanned = 0
+    start = 0
+    while start < len(new_code):
+        region = _reusable_region(old_code, regions, index_of, new_code, start, shift, state)
+        if region is not None:
+            index, region = region
+            new_regions.append(region)
+            start += region["length"]
+            state = regions[index + 1]["entry"] if index + 1 < len(regions) else None
+            continue
+
+        end = _next_region_end(new_code, start)
+        # End where an old region starts after the edit if that comes first,
+        # so the regions from there on can be reused
+        following = bisect_right(old_starts, start - shift)
+        if following < len(old_starts):
+            moved = old_starts[following] + shift
+            if moved < end and _is_boundary(new_code, moved):
+                end = moved
+        tracker.restore(state)
+        new_regions.append(_analyze_region(new_code, start, end, language, tracker))
+        state = tracker.state()
+        scanned += 1
+        start = end
+    return new_regions, scanned
+
+
+def _reusable_region(old_code: str, regions: List[Dict[str, Any]], index_of: Dict[int, int], new_code: str,
+                     start: int, shift: int, state: List[Any]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """(index, region) of an old region that gives the same counts at start in new_code, if any"""
+    for offset in (start, start - shift):
+        index = index_of.get(offset)
+        if index is None:
+            continue
+        region = regions[index]
+        end = start + region["length"]
+        # The state after the last region is not kept, so it only fits at the end
+        last = index + 1 == len(regions)
+        if (region["entry"] == state and (end == len(new_code) or not last)
+                and new_code.startswith(old_code[offset:offset + region["length"]], start)
+                and _is_boundary(new_code, end)):
+            return index, region
+    return None
+
+
+def regions_counts(regions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The scan_code counts of the text the regions were made from"""
+    counts = dict.fromkeys(METRIC_CATEGORIES, 0)
+    nesting = _LoopDepthCounts()
+    newlines = 0
+    for region in regions:
+        for category, n in zip(METRIC_CATEGORIES, region["counts"]):
+            counts[category] += n
+        for depth, n in region["depths"]:
+            nesting._record(depth, n)
+        newlines += region["newlines"]
+    counts.update(nesting.result())
+    counts['lines'] = newlines + 1
+    return counts
+
+
+# ==================== Scoring ====================
+
+def score_metrics(counts: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Turn raw pattern counts into scores, CO2 estimate and rating
+    """
+    line_count = counts['lines']
+    loop_count = counts['loops']
+    nested_loop_count = counts['nested_loops']
+    api_call_count = counts['api_calls']
+    file_io_count = counts['file_io']
+    recursion_count = counts['recursion']
+    db_query_count = counts['db_queries']
+
+    # Calculate scores (0-100 scale, lower is better)
+    cpu_score = min(100, (loop_count * 2) + (nested_loop_count * 5) + (recursion_count * 3))
+    network_score = min(100, (api_call_count * 10) + (db_query_count * 5))
+    memory_score = min(100, (line_count * 0.1) + (file_io_count * 8))
+
+    # Calculate CO2 estimate (in grams)
+    # Formula: (CPU × 0.000002) + (Network × 0.0004) + (Memory × 0.0001)
+    co2_estimate = (cpu_score * 0.000002) + (network_score * 0.0004) + (memory_score * 0.0001)
+    co2_estimate = round(co2_estimate * 1000, 4)  # Convert to grams
+
+    # Calculate Green Score (0-100, higher is better)
+    total_impact = cpu_score + network_score + memory_score
+    green_score = max(0, 100 - (total_impact / 3))
+    green_score = round(green_score, 2)
+
+    # Determine rating
+    if green_score >= 80:
+        rating = "Excellent"
+        color = "green"
+    elif green_score >= 60:
+        rating = "Good"
+        color = "lightgreen"
+    elif green_score >= 40:
+        rating = "Fair"
+        color = "orange"
+    else:
+        rating = "Needs Improvement"
+        color = "red"
+
+    return {
+        "metrics": {
+            "lines_of_code": line_count,
+            "loops": loop_count,
+            "nested_loops": nested_loop_count,
+            "max_loop_depth": counts['max_loop_depth'],
+            "loop_depth_counts": {str(depth): n for depth, n in counts['loop_depth_counts'].items()},
+            "api_calls": api_call_count,
+            "file_io_operations": file_io_count,
+            "recursion_count": recursion_count,
+            "db_queries": db_query_count
+        },
+        "scores": {
+            "cpu_score": round(cpu_score, 2),
+            "network_score": round(network_score, 2),
+            "memory_score": round(memory_score, 2)
+        },
+        "co2_estimate_grams": co2_estimate,
+        "green_score": green_score,
+        "rating": rating,
+        "color": color,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def calculate_code_metrics(code: str, language: str) -> Dict[str, Any]:
+    """
+    Analyze code and calculate carbon footprint metrics
+    """
+    return score_metrics(scan_code(code, language))
+
+
+def calculate_code_metrics_batch(items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Analyze several (code, language) pairs; the unit of work sent to the
+    batch endpoint's process pool
+    """
+    return [calculate_code_metrics(code, language) for code, language in items]
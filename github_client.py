@@ -0,0 +1,311 @@
+"""
+EcoCode GitHub client
+Shared, pooled httpx client and conditional-request cache for the GitHub REST API
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+import httpx
+
+# Seconds between deletions of rows older than the cache's retention
+PRUNE_INTERVAL = 3600
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_github_client(
+    base_url: str = "https://api.github.com",
+    token: Optional[str] = None,
+    http2: bool = False,
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    keepalive_expiry: float = 30.0,
+    timeout: float = 30.0,
+    event_hooks: Optional[Dict[str, List[Callable[..., Any]]]] = None
+) -> httpx.AsyncClient:
+    """
+    Build the AsyncClient shared by all GitHub calls. Keeping one client
+    for the app's lifetime reuses TCP/TLS connections between requests.
+    `event_hooks` are passed to httpx (e.g. to time each request).
+    """
+    headers = {"Accept": "application/vnd.github+json"}
+    if token:
+        headers["Authorization"] = f"token {token}"
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        http2=http2 and http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=timeout,
+        event_hooks=event_hooks
+    )
+
+
+class GitHubResponseCache:
+    """
+    Persistent conditional-request cache for GitHub API GET calls.
+
+    Successful responses are stored with their ETag and Last-Modified
+    headers in SQLite, so the cache survives restarts and is shared by all
+    workers on the host. Entries younger than `fresh_for` seconds are
+    served directly; older ones are revalidated with If-None-Match /
+    If-Modified-Since, and a 304 does not count against the rate limit.
+    When X-RateLimit-Remaining drops to `rate_limit_reserve`, or GitHub
+    cannot be reached, entries up to `max_stale` seconds old are served
+    instead of failing.
+
+    SQLite is only touched on worker threads: lookups that miss the
+    in-memory LRU read the database with asyncio.to_thread, and saves are
+    written behind, batched into one transaction per flush. Rows not
+    refreshed for `retention` seconds are deleted at most every
+    PRUNE_INTERVAL seconds on flush, and on close. A database that cannot
+    be read counts as a miss. The file is created by open() (called at
+    startup) or on first use, and close() writes the remaining saves.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        fresh_for: float = 60.0,
+        max_stale: float = 3600.0,
+        rate_limit_reserve: int = 50,
+        memory_entries: int = 1024,
+        retention: float = 7 * 86400
+    ):
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.retention = retention
+        self.rate_limit_reserve = rate_limit_reserve
+        self.memory_entries = memory_entries
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: float = 0.0
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.path = path or None
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # Saves not yet written to SQLite, and the task writing them
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._next_prune = 0.0
+        self.pruned = 0
+        self.counters = {"fresh": 0, "revalidated": 0, "fetched": 0, "stale": 0}
+
+    def open(self):
+        """Create the database file and table now rather than on first use; blocking"""
+        if self.path is not None:
+            with self._db_lock:
+                self._connect()
+
+    async def get(self, client: httpx.AsyncClient, url: str) -> Tuple[int, Any]:
+        """Return (status code, decoded JSON) for a GitHub GET request"""
+        now = time.time()
+        entry = await self._load(url)
+        age = now - entry["fetched_at"] if entry else None
+
+        if entry and age < self.fresh_for:
+            self.counters["fresh"] += 1
+            return 200, entry["data"]
+        if entry and age < self.max_stale and self._quota_low(now):
+            self.counters["stale"] += 1
+            return 200, entry["data"]
+
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.HTTPError:
+            if entry and age < self.max_stale:
+                self.counters["stale"] += 1
+                return 200, entry["data"]
+            raise
+        self._track_rate_limit(response)
+
+        if response.status_code == 304 and entry:
+            self.counters["revalidated"] += 1
+            entry["fetched_at"] = now
+            self._save(url, entry)
+            return 200, entry["data"]
+
+        if response.status_code == 200:
+            self.counters["fetched"] += 1
+            data = response.json()
+            self._save(url, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "data": data,
+                "fetched_at": now
+            })
+            return 200, data
+
+        # Rate limited or a GitHub error: stale data beats a failure
+        if entry and age < self.max_stale and response.status_code in (403, 429, 500, 502, 503, 504):
+            self.counters["stale"] += 1
+            return 200, entry["data"]
+
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters and the last seen rate-limit budget"""
+        return {
+            **self.counters,
+            "memory_entries": len(self._memory),
+            "persistent": self.path is not None,
+            "pending_writes": len(self._pending),
+            "pruned": self.pruned,
+            "rate_limit_remaining": self.rate_limit_remaining
+        }
+
+    async def aclose(self):
+        """Write pending saves off the event loop, then close the database"""
+        while self._flusher is not None:
+            await asyncio.shield(self._flusher)
+        await asyncio.to_thread(self.close)
+
+    def close(self):
+        """Write pending saves and close the database; blocking"""
+        pending, self._pending = self._pending, {}
+        with self._db_lock:
+            if pending:
+                self._write(pending)
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute("BEGIN")
+                        self._prune(time.time())
+                except sqlite3.Error:
+                    pass  # left for the next flush or close
+                self._db.close()
+                self._db = None
+
+    def _quota_low(self, now: float) -> bool:
+        return (
+            self.rate_limit_remaining is not None
+            and self.rate_limit_remaining <= self.rate_limit_reserve
+            and now < self.rate_limit_reset
+        )
+
+    def _track_rate_limit(self, response: httpx.Response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit():
+            self.rate_limit_remaining = int(remaining)
+        if reset is not None and reset.isdigit():
+            self.rate_limit_reset = float(reset)
+
+    async def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                self._memory.move_to_end(url)
+                return entry
+        entry = self._pending.get(url)
+        if entry is not None or self.path is None:
+            return entry
+        try:
+            entry = await asyncio.to_thread(self._read, url)
+        except (sqlite3.Error, OSError, ValueError):
+            return None  # locked or corrupt: fetch from GitHub instead
+        if entry is not None:
+            self._remember(url, entry)
+        return entry
+
+    def _save(self, url: str, entry: Dict[str, Any]):
+        self._remember(url, entry)
+        if self.path is None:
+            return
+        self._pending[url] = entry
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        """Write saves to SQLite on a worker thread, batching those made meanwhile"""
+        try:
+            while self._pending:
+                pending, self._pending = self._pending, {}
+                try:
+                    await asyncio.to_thread(self._write_locked, pending)
+                except (sqlite3.Error, OSError):
+                    pass  # the entries are still served from memory
+        finally:
+            self._flusher = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """The database connection, created on first use; call with _db_lock held"""
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT, fetched_at REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_fetched_at ON responses (fetched_at)")
+            self._db = db
+        return self._db
+
+    def _read(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT etag, last_modified, body, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "data": json.loads(row[2]), "fetched_at": row[3]}
+
+    def _write_locked(self, entries: Dict[str, Dict[str, Any]]):
+        with self._db_lock:
+            self._write(entries)
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]):
+        """Store entries in one transaction; call with _db_lock held"""
+        db = self._connect()
+        with db:
+            db.execute("BEGIN")
+            db.executemany(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (url, entry["etag"], entry["last_modified"], json.dumps(entry["data"]), entry["fetched_at"])
+                    for url, entry in entries.items()
+                ]
+            )
+            now = time.time()
+            if now >= self._next_prune:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        """Delete rows not refreshed within the retention; call inside a transaction"""
+        cursor = self._db.execute("DELETE FROM responses WHERE fetched_at < ?", (now - self.retention,))
+        self.pruned += max(0, cursor.rowcount)
+        self._next_prune = now + PRUNE_INTERVAL
+
+    def _remember(self, url: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[url] = entry
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
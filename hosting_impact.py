@@ -0,0 +1,175 @@
+"""
+EcoCode hosting impact model
+Lookup tables plus a vectorized provider x region x tier grid
+"""
+
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Carbon intensity by region (grams CO2 per kWh)
+CARBON_INTENSITY = {
+    'us-east': 415,
+    'us-west': 320,
+    'eu-west': 280,
+    'eu-north': 45,
+    'asia-east': 550,
+    'asia-south': 630,
+    'australia': 720,
+    'south-america': 180,
+}
+
+# Energy per request (kWh) - varies by tier
+ENERGY_PER_REQUEST = {
+    'serverless': 0.0000001,
+    'basic': 0.0000005,
+    'standard': 0.000001,
+    'premium': 0.000002,
+}
+
+# Provider efficiency multiplier
+PROVIDER_EFFICIENCY = {
+    'aws': 1.0,
+    'gcp': 0.85,  # More renewable energy
+    'azure': 0.90,
+    'vercel': 0.88,
+    'netlify': 0.90,
+    'digitalocean': 1.05
+}
+
+# Costs per request (rough estimates)
+COST_PER_REQUEST = {
+    'serverless': 0.0000002,
+    'basic': 0.000001,
+    'standard': 0.000003,
+    'premium': 0.000008,
+}
+
+DEFAULT_CARBON_INTENSITY = 400
+DEFAULT_ENERGY_PER_REQUEST = 0.000001
+DEFAULT_PROVIDER_EFFICIENCY = 1.0
+DEFAULT_COST_PER_REQUEST = 0.000001
+
+PROVIDERS = tuple(PROVIDER_EFFICIENCY)
+REGIONS = tuple(CARBON_INTENSITY)
+TIERS = tuple(ENERGY_PER_REQUEST)
+
+# Result columns of the matrix, with the rounding calculate_hosting_impact applies
+MATRIX_COLUMNS = {
+    "monthly_energy_kwh": 6,
+    "monthly_co2_grams": 2,
+    "monthly_co2_kg": 4,
+    "yearly_co2_kg": 2,
+    "estimated_monthly_cost_usd": 2,
+}
+MATRIX_SORT_KEYS = ("monthly_co2_grams", "estimated_monthly_cost_usd", "monthly_energy_kwh")
+
+
+@lru_cache(maxsize=None)
+def matrix_tables() -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    NumPy versions of the lookup tables (intensity by region, energy by
+    tier, efficiency by provider, cost by tier), built once on first use
+    so importing this module does not pull in NumPy
+    """
+    import numpy as np
+
+    def table(values: Dict[str, float], keys: Sequence[str], default: float) -> "np.ndarray":
+        return np.array([values.get(key, default) for key in keys], dtype=np.float64)
+
+    return (
+        table(CARBON_INTENSITY, REGIONS, DEFAULT_CARBON_INTENSITY),
+        table(ENERGY_PER_REQUEST, TIERS, DEFAULT_ENERGY_PER_REQUEST),
+        table(PROVIDER_EFFICIENCY, PROVIDERS, DEFAULT_PROVIDER_EFFICIENCY),
+        table(COST_PER_REQUEST, TIERS, DEFAULT_COST_PER_REQUEST),
+    )
+
+
+def _round(values: "np.ndarray", decimals: int) -> List[float]:
+    """
+    np.round, except that values within float error of a rounding tie go
+    through Python's round so results match calculate_hosting_impact exactly
+    """
+    import numpy as np
+
+    scaled = values * 10.0 ** decimals
+    rounded = np.round(values, decimals)
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    result = rounded.tolist()
+    for i in np.flatnonzero(near_tie).tolist():
+        result[i] = round(float(values[i]), decimals)
+    return result
+
+
+def _select(names: Optional[List[str]], known: Sequence[str]) -> "np.ndarray":
+    import numpy as np
+
+    if not names:
+        return np.arange(len(known))
+    return np.array([known.index(name) for name in names])
+
+
+def hosting_impact_matrix(
+    monthly_requests: Sequence[int],
+    providers: Optional[List[str]] = None,
+    regions: Optional[List[str]] = None,
+    tiers: Optional[List[str]] = None,
+    sort_by: str = "monthly_co2_grams"
+) -> Dict[str, Any]:
+    """
+    Hosting impact for every provider x region x tier x monthly_requests
+    combination in one broadcast pass. Rows are sorted ascending by
+    `sort_by` (ties keep grid order) and returned column-wise; provider,
+    region and tier columns hold indexes into the `dictionaries` lists.
+    """
+    import numpy as np
+
+    intensity_table, energy_table, efficiency_table, cost_table = matrix_tables()
+    provider_idx = _select(providers, PROVIDERS)
+    region_idx = _select(regions, REGIONS)
+    tier_idx = _select(tiers, TIERS)
+    requests = np.asarray(monthly_requests, dtype=np.float64)
+
+    # Axes: provider, region, tier, monthly_requests
+    efficiency = efficiency_table[provider_idx][:, None, None, None]
+    intensity = intensity_table[region_idx][None, :, None, None]
+    energy = requests[None, None, None, :] * energy_table[tier_idx][None, None, :, None]
+    cost = requests[None, None, None, :] * cost_table[tier_idx][None, None, :, None]
+
+    shape = (len(provider_idx), len(region_idx), len(tier_idx), len(requests))
+    co2 = energy * intensity * efficiency
+    values = {
+        "monthly_energy_kwh": np.broadcast_to(energy, shape),
+        "monthly_co2_grams": co2,
+        "monthly_co2_kg": co2 / 1000,
+        "yearly_co2_kg": (co2 * 12) / 1000,
+        "estimated_monthly_cost_usd": np.broadcast_to(cost, shape),
+    }
+
+    order = np.argsort(values[sort_by].ravel(), kind="stable")
+    grid = np.unravel_index(order, shape)
+
+    columns = {
+        "provider": grid[0].tolist(),
+        "region": grid[1].tolist(),
+        "tier": grid[2].tolist(),
+        "monthly_requests": requests.astype(np.int64)[grid[3]].tolist(),
+    }
+    for name, decimals in MATRIX_COLUMNS.items():
+        columns[name] = _round(values[name].ravel()[order], decimals)
+
+    return {
+        "rows": len(order),
+        "sort_by": sort_by,
+        "dictionaries": {
+            "provider": [PROVIDERS[i] for i in provider_idx],
+            "region": [REGIONS[i] for i in region_idx],
+            "tier": [TIERS[i] for i in tier_idx],
+        },
+        "carbon_intensity_region": intensity_table[region_idx].tolist(),
+        "provider_efficiency_score": efficiency_table[provider_idx].tolist(),
+        "columns": columns,
+    }
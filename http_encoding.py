@@ -0,0 +1,167 @@
+"""
+EcoCode response encoding
+Fast JSON rendering and size-thresholded gzip / brotli compression of response bodies
+"""
+
+import gzip
+import json
+from typing import Any, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import MetricsRegistry
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact UTF-8 JSON. Uses orjson when it is installed; types it does not
+    know are converted with FastAPI's jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(
+        content, default=jsonable_encoder, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with dumps(). Endpoints that return one directly
+    also skip the jsonable_encoder pass FastAPI makes over returned dicts.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """
+    Codings an Accept-Encoding header allows. "*" stands for gzip and br
+    unless they are refused with q=0.
+    """
+    accepted, refused = set(), set()
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if coding:
+            (accepted if _quality(params) > 0 else refused).add(coding)
+    if "*" in accepted:
+        accepted |= {"gzip", "br"}
+    return accepted - refused
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """br when brotli is installed and accepted, else gzip if accepted, else None"""
+    accepted = accepted_encodings(header)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies of at least `minimum_size`
+    bytes with brotli (if the package is installed) or gzip, whichever the
+    client accepts. Only bodies sent in one piece are compressed; streamed
+    responses such as server-sent events pass through untouched so no
+    event is held back in a compressor buffer. Compressed responses are
+    counted by encoding, and their bytes before and after compression.
+    """
+
+    def __init__(
+        self,
+        app,
+        registry: MetricsRegistry,
+        counter: str,
+        bytes_counter: str,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4
+    ):
+        self.app = app
+        self.registry = registry
+        self.counter = counter
+        self.bytes_counter = bytes_counter
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            response_start, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=response_start["headers"])
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(response_start)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is not None:
+                compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                if len(compressed) < len(body):
+                    self.registry.inc(self.counter, encoding)
+                    self.registry.inc(self.bytes_counter, encoding, "original", amount=len(body))
+                    self.registry.inc(self.bytes_counter, encoding, "compressed", amount=len(compressed))
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    body = compressed
+            await send(response_start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
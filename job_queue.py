@@ -0,0 +1,271 @@
+"""
+EcoCode background jobs
+Bounded worker pool for slow analyses with priorities, deduplication and result retention
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional, Dict, Any, List, Tuple, Awaitable, AsyncIterator
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting"""
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.utcfromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+class Job:
+    """
+    One submitted job. Its status moves from queued to running to
+    succeeded, failed or cancelled; the running coroutine can publish
+    progress with report().
+    """
+
+    def __init__(self, kind: str, key: str, priority: int, factory: Callable[["Job"], Awaitable[Any]]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.priority = priority
+        self.status = QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submissions = 1
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        self._factory: Optional[Callable[["Job"], Awaitable[Any]]] = factory
+        self._on_success: List[Callable[[Any], Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def report(self, stage: str, **details: Any):
+        """Publish progress from the running job"""
+        self.progress = {"stage": stage, **details}
+        self._notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state, with the result or error once finished"""
+        data = {
+            "job_id": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "progress": self.progress,
+            "submissions": self.submissions,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+            "expires_at": _isoformat(self.expires_at)
+        }
+        if self.status == SUCCEEDED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+    async def updates(self, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        The current snapshot, then one per change until the job finishes.
+        Yields None after `heartbeat` seconds without a change.
+        """
+        while True:
+            changed = self._changed
+            yield self.snapshot()
+            if self.done:
+                return
+            while not changed.is_set():
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class JobQueue:
+    """
+    Runs coroutine jobs in the background, at most `workers` at a time.
+
+    Waiting jobs start in priority order (higher first, then oldest first).
+    Submitting a job with the same (kind, key) as one that is queued or
+    running returns that job instead of starting another; a higher
+    priority moves it up the queue, and every submitter's `on_success`
+    callback runs when it succeeds. Finished jobs are kept for `retention`
+    seconds (and at most `max_retained` of them) so clients can collect
+    their results. Once `max_pending` jobs are waiting, submit raises
+    JobQueueFull. Jobs live in the process that accepted them.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 1000, retention: float = 3600, max_retained: int = 10000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_retained = max_retained
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[Tuple[str, str], Job] = {}  # queued or running, by (kind, key)
+        # (-priority, sequence, job); re-prioritized jobs leave stale entries behind
+        self._waiting: List[Tuple[int, int, Job]] = []
+        self._sequence = itertools.count()
+        self._finished: "deque[Tuple[float, str]]" = deque()  # (expires_at, job id) in finishing order
+        self._queued = 0
+        self._running = 0
+        self.counters = {
+            "submitted": 0, "deduplicated": 0, "rejected": 0,
+            SUCCEEDED: 0, FAILED: 0, CANCELLED: 0, "expired": 0
+        }
+
+    def submit(
+        self,
+        kind: str,
+        key: str,
+        factory: Callable[[Job], Awaitable[Any]],
+        priority: int = 0,
+        on_success: Optional[Callable[[Any], Any]] = None
+    ) -> Tuple[Job, bool]:
+        """
+        Queue `factory(job)` unless an identical job is queued or running.
+        Returns the job and whether it was an existing one.
+        """
+        self._expire()
+        job = self._active.get((kind, key))
+        if job is not None:
+            self.counters["deduplicated"] += 1
+            job.submissions += 1
+            if on_success is not None:
+                job._on_success.append(on_success)
+            if priority > job.priority and job.status == QUEUED:
+                job.priority = priority
+                heapq.heappush(self._waiting, (-priority, next(self._sequence), job))
+            return job, True
+
+        if self._queued >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise JobQueueFull(f"{self._queued} jobs are already waiting")
+
+        job = Job(kind, key, priority, factory)
+        if on_success is not None:
+            job._on_success.append(on_success)
+        self._jobs[job.id] = job
+        self._active[(kind, key)] = job
+        heapq.heappush(self._waiting, (-priority, next(self._sequence), job))
+        self._queued += 1
+        self.counters["submitted"] += 1
+        self._dispatch()
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this id, or None if it is unknown or has expired"""
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job (for every submitter); finished jobs are left as they are"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == QUEUED:
+            self._queued -= 1
+            self._finish(job, CANCELLED)
+        elif job._task is not None:
+            job._task.cancel()
+        return job
+
+    async def stop(self):
+        """Cancel all queued and running jobs and wait for them to unwind"""
+        tasks = [job._task for job in self._active.values() if job._task is not None]
+        for job in list(self._active.values()):
+            self.cancel(job.id)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire()
+        return {
+            "queued": self._queued,
+            "running": self._running,
+            "workers": self.workers,
+            "retained": len(self._jobs) - len(self._active),
+            **self.counters
+        }
+
+    def _dispatch(self):
+        """Start waiting jobs while workers are free"""
+        while self._running < self.workers and self._waiting:
+            negative_priority, _, job = heapq.heappop(self._waiting)
+            if job.status != QUEUED or -negative_priority != job.priority:
+                continue  # cancelled, or superseded by a higher priority entry
+            self._queued -= 1
+            self._running += 1
+            job.status = RUNNING
+            job.started_at = time.time()
+            job._task = asyncio.get_running_loop().create_task(self._run(job))
+            job._task.add_done_callback(lambda task, job=job: self._release(job))
+            job._notify()
+
+    async def _run(self, job: Job):
+        try:
+            result = await job._factory(job)
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            self._finish(job, FAILED)
+        else:
+            job.result = result
+            for callback in job._on_success:
+                try:
+                    callback(result)
+                except Exception:
+                    pass
+            self._finish(job, SUCCEEDED)
+
+    def _release(self, job: Job):
+        """
+        Free the job's worker once its task is done. A task cancelled before
+        its first step never runs _run, so the job is finished here too.
+        """
+        if not job.done:
+            self._finish(job, CANCELLED)
+        self._running -= 1
+        self._dispatch()
+
+    def _finish(self, job: Job, status: str):
+        now = time.time()
+        job.status = status
+        job.finished_at = now
+        job.expires_at = now + self.retention
+        job._factory = None
+        job._on_success = []
+        if self._active.get((job.kind, job.key)) is job:
+            del self._active[(job.kind, job.key)]
+        self._finished.append((job.expires_at, job.id))
+        self.counters[status] += 1
+        job._notify()
+
+    def _expire(self):
+        now = time.time()
+        while self._finished and (self._finished[0][0] <= now or len(self._finished) > self.max_retained):
+            _, job_id = self._finished.popleft()
+            if self._jobs.pop(job_id, None) is not None:
+                self.counters["expired"] += 1
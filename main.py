@@ -5,33 +5,104 @@ Production-ready backend with all analysis endpoints
 
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, HttpUrl, validator
-from typing import Optional, List, Dict, Any
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, HttpUrl, ValidationError, validator
+from typing import Optional, List, Dict, Any, Tuple, Callable, Union, TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import codecs
+from contextlib import asynccontextmanager
+import math
 import re
 import os
 import httpx
 import hashlib
-from datetime import datetime
-from slowapi import Limiter, _rate_limit_exceeded_handler
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-import google.generativeai as genai
-from supabase import create_client, Client
 import json
 
+from code_metrics import (
+    calculate_code_metrics,
+    calculate_code_metrics_batch,
+    score_metrics,
+    analyze_regions,
+    reanalyze_regions,
+    regions_counts,
+    StreamingCodeAnalyzer,
+    STREAM_MAX_LINE_LENGTH
+)
+from cache import ResultCache, SingleFlight
+from github_client import create_github_client, GitHubResponseCache
+from repo_scanner import analyze_tarball_stream
+from write_queue import WriteBehindQueue
+from job_queue import JobQueue, JobQueueFull
+from unified_diff import apply_unified_diff, DiffError
+from ai_stream import StreamingJSONParser
+from metrics import MetricsRegistry, MetricsMiddleware, STAGE_BUCKETS, UPSTREAM_BUCKETS
+from http_encoding import FastJSONResponse, CompressionMiddleware, dumps
+from rate_limit import create_limiter, SharedLimiter
+from hosting_impact import (
+    CARBON_INTENSITY,
+    ENERGY_PER_REQUEST,
+    PROVIDER_EFFICIENCY,
+    COST_PER_REQUEST,
+    DEFAULT_CARBON_INTENSITY,
+    DEFAULT_ENERGY_PER_REQUEST,
+    DEFAULT_PROVIDER_EFFICIENCY,
+    DEFAULT_COST_PER_REQUEST,
+    PROVIDERS,
+    REGIONS,
+    TIERS,
+    MATRIX_SORT_KEYS,
+    hosting_impact_matrix,
+    matrix_tables
+)
+from carbon_intensity import (
+    CarbonCurves,
+    open_curves,
+    resolve_profile,
+    profile_weights,
+    hour_of_year
+)
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared clients on startup and release them on shutdown"""
+    if isinstance(limiter, SharedLimiter):
+        limiter.open()
+    get_github_client()
+    await asyncio.to_thread(github_cache.open)
+    if WARM_UP_INTEGRATIONS:
+        # Load the heavy SDKs in the background once the server is accepting requests
+        asyncio.ensure_future(asyncio.to_thread(warm_up_integrations))
+    yield
+    await job_queue.stop()
+    await write_queue.stop(timeout=SUPABASE_DRAIN_TIMEOUT)
+    await close_github_client()
+    await github_cache.aclose()
+    if analysis_pool is not None:
+        analysis_pool.shutdown(cancel_futures=True)
+    close_gemini_executor()
+    if isinstance(limiter, SharedLimiter):
+        limiter.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="EcoCode API",
     description="Carbon Footprint Analyzer for Code",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -44,20 +115,353 @@ app.add_middleware(
 # Environment variables
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+SUPABASE_QUEUE_MAX = int(os.getenv("SUPABASE_QUEUE_MAX", "10000"))
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "100"))
+SUPABASE_FLUSH_INTERVAL = float(os.getenv("SUPABASE_FLUSH_INTERVAL", "1"))
+SUPABASE_MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "3"))
+SUPABASE_DRAIN_TIMEOUT = float(os.getenv("SUPABASE_DRAIN_TIMEOUT", "10"))
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "40"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "100"))
+HISTORY_CACHE_TTL = float(os.getenv("HISTORY_CACHE_TTL", "30"))
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "86400"))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_HTTP2 = os.getenv("GITHUB_HTTP2", "false").lower() == "true"
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+GITHUB_MAX_KEEPALIVE = int(os.getenv("GITHUB_MAX_KEEPALIVE", "10"))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "30"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+GITHUB_CACHE_PATH = os.getenv("GITHUB_CACHE_PATH", ".ecocode-cache/github.sqlite3")
+GITHUB_CACHE_FRESH_SECONDS = float(os.getenv("GITHUB_CACHE_FRESH_SECONDS", "60"))
+GITHUB_CACHE_MAX_STALE = float(os.getenv("GITHUB_CACHE_MAX_STALE", "3600"))
+GITHUB_CACHE_RETENTION = float(os.getenv("GITHUB_CACHE_RETENTION", str(7 * 86400)))
+GITHUB_RATELIMIT_RESERVE = int(os.getenv("GITHUB_RATELIMIT_RESERVE", "50"))
+GITHUB_DEEP_MAX_FILES = int(os.getenv("GITHUB_DEEP_MAX_FILES", "2000"))
+GITHUB_DEEP_MAX_BYTES = int(os.getenv("GITHUB_DEEP_MAX_BYTES", str(50 * 1024 * 1024)))
+GITHUB_DEEP_MAX_FILE_BYTES = int(os.getenv("GITHUB_DEEP_MAX_FILE_BYTES", str(1024 * 1024)))
+GITHUB_DEEP_MAX_DOWNLOAD_BYTES = int(os.getenv("GITHUB_DEEP_MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+GITHUB_DEEP_TIMEOUT = float(os.getenv("GITHUB_DEEP_TIMEOUT", "300"))
+GITHUB_LIST_PAGE_SIZE = 100  # the largest per_page the API allows
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "")
+ANALYSIS_CACHE_DISK_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+ANALYSIS_CACHE_SWEEP_INTERVAL = float(os.getenv("ANALYSIS_CACHE_SWEEP_INTERVAL", "300"))
+DOCUMENT_CACHE_TTL = float(os.getenv("DOCUMENT_CACHE_TTL", "3600"))
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DOCUMENT_CACHE_DISK_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(100 * 1024 * 1024)))
+HOSTING_MATRIX_MAX_VOLUMES = int(os.getenv("HOSTING_MATRIX_MAX_VOLUMES", "100"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "1000"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "10000"))
+JOB_EVENTS_HEARTBEAT = float(os.getenv("JOB_EVENTS_HEARTBEAT", "15"))
+ORG_SCAN_CONCURRENCY = int(os.getenv("ORG_SCAN_CONCURRENCY", "8"))
+ORG_SCAN_MAX_REPOS = int(os.getenv("ORG_SCAN_MAX_REPOS", "1000"))
+ORG_SCAN_DEEP_CONCURRENCY = int(os.getenv("ORG_SCAN_DEEP_CONCURRENCY", "2"))
+WARM_UP_INTEGRATIONS = os.getenv("WARM_UP_INTEGRATIONS", "true").lower() == "true"
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "1"))
+CARBON_INTENSITY_PATH = os.getenv("CARBON_INTENSITY_PATH", ".ecocode-cache/carbon_intensity.bin")
+CARBON_INTENSITY_MODELLED = os.getenv("CARBON_INTENSITY_MODELLED", "false").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "shared")
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "")
+RATE_LIMIT_SLOTS = int(os.getenv("RATE_LIMIT_SLOTS", "65536"))
+
+# Rate limiting; the shared backend keeps one set of token buckets for all
+# workers on the host, so "20/minute" holds however many workers run. Its
+# table file is created in the lifespan hook, not at import
+limiter = create_limiter(
+    get_remote_address,
+    backend=RATE_LIMIT_BACKEND,
+    path=RATE_LIMIT_PATH or None,
+    slots=RATE_LIMIT_SLOTS
+)
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+# Supabase and Gemini SDKs are slow to import, so their clients are created
+# on first use (or by the warm-up started in lifespan) rather than at import
+supabase: Optional["Client"] = None
+model = None
+carbon_curves: Optional[CarbonCurves] = None
+integrations_lock = threading.Lock()
+
+
+def supabase_configured() -> bool:
+    return supabase is not None or bool(SUPABASE_URL and SUPABASE_KEY)
+
+
+def get_supabase() -> Optional["Client"]:
+    """Return the Supabase client, importing the SDK on first use"""
+    global supabase
+    if supabase is None and SUPABASE_URL and SUPABASE_KEY:
+        with integrations_lock:
+            if supabase is None:
+                from supabase import create_client
+                supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase
+
+
+def get_gemini_model():
+    """Return the Gemini model, importing and configuring the SDK on first use"""
+    global model
+    if model is None and GEMINI_API_KEY:
+        with integrations_lock:
+            if model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                model = genai.GenerativeModel('gemini-pro')
+    return model
+
+
+def carbon_curves_file_exists() -> bool:
+    return bool(CARBON_INTENSITY_PATH) and os.path.exists(CARBON_INTENSITY_PATH)
+
+
+def get_carbon_curves() -> Optional[CarbonCurves]:
+    """
+    Return the hourly carbon intensity curves, memory-mapping the file on
+    first use. Without a curves file they are the modelled curves when
+    CARBON_INTENSITY_MODELLED is set, and None otherwise.
+    """
+    global carbon_curves
+    if carbon_curves is None and (CARBON_INTENSITY_MODELLED or carbon_curves_file_exists()):
+        with integrations_lock:
+            if carbon_curves is None:
+                carbon_curves = open_curves(CARBON_INTENSITY_PATH, modelled=CARBON_INTENSITY_MODELLED)
+    return carbon_curves
+
+
+def carbon_intensity_status() -> str:
+    """Where hourly intensities come from: "hourly" (a curves file), "modelled" or "annual averages" """
+    if carbon_curves is not None:
+        return carbon_curves.source
+    if carbon_curves_file_exists():
+        return "hourly"
+    return "modelled" if CARBON_INTENSITY_MODELLED else "annual averages"
+
+
+def warm_up_integrations():
+    """Import configured SDKs and build lookup tables before the first request needs them"""
+    try:
+        get_supabase()
+        get_gemini_model()
+        matrix_tables()
+        get_carbon_curves()
+    except Exception:
+        # Anything that failed here is retried, and reported, on first use
+        pass
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
 
-# Initialize Gemini AI
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-pro')
+def insert_rows(table: str, rows: List[Dict[str, Any]]):
+    """Bulk insert used by the write-behind queue"""
+    with metrics.track("upstream_duration_seconds", "supabase"):
+        get_supabase().table(table).insert(rows).execute()
+
+
+# History pages per user, dropped once a new analysis for that user has
+# been written. history_inflight counts, per user with a history query
+# running, [queries, writes since they started] so a query that raced a
+# write skips caching its (already stale) result; entries go when the
+# last query for the user finishes.
+history_cache = ResultCache(ttl=HISTORY_CACHE_TTL, max_bytes=8 * 1024 * 1024)
+history_inflight: Dict[str, List[int]] = {}
+
+
+def invalidate_history(table: str, rows: List[Dict[str, Any]]):
+    """Forget cached history for every user with a newly written row"""
+    for user_id in {row.get("user_id") for row in rows}:
+        if user_id:
+            if user_id in history_inflight:
+                history_inflight[user_id][1] += 1
+            history_cache.invalidate(user_id)
+
+
+# Analysis records are written behind the request in bulk inserts
+write_queue = WriteBehindQueue(
+    insert_rows,
+    max_size=SUPABASE_QUEUE_MAX,
+    batch_size=SUPABASE_BATCH_SIZE,
+    flush_interval=SUPABASE_FLUSH_INTERVAL,
+    max_retries=SUPABASE_MAX_RETRIES,
+    on_written=invalidate_history
+)
+
+# Analysis results keyed on (code hash, language); the disk tier is shared
+# between workers when ANALYSIS_CACHE_DIR is set
+analysis_cache = ResultCache(
+    ttl=ANALYSIS_CACHE_TTL,
+    max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+    disk_dir=ANALYSIS_CACHE_DIR or None,
+    disk_max_bytes=ANALYSIS_CACHE_DISK_MAX_BYTES,
+    sweep_interval=ANALYSIS_CACHE_SWEEP_INTERVAL
+)
+
+# Code and per-region counts of /analyze-code/incremental submissions, keyed
+# on (hash of the submitted code, language), for diffs against them
+document_cache = ResultCache(
+    ttl=DOCUMENT_CACHE_TTL,
+    max_bytes=DOCUMENT_CACHE_MAX_BYTES,
+    disk_dir=os.path.join(ANALYSIS_CACHE_DIR, "documents") if ANALYSIS_CACHE_DIR else None,
+    disk_max_bytes=DOCUMENT_CACHE_DISK_MAX_BYTES,
+    sweep_interval=ANALYSIS_CACHE_SWEEP_INTERVAL
+)
+
+# Parsed Gemini suggestions keyed on the prompt hash; identical prompts in
+# flight at the same time share one upstream call
+ai_cache = ResultCache(ttl=AI_CACHE_TTL, max_bytes=AI_CACHE_MAX_BYTES)
+ai_single_flight = SingleFlight()
+
+# Background GitHub and AI analyses submitted through /jobs
+job_queue = JobQueue(
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    retention=JOB_RETENTION_SECONDS,
+    max_retained=JOB_MAX_RETAINED
+)
+JOB_PRIORITIES = {"low": 0, "normal": 1, "high": 2}
+
+# Shared GitHub client, created in the lifespan hook (or on first use)
+github_client: Optional[httpx.AsyncClient] = None
+
+# ETag-revalidated GitHub responses, persisted across restarts; the SQLite
+# file is opened in the lifespan hook
+github_cache = GitHubResponseCache(
+    path=GITHUB_CACHE_PATH or None,
+    fresh_for=GITHUB_CACHE_FRESH_SECONDS,
+    max_stale=GITHUB_CACHE_MAX_STALE,
+    rate_limit_reserve=GITHUB_RATELIMIT_RESERVE,
+    retention=GITHUB_CACHE_RETENTION
+)
+
+# Process pool for batch analysis, started on first use
+BATCH_TOTAL_METRICS = (
+    "lines_of_code", "loops", "nested_loops", "api_calls",
+    "file_io_operations", "recursion_count", "db_queries"
+)
+analysis_pool: Optional[ProcessPoolExecutor] = None
+
+# The Gemini SDK call blocks, so it runs on dedicated threads; the semaphore
+# caps running calls at GEMINI_MAX_CONCURRENCY, abandoned ones included
+gemini_executor: Optional[ThreadPoolExecutor] = None
+gemini_semaphore: Optional[asyncio.Semaphore] = None
+
+
+# ==================== Metrics ====================
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+metrics.counter("http_requests_total", "HTTP requests by method, route and status", ["method", "route", "status"])
+metrics.histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+metrics.histogram(
+    "stage_duration_seconds", "Latency of each stage of a request handler",
+    ["route", "stage"], buckets=STAGE_BUCKETS
+)
+metrics.histogram(
+    "upstream_duration_seconds", "Latency of GitHub, Gemini and Supabase calls",
+    ["upstream", "outcome"], buckets=UPSTREAM_BUCKETS
+)
+metrics.counter("compressed_responses_total", "Compressed responses by encoding", ["encoding"])
+metrics.counter(
+    "compressed_response_bytes_total", "Body bytes of compressed responses before and after compression",
+    ["encoding", "size"]
+)
+
+
+def collect_component_metrics():
+    """Cache and write queue counters, read when /metrics is scraped"""
+    caches = {"analysis": analysis_cache, "documents": document_cache, "ai": ai_cache, "history": history_cache}
+    queue_stats = write_queue.stats()
+    job_stats = job_queue.stats()
+    return [
+        ("cache_requests_total", "counter", "Result cache lookups by cache and result", [
+            ({"cache": name, "result": result}, getattr(cache, attr))
+            for name, cache in caches.items()
+            for result, attr in (("hit", "hits"), ("miss", "misses"))
+        ]),
+        ("github_cache_requests_total", "counter", "GitHub response cache lookups by result", [
+            ({"result": result}, count) for result, count in github_cache.counters.items()
+        ]),
+        ("write_queue_depth", "gauge", "Analysis records waiting to be written", [({}, queue_stats["depth"])]),
+        ("write_queue_records_total", "counter", "Analysis records by write queue outcome", [
+            ({"outcome": outcome}, queue_stats[outcome]) for outcome in ("enqueued", "written", "rejected", "failed")
+        ]),
+        ("jobs", "gauge", "Background jobs by state", [
+            ({"state": state}, job_stats[state]) for state in ("queued", "running", "retained")
+        ]),
+        ("jobs_total", "counter", "Background jobs by outcome", [
+            ({"outcome": outcome}, job_stats[outcome])
+            for outcome in ("submitted", "deduplicated", "rejected", "succeeded", "failed", "cancelled", "expired")
+        ]),
+    ]
+
+
+metrics.add_collector(collect_component_metrics)
+app.add_middleware(
+    CompressionMiddleware,
+    registry=metrics,
+    counter="compressed_responses_total",
+    bytes_counter="compressed_response_bytes_total",
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY
+)
+# Added last so it is outermost and its latency includes compression
+app.add_middleware(
+    MetricsMiddleware,
+    registry=metrics,
+    counter="http_requests_total",
+    histogram="http_request_duration_seconds"
+)
 
 
 # ==================== Pydantic Models ====================
 
+SUPPORTED_LANGUAGES = ['python', 'javascript', 'typescript', 'java', 'cpp']
+
+CODE_MAX_LENGTH = 50000  # 50KB limit
+SANITIZED_MAX_LENGTH = 10000
+
+DANGEROUS_CODE_PATTERN = re.compile(r'eval\(|exec\(|__import__', re.IGNORECASE)
+# The same patterns as plain substrings; for ASCII text, lowercasing and
+# substring search match exactly what the case-insensitive regex does,
+# an order of magnitude faster
+DANGEROUS_SUBSTRINGS = ('eval(', 'exec(', '__import__')
+DANGEROUS_BYTES = tuple(pattern.encode() for pattern in DANGEROUS_SUBSTRINGS)
+
+
+# A diff may remove every line of the code and add as many again
+DIFF_MAX_LENGTH = 2 * CODE_MAX_LENGTH
+
+
+def has_dangerous_pattern(code: str) -> bool:
+    """DANGEROUS_CODE_PATTERN.search(code), with a fast path for ASCII text"""
+    if code.isascii():
+        lowered = code.lower()
+        return any(pattern in lowered for pattern in DANGEROUS_SUBSTRINGS)
+    return DANGEROUS_CODE_PATTERN.search(code) is not None
+
+
+def check_code(code: str) -> str:
+    """Size and dangerous pattern checks shared by the code analysis requests"""
+    if len(code) > CODE_MAX_LENGTH:
+        raise ValueError('Code exceeds maximum size')
+    # Sanitize dangerous patterns
+    if has_dangerous_pattern(code):
+        raise ValueError('Code contains potentially dangerous patterns')
+    return code
+
+
 class CodeAnalysisRequest(BaseModel):
     code: str
     language: str
@@ -65,26 +469,57 @@ class CodeAnalysisRequest(BaseModel):
     
     @validator('code')
     def validate_code(cls, v):
-        if len(v) > 50000:  # 50KB limit
-            raise ValueError('Code exceeds maximum size')
-        # Sanitize dangerous patterns
-        dangerous_patterns = [r'eval\(', r'exec\(', r'__import__']
-        for pattern in dangerous_patterns:
-            if re.search(pattern, v, re.IGNORECASE):
-                raise ValueError('Code contains potentially dangerous patterns')
+        return check_code(v)
+    
+    @validator('language')
+    def validate_language(cls, v):
+        if v.lower() not in SUPPORTED_LANGUAGES:
+            raise ValueError(f'Language must be one of {SUPPORTED_LANGUAGES}')
+        return v.lower()
+
+
+class IncrementalAnalysisRequest(BaseModel):
+    # Either the whole code, or the code_hash of an earlier submission and a unified diff against it
+    language: str
+    code: Optional[str] = None
+    code_hash: Optional[str] = None
+    diff: Optional[str] = None
+    user_id: Optional[str] = None
+    
+    @validator('code')
+    def validate_code(cls, v):
+        return check_code(v) if v is not None else v
+    
+    @validator('diff')
+    def validate_diff(cls, v):
+        if v is not None and len(v) > DIFF_MAX_LENGTH:
+            raise ValueError('Diff exceeds maximum size')
         return v
     
     @validator('language')
     def validate_language(cls, v):
-        allowed = ['python', 'javascript', 'typescript', 'java', 'cpp']
-        if v.lower() not in allowed:
-            raise ValueError(f'Language must be one of {allowed}')
+        if v.lower() not in SUPPORTED_LANGUAGES:
+            raise ValueError(f'Language must be one of {SUPPORTED_LANGUAGES}')
         return v.lower()
 
 
+class BatchCodeAnalysisRequest(BaseModel):
+    # Items are validated one by one so a bad file only fails its own entry
+    items: List[Any]
+    
+    @validator('items')
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError('Batch must contain at least one item')
+        if len(v) > BATCH_MAX_ITEMS:
+            raise ValueError(f'Batch exceeds maximum of {BATCH_MAX_ITEMS} items')
+        return v
+
+
 class GitHubAnalysisRequest(BaseModel):
     repo_url: str
     user_id: Optional[str] = None
+    deep: bool = False
     
     @validator('repo_url')
     def validate_repo_url(cls, v):
@@ -94,6 +529,29 @@ class GitHubAnalysisRequest(BaseModel):
         return v
 
 
+# GitHub logins: alphanumerics and single hyphens, at most 39 characters
+GITHUB_OWNER_PATTERN = re.compile(r'^[A-Za-z0-9](?:[A-Za-z0-9]|-(?=[A-Za-z0-9])){0,38}$')
+
+
+class GitHubOrgScanRequest(BaseModel):
+    owner: str
+    user_id: Optional[str] = None
+    deep: bool = False
+    max_repos: Optional[int] = None
+    
+    @validator('owner')
+    def validate_owner(cls, v):
+        if not GITHUB_OWNER_PATTERN.match(v):
+            raise ValueError('Invalid GitHub organization or user name')
+        return v
+    
+    @validator('max_repos')
+    def validate_max_repos(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('max_repos must be at least 1')
+        return v
+
+
 class AIOptimizeRequest(BaseModel):
     code: str
     language: str
@@ -101,11 +559,34 @@ class AIOptimizeRequest(BaseModel):
     user_id: Optional[str] = None
 
 
+def check_priority(priority: str) -> str:
+    if priority not in JOB_PRIORITIES:
+        raise ValueError(f'Priority must be one of {list(JOB_PRIORITIES)}')
+    return priority
+
+
+class GitHubJobRequest(GitHubAnalysisRequest):
+    priority: str = "normal"
+    
+    @validator('priority')
+    def validate_priority(cls, v):
+        return check_priority(v)
+
+
+class AIOptimizeJobRequest(AIOptimizeRequest):
+    priority: str = "normal"
+    
+    @validator('priority')
+    def validate_priority(cls, v):
+        return check_priority(v)
+
+
 class HostingImpactRequest(BaseModel):
     provider: str
     region: str
     tier: str
     monthly_requests: int = 100000
+    traffic_profile: Optional[Union[str, List[float]]] = None
     
     @validator('provider')
     def validate_provider(cls, v):
@@ -113,132 +594,369 @@ class HostingImpactRequest(BaseModel):
         if v.lower() not in allowed:
             raise ValueError(f'Provider must be one of {allowed}')
         return v.lower()
+    
+    @validator('traffic_profile')
+    def validate_traffic_profile(cls, v):
+        if v is not None:
+            resolve_profile(v)
+        return v
+
+
+class LowCarbonWindowsRequest(BaseModel):
+    region: str
+    duration_hours: int
+    earliest_start: Optional[datetime] = None
+    horizon_hours: int = 168
+    count: int = 3
+    energy_kwh: Optional[float] = None
+    
+    @validator('duration_hours')
+    def validate_duration_hours(cls, v):
+        if not 1 <= v <= 720:
+            raise ValueError('duration_hours must be between 1 and 720')
+        return v
+    
+    @validator('horizon_hours')
+    def validate_horizon_hours(cls, v, values):
+        if not 1 <= v <= 8760:
+            raise ValueError('horizon_hours must be between 1 and 8760')
+        if v < values.get('duration_hours', 1):
+            raise ValueError('horizon_hours must be at least duration_hours')
+        return v
+    
+    @validator('count')
+    def validate_count(cls, v):
+        if not 1 <= v <= 24:
+            raise ValueError('count must be between 1 and 24')
+        return v
+    
+    @validator('energy_kwh')
+    def validate_energy_kwh(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('energy_kwh must be non-negative')
+        return v
+
+
+class HostingMatrixRequest(BaseModel):
+    monthly_requests: List[int]
+    providers: Optional[List[str]] = None
+    regions: Optional[List[str]] = None
+    tiers: Optional[List[str]] = None
+    sort_by: str = "monthly_co2_grams"
+    
+    @validator('monthly_requests')
+    def validate_monthly_requests(cls, v):
+        if not v:
+            raise ValueError('At least one monthly_requests value is required')
+        if len(v) > HOSTING_MATRIX_MAX_VOLUMES:
+            raise ValueError(f'At most {HOSTING_MATRIX_MAX_VOLUMES} monthly_requests values are allowed')
+        if any(n < 0 for n in v):
+            raise ValueError('monthly_requests values must be non-negative')
+        return v
+    
+    @validator('providers')
+    def validate_providers(cls, v):
+        if v is None:
+            return v
+        v = list(dict.fromkeys(p.lower() for p in v))
+        if not v or not set(v) <= set(PROVIDERS):
+            raise ValueError(f'Providers must be from {list(PROVIDERS)}')
+        return v
+    
+    @validator('regions')
+    def validate_regions(cls, v):
+        if v is None:
+            return v
+        v = list(dict.fromkeys(v))
+        if not v or not set(v) <= set(REGIONS):
+            raise ValueError(f'Regions must be from {list(REGIONS)}')
+        return v
+    
+    @validator('tiers')
+    def validate_tiers(cls, v):
+        if v is None:
+            return v
+        v = list(dict.fromkeys(v))
+        if not v or not set(v) <= set(TIERS):
+            raise ValueError(f'Tiers must be from {list(TIERS)}')
+        return v
+    
+    @validator('sort_by')
+    def validate_sort_by(cls, v):
+        if v not in MATRIX_SORT_KEYS:
+            raise ValueError(f'sort_by must be one of {list(MATRIX_SORT_KEYS)}')
+        return v
 
 
 # ==================== Helper Functions ====================
 
 def sanitize_input(text: str) -> str:
     """Sanitize user input to prevent injection attacks"""
-    # Remove or escape dangerous characters
-    text = text.replace('<', '&lt;').replace('>', '&gt;')
-    return text[:10000]  # Limit length
+    # Escaping only lengthens the text, so the kept prefix comes from at
+    # most the first SANITIZED_MAX_LENGTH characters; escape only those
+    text = text[:SANITIZED_MAX_LENGTH].replace('<', '&lt;').replace('>', '&gt;')
+    return text[:SANITIZED_MAX_LENGTH]  # Limit length
+
 
+def escaped_length(text: str) -> int:
+    """Length of text after sanitize_input's escaping, before it is cut"""
+    return len(text) + 3 * (text.count('<') + text.count('>'))
 
-def calculate_code_metrics(code: str, language: str) -> Dict[str, Any]:
+
+def ingest_raw_code(body: bytes) -> Tuple[str, str]:
     """
-    Analyze code and calculate carbon footprint metrics
+    Validate, sanitize and hash a raw UTF-8 body, giving the same
+    (sanitized code, sha256) as CodeAnalysisRequest + sanitize_input.
+    ASCII bodies are checked with C-level scans of the bytes and only the
+    kept prefix is ever decoded; anything else goes through str.
     """
-    lines = code.split('\n')
+    if body.isascii():
+        # One byte per character
+        if len(body) > CODE_MAX_LENGTH:
+            raise HTTPException(status_code=413, detail="Code exceeds maximum size")
+        lowered = body.lower()
+        if any(pattern in lowered for pattern in DANGEROUS_BYTES):
+            raise HTTPException(status_code=422, detail="Code contains potentially dangerous patterns")
+        sanitized = body[:SANITIZED_MAX_LENGTH].replace(b'<', b'&lt;').replace(b'>', b'&gt;')[:SANITIZED_MAX_LENGTH]
+        return sanitized.decode('ascii'), hashlib.sha256(sanitized).hexdigest()
     
-    # Pattern matching based on language
-    patterns = {
-        'python': {
-            'loops': [r'\bfor\b', r'\bwhile\b'],
-            'nested_loops': r'(for|while).*:\s*\n.*\s+(for|while)',
-            'api_calls': [r'requests\.', r'urllib\.', r'httpx\.', r'fetch\('],
-            'file_io': [r'open\(', r'\.read\(', r'\.write\('],
-            'recursion': r'def\s+\w+',
-            'db_queries': [r'\.execute\(', r'\.query\(', r'SELECT', r'INSERT', r'UPDATE'],
-        },
-        'javascript': {
-            'loops': [r'\bfor\b', r'\bwhile\b', r'\.forEach\(', r'\.map\('],
-            'nested_loops': r'(for|while).*{[^}]+(for|while)',
-            'api_calls': [r'fetch\(', r'axios\.', r'\$\.ajax', r'\.get\(', r'\.post\('],
-            'file_io': [r'fs\.', r'readFile', r'writeFile'],
-            'recursion': r'function\s+\w+',
-            'db_queries': [r'\.query\(', r'\.find\(', r'\.findOne\(', r'\.save\('],
-        }
-    }
+    try:
+        code = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body is not valid UTF-8")
+    if len(code) > CODE_MAX_LENGTH:
+        raise HTTPException(status_code=413, detail="Code exceeds maximum size")
+    if has_dangerous_pattern(code):
+        raise HTTPException(status_code=422, detail="Code contains potentially dangerous patterns")
+    sanitized_code = sanitize_input(code)
+    return sanitized_code, hashlib.sha256(sanitized_code.encode()).hexdigest()
+
+
+def get_github_client() -> httpx.AsyncClient:
+    """Return the shared GitHub client, creating it if needed"""
+    global github_client
+    if github_client is None or github_client.is_closed:
+        github_client = create_github_client(
+            base_url=GITHUB_API_URL,
+            token=GITHUB_TOKEN,
+            http2=GITHUB_HTTP2,
+            max_connections=GITHUB_MAX_CONNECTIONS,
+            max_keepalive_connections=GITHUB_MAX_KEEPALIVE,
+            keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY,
+            timeout=GITHUB_TIMEOUT,
+            event_hooks=metrics.httpx_event_hooks("upstream_duration_seconds", "github")
+        )
+    return github_client
+
+
+async def close_github_client():
+    """Close the shared GitHub client and its pooled connections"""
+    global github_client
+    if github_client is not None:
+        await github_client.aclose()
+        github_client = None
+
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """Return the shared analysis process pool, starting it if needed"""
+    global analysis_pool
+    if analysis_pool is None:
+        analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return analysis_pool
+
+
+def get_gemini_executor() -> ThreadPoolExecutor:
+    """Return the Gemini thread pool, starting it if needed"""
+    global gemini_executor
+    if gemini_executor is None:
+        gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+    return gemini_executor
+
+
+def close_gemini_executor():
+    """Stop the Gemini threads without waiting for calls still in flight"""
+    global gemini_executor, gemini_semaphore
+    if gemini_executor is not None:
+        gemini_executor.shutdown(wait=False, cancel_futures=True)
+        gemini_executor = None
+    gemini_semaphore = None
+
+
+async def submit_gemini(generate: Callable[[], Any]) -> "asyncio.Future":
+    """
+    Start generate() on a Gemini thread once fewer than
+    GEMINI_MAX_CONCURRENCY calls are running. The slot is held until the
+    thread returns, not until the caller stops waiting, so calls abandoned
+    on timeout or disconnect keep counting while their thread is busy.
+    """
+    global gemini_semaphore
+    if gemini_semaphore is None:
+        gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    semaphore = gemini_semaphore
+    loop = asyncio.get_running_loop()
     
-    lang_patterns = patterns.get(language, patterns['python'])
-    
-    # Count metrics
-    loop_count = 0
-    nested_loop_count = 0
-    api_call_count = 0
-    file_io_count = 0
-    recursion_count = 0
-    db_query_count = 0
-    
-    code_lower = code.lower()
-    
-    # Count loops
-    for pattern in lang_patterns['loops']:
-        loop_count += len(re.findall(pattern, code, re.IGNORECASE))
-    
-    # Count nested loops
-    nested_loop_count = len(re.findall(lang_patterns['nested_loops'], code, re.MULTILINE | re.IGNORECASE))
-    
-    # Count API calls
-    for pattern in lang_patterns['api_calls']:
-        api_call_count += len(re.findall(pattern, code, re.IGNORECASE))
-    
-    # Count file I/O
-    for pattern in lang_patterns['file_io']:
-        file_io_count += len(re.findall(pattern, code, re.IGNORECASE))
-    
-    # Count recursion
-    recursion_count = len(re.findall(lang_patterns['recursion'], code, re.MULTILINE | re.IGNORECASE))
-    
-    # Count database queries
-    for pattern in lang_patterns['db_queries']:
-        db_query_count += len(re.findall(pattern, code, re.IGNORECASE))
-    
-    # Calculate scores (0-100 scale, lower is better)
-    cpu_score = min(100, (loop_count * 2) + (nested_loop_count * 5) + (recursion_count * 3))
-    network_score = min(100, (api_call_count * 10) + (db_query_count * 5))
-    memory_score = min(100, (len(lines) * 0.1) + (file_io_count * 8))
-    
-    # Calculate CO2 estimate (in grams)
-    # Formula: (CPU × 0.000002) + (Network × 0.0004) + (Memory × 0.0001)
-    co2_estimate = (cpu_score * 0.000002) + (network_score * 0.0004) + (memory_score * 0.0001)
-    co2_estimate = round(co2_estimate * 1000, 4)  # Convert to grams
-    
-    # Calculate Green Score (0-100, higher is better)
-    total_impact = cpu_score + network_score + memory_score
-    green_score = max(0, 100 - (total_impact / 3))
-    green_score = round(green_score, 2)
-    
-    # Determine rating
-    if green_score >= 80:
-        rating = "Excellent"
-        color = "green"
-    elif green_score >= 60:
-        rating = "Good"
-        color = "lightgreen"
-    elif green_score >= 40:
-        rating = "Fair"
-        color = "orange"
-    else:
-        rating = "Needs Improvement"
-        color = "red"
+    def release(_):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            pass  # the event loop has closed
     
-    return {
-        "metrics": {
-            "lines_of_code": len(lines),
-            "loops": loop_count,
-            "nested_loops": nested_loop_count,
-            "api_calls": api_call_count,
-            "file_io_operations": file_io_count,
-            "recursion_count": recursion_count,
-            "db_queries": db_query_count
-        },
-        "scores": {
-            "cpu_score": round(cpu_score, 2),
-            "network_score": round(network_score, 2),
-            "memory_score": round(memory_score, 2)
-        },
-        "co2_estimate_grams": co2_estimate,
-        "green_score": green_score,
-        "rating": rating,
-        "color": color,
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    await semaphore.acquire()
+    try:
+        future = get_gemini_executor().submit(generate)
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(release)
+    return asyncio.wrap_future(future)
+
+
+async def call_gemini(prompt: str) -> str:
+    """
+    Run model.generate_content off the event loop (importing the SDK there
+    on first use), through submit_gemini. Waiting for a free slot and the
+    call itself are abandoned after GEMINI_TIMEOUT seconds or when the
+    awaiting request is cancelled.
+    """
+    def generate() -> str:
+        gemini = get_gemini_model()
+        with metrics.track("upstream_duration_seconds", "gemini"):
+            return gemini.generate_content(prompt).text
+    
+    async def run() -> str:
+        return await (await submit_gemini(generate))
+    
+    return await asyncio.wait_for(run(), timeout=GEMINI_TIMEOUT)
+
+
+async def stream_gemini(prompt: str):
+    """
+    Like call_gemini with stream=True: yields the text of each chunk as the
+    model produces it. The SDK iterator blocks, so it is drained on a Gemini
+    thread that hands chunks to the event loop; GEMINI_TIMEOUT covers the
+    whole answer, including the wait for a free slot. Closing the
+    generator stops the thread at its next chunk.
+    """
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    
+    def generate():
+        gemini = get_gemini_model()
+        with metrics.track("upstream_duration_seconds", "gemini"):
+            for chunk in gemini.generate_content(prompt, stream=True):
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(chunks.put_nowait, chunk.text)
+    
+    deadline = loop.time() + GEMINI_TIMEOUT
+    future = await asyncio.wait_for(submit_gemini(generate), timeout=GEMINI_TIMEOUT)
+    # Scheduled after every chunk the thread handed over
+    future.add_done_callback(lambda _: chunks.put_nowait(None))
+    try:
+        while True:
+            text = await asyncio.wait_for(chunks.get(), timeout=max(0, deadline - loop.time()))
+            if text is None:
+                break
+            yield text
+        future.result()
+    finally:
+        stopped.set()
+
+
+async def run_until_disconnected(request: Request, coro, poll_interval: float = 0.5):
+    """Await coro, cancelling it if the client disconnects first"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+
+async def analyze_in_pool(items: List[Tuple[str, str]]) -> List[Any]:
+    """
+    Run calculate_code_metrics over (code, language) pairs in the process
+    pool without blocking the event loop. Work is sent in chunks to keep
+    IPC overhead low; a failed chunk yields its exception for each item.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_analysis_pool()
+    chunk_size = max(1, math.ceil(len(items) / (ANALYSIS_WORKERS * 4)))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    
+    chunk_results = await asyncio.gather(
+        *(loop.run_in_executor(pool, calculate_code_metrics_batch, chunk) for chunk in chunks),
+        return_exceptions=True
+    )
+    
+    results = []
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, Exception):
+            results.extend([chunk_result] * len(chunk))
+        else:
+            results.extend(chunk_result)
+    return results
+
+
+def parse_ndjson_code(line: bytes) -> str:
+    """Extract the code chunk from one NDJSON record ({"code": "..."} or a JSON string)"""
+    if not line.strip():
+        return ""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid NDJSON line")
+    if isinstance(record, dict):
+        record = record.get("code", "")
+    if not isinstance(record, str):
+        raise HTTPException(status_code=400, detail='NDJSON lines must be {"code": "..."} objects or strings')
+    return record
 
 
-async def analyze_github_repo(repo_url: str) -> Dict[str, Any]:
+async def analyze_repo_tarball(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    progress: Optional[Callable[[int], Any]] = None
+) -> Dict[str, Any]:
     """
-    Fetch and analyze a GitHub repository
+    Stream the repository tarball once and analyze each source file in the
+    process pool while it downloads, without unpacking it to disk
+    """
+    async with client.stream('GET', f'/repos/{owner}/{repo}/tarball', follow_redirects=True) as response:
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail="Could not download repository archive")
+        
+        try:
+            return await analyze_tarball_stream(
+                response.aiter_bytes(),
+                executor=get_analysis_pool(),
+                max_files=GITHUB_DEEP_MAX_FILES,
+                max_bytes=GITHUB_DEEP_MAX_BYTES,
+                max_file_bytes=GITHUB_DEEP_MAX_FILE_BYTES,
+                max_download_bytes=GITHUB_DEEP_MAX_DOWNLOAD_BYTES,
+                progress=progress,
+                timeout=GITHUB_DEEP_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Repository analysis timed out")
+
+
+async def analyze_github_repo(
+    repo_url: str,
+    deep: bool = False,
+    progress: Optional[Callable[..., Any]] = None
+) -> Dict[str, Any]:
+    """
+    Fetch and analyze a GitHub repository; deep mode also analyzes its source files.
+    progress(stage, **details) is told when each stage starts.
     """
     # Extract owner and repo name
     match = re.match(r'https://github\.com/([\w\-]+)/([\w\-\.]+)/?', repo_url)
@@ -248,128 +966,244 @@ async def analyze_github_repo(repo_url: str) -> Dict[str, Any]:
     owner, repo = match.groups()
     repo = repo.rstrip('.git')
     
-    headers = {}
-    if GITHUB_TOKEN:
-        headers['Authorization'] = f'token {GITHUB_TOKEN}'
+    client = get_github_client()
+    if progress is not None:
+        progress("fetching_metadata")
     
-    async with httpx.AsyncClient() as client:
-        # Get repository info
-        repo_response = await client.get(
-            f'https://api.github.com/repos/{owner}/{repo}',
-            headers=headers,
-            timeout=30.0
-        )
-        
-        if repo_response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Repository not found")
-        
-        repo_data = repo_response.json()
-        
-        # Get languages
-        languages_response = await client.get(
-            f'https://api.github.com/repos/{owner}/{repo}/languages',
-            headers=headers,
-            timeout=30.0
-        )
-        languages = languages_response.json() if languages_response.status_code == 200 else {}
-        
-        # Calculate estimates
-        total_bytes = sum(languages.values())
-        size_kb = repo_data.get('size', 0)
-        
-        # Estimate compute impact based on repo size and activity
-        stars = repo_data.get('stargazers_count', 0)
-        forks = repo_data.get('forks_count', 0)
-        
-        # Simple heuristic for backend compute
-        compute_score = min(100, (size_kb / 100) + (stars * 0.1) + (forks * 0.5))
-        
-        # Estimate CI/CD runs (rough estimate)
-        estimated_cicd_runs = max(10, forks * 2 + stars * 0.1)
-        
-        # CO2 estimate: Size + compute + CI/CD
-        co2_from_storage = size_kb * 0.0001  # grams
-        co2_from_compute = compute_score * 0.5  # grams
-        co2_from_cicd = estimated_cicd_runs * 0.02  # grams per run
-        
-        total_co2 = co2_from_storage + co2_from_compute + co2_from_cicd
-        
-        return {
-            "repo_info": {
-                "name": repo_data.get('name'),
-                "owner": owner,
-                "description": repo_data.get('description'),
-                "stars": stars,
-                "forks": forks,
-                "size_kb": size_kb,
-                "language": repo_data.get('language'),
-                "created_at": repo_data.get('created_at'),
-                "updated_at": repo_data.get('updated_at')
-            },
-            "languages": languages,
-            "impact_estimate": {
-                "compute_score": round(compute_score, 2),
-                "estimated_cicd_runs_monthly": round(estimated_cicd_runs, 0),
-                "co2_storage_grams": round(co2_from_storage, 4),
-                "co2_compute_grams": round(co2_from_compute, 4),
-                "co2_cicd_grams": round(co2_from_cicd, 4),
-                "total_co2_monthly_grams": round(total_co2, 4)
-            },
-            "timestamp": datetime.utcnow().isoformat()
-        }
+    # Repository info and languages are independent, so fetch them together
+    (repo_status, repo_data), (languages_status, languages) = await asyncio.gather(
+        github_cache.get(client, f'/repos/{owner}/{repo}'),
+        github_cache.get(client, f'/repos/{owner}/{repo}/languages')
+    )
+    
+    if repo_status != 200:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    
+    if languages_status != 200:
+        languages = {}
+    
+    result = estimate_repo_impact(owner, repo_data, languages)
+    
+    if deep:
+        on_chunk = None
+        if progress is not None:
+            progress("analyzing_files", bytes_downloaded=0)
+            on_chunk = lambda received: progress("analyzing_files", bytes_downloaded=received)  # noqa: E731
+        result["deep_analysis"] = await analyze_repo_tarball(client, owner, repo, on_chunk)
+    
+    return result
 
 
-def calculate_hosting_impact(provider: str, region: str, tier: str, monthly_requests: int) -> Dict[str, Any]:
+def estimate_repo_impact(owner: str, repo_data: Dict[str, Any], languages: Dict[str, int]) -> Dict[str, Any]:
+    """Footprint estimate from a repository's metadata and language breakdown"""
+    # Calculate estimates
+    total_bytes = sum(languages.values())
+    size_kb = repo_data.get('size', 0)
+    
+    # Estimate compute impact based on repo size and activity
+    stars = repo_data.get('stargazers_count', 0)
+    forks = repo_data.get('forks_count', 0)
+    
+    # Simple heuristic for backend compute
+    compute_score = min(100, (size_kb / 100) + (stars * 0.1) + (forks * 0.5))
+    
+    # Estimate CI/CD runs (rough estimate)
+    estimated_cicd_runs = max(10, forks * 2 + stars * 0.1)
+    
+    # CO2 estimate: Size + compute + CI/CD
+    co2_from_storage = size_kb * 0.0001  # grams
+    co2_from_compute = compute_score * 0.5  # grams
+    co2_from_cicd = estimated_cicd_runs * 0.02  # grams per run
+    
+    total_co2 = co2_from_storage + co2_from_compute + co2_from_cicd
+    
+    return {
+        "repo_info": {
+            "name": repo_data.get('name'),
+            "owner": owner,
+            "description": repo_data.get('description'),
+            "stars": stars,
+            "forks": forks,
+            "size_kb": size_kb,
+            "language": repo_data.get('language'),
+            "created_at": repo_data.get('created_at'),
+            "updated_at": repo_data.get('updated_at')
+        },
+        "languages": languages,
+        "impact_estimate": {
+            "compute_score": round(compute_score, 2),
+            "estimated_cicd_runs_monthly": round(estimated_cicd_runs, 0),
+            "co2_storage_grams": round(co2_from_storage, 4),
+            "co2_compute_grams": round(co2_from_compute, 4),
+            "co2_cicd_grams": round(co2_from_cicd, 4),
+            "total_co2_monthly_grams": round(total_co2, 4)
+        },
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+async def analyze_listed_repo(
+    owner: str,
+    repo_data: Dict[str, Any],
+    deep: bool = False,
+    deep_slots: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
     """
-    Calculate hosting carbon footprint based on provider and usage
+    analyze_github_repo for a repository from an owner's listing, which
+    already carries its metadata, so only the languages are fetched.
+    The deep scan, if any, waits for one of deep_slots.
     """
-    # Carbon intensity by region (grams CO2 per kWh)
-    carbon_intensity = {
-        'us-east': 415,
-        'us-west': 320,
-        'eu-west': 280,
-        'eu-north': 45,
-        'asia-east': 550,
-        'asia-south': 630,
-        'australia': 720,
-        'south-america': 180,
-    }
+    client = get_github_client()
+    repo = repo_data['name']
+    languages_status, languages = await github_cache.get(client, f'/repos/{owner}/{repo}/languages')
+    if languages_status != 200:
+        languages = {}
     
-    # Energy per request (kWh) - varies by tier
-    energy_per_request = {
-        'serverless': 0.0000001,
-        'basic': 0.0000005,
-        'standard': 0.000001,
-        'premium': 0.000002,
-    }
+    result = estimate_repo_impact(owner, repo_data, languages)
+    if deep:
+        async with deep_slots or asyncio.Semaphore(1):
+            result["deep_analysis"] = await analyze_repo_tarball(client, owner, repo)
+    return result
+
+
+async def list_owner_repos(owner: str, page: int) -> Tuple[int, Any, str]:
+    """
+    (status, repositories, listing path) for one page of an owner's
+    repositories, trying the organization listing before the user one
+    """
+    client = get_github_client()
+    query = f'?per_page={GITHUB_LIST_PAGE_SIZE}&page={page}'
+    for path in (f'/orgs/{owner}/repos', f'/users/{owner}/repos'):
+        status, repos = await github_cache.get(client, path + query)
+        if status != 404:
+            return status, repos, path
+    return status, repos, path
+
+
+async def scan_owner_repos(
+    owner: str,
+    listing_path: str,
+    first_page: List[Dict[str, Any]],
+    deep: bool,
+    max_repos: int
+):
+    """
+    Analyze every repository of an owner, paging through the listing while
+    at most ORG_SCAN_CONCURRENCY analyses run, of which at most
+    ORG_SCAN_DEEP_CONCURRENCY are deep scans (each one decompresses on its
+    own thread and fans out to the shared process pool). Yields (repo_data,
+    analysis or exception) as each one finishes, then (None, listing error
+    or None). Closing the generator cancels the analyses still running.
+    """
+    client = get_github_client()
+    results: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(ORG_SCAN_CONCURRENCY)
+    deep_slots = asyncio.Semaphore(ORG_SCAN_DEEP_CONCURRENCY)
+    running = set()
+    started = 0
     
-    # Provider efficiency multiplier
-    provider_efficiency = {
-        'aws': 1.0,
-        'gcp': 0.85,  # More renewable energy
-        'azure': 0.90,
-        'vercel': 0.88,
-        'netlify': 0.90,
-        'digitalocean': 1.05
-    }
+    async def analyze(repo_data):
+        try:
+            results.put_nowait((repo_data, await analyze_listed_repo(owner, repo_data, deep, deep_slots)))
+        except Exception as e:
+            results.put_nowait((repo_data, e))
+        finally:
+            slots.release()
     
-    intensity = carbon_intensity.get(region, 400)
-    energy = energy_per_request.get(tier, 0.000001)
-    efficiency = provider_efficiency.get(provider, 1.0)
+    async def start_all():
+        nonlocal started
+        repos, page = first_page, 1
+        while True:
+            for repo_data in repos:
+                if started >= max_repos:
+                    return
+                await slots.acquire()
+                task = asyncio.ensure_future(analyze(repo_data))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                started += 1
+            if len(repos) < GITHUB_LIST_PAGE_SIZE:
+                return
+            page += 1
+            status, repos = await github_cache.get(
+                client, f'{listing_path}?per_page={GITHUB_LIST_PAGE_SIZE}&page={page}'
+            )
+            if status != 200 or not isinstance(repos, list):
+                raise RuntimeError(f"Listing page {page} failed with status {status}")
+    
+    async def dispatch():
+        error = None
+        try:
+            await start_all()
+        except Exception as e:
+            error = e
+        # Marks the end of the listing: (None, (analyses started, listing error))
+        results.put_nowait((None, (started, error)))
+    
+    dispatcher = asyncio.ensure_future(dispatch())
+    total, error, finished = None, None, 0
+    try:
+        while total is None or finished < total:
+            repo_data, outcome = await results.get()
+            if repo_data is None:
+                total, error = outcome
+                continue
+            finished += 1
+            yield repo_data, outcome
+        yield None, error
+    finally:
+        dispatcher.cancel()
+        for task in list(running):
+            task.cancel()
+
+
+MODELLED_CURVES_NOTE = (
+    "Illustrative modelled curves, not measured grid data; set CARBON_INTENSITY_PATH to a curves file"
+)
+
+
+def calculate_hosting_impact(
+    provider: str,
+    region: str,
+    tier: str,
+    monthly_requests: int,
+    traffic_profile: Optional[Union[str, List[float]]] = None
+) -> Dict[str, Any]:
+    """
+    Calculate hosting carbon footprint based on provider and usage. With a
+    traffic profile and an hourly curve for the region, emissions are
+    integrated hour by hour instead of using the annual average intensity.
+    """
+    intensity = CARBON_INTENSITY.get(region, DEFAULT_CARBON_INTENSITY)
+    energy = ENERGY_PER_REQUEST.get(tier, DEFAULT_ENERGY_PER_REQUEST)
+    efficiency = PROVIDER_EFFICIENCY.get(provider, DEFAULT_PROVIDER_EFFICIENCY)
     
     # Calculate monthly CO2
     monthly_energy_kwh = monthly_requests * energy
     monthly_co2_grams = monthly_energy_kwh * intensity * efficiency
+    source = "annual_average"
+    hourly = {}
     
-    # Calculate costs (rough estimates)
-    cost_per_request = {
-        'serverless': 0.0000002,
-        'basic': 0.000001,
-        'standard': 0.000003,
-        'premium': 0.000008,
-    }
+    curves = get_carbon_curves() if traffic_profile is not None else None
+    if curves is not None and region in curves:
+        weights = profile_weights(resolve_profile(traffic_profile), curves.year)
+        intensity_by_month = curves.integrate(weights, [region])[0]
+        # Traffic-weighted average over the year
+        intensity = round(float(intensity_by_month.sum()), 2)
+        by_month = intensity_by_month * (monthly_energy_kwh * 12 * efficiency)
+        monthly_co2_grams = float(by_month.sum()) / 12
+        source = curves.source
+        hourly = {
+            "traffic_profile": traffic_profile if isinstance(traffic_profile, str) else "custom",
+            "co2_grams_by_month": [round(float(grams), 2) for grams in by_month]
+        }
+        if source == "modelled":
+            hourly["carbon_intensity_note"] = MODELLED_CURVES_NOTE
+    elif traffic_profile is not None:
+        hourly = {"carbon_intensity_note": "No hourly carbon intensity curve for this region; the annual average was used"}
     
-    monthly_cost = monthly_requests * cost_per_request.get(tier, 0.000001)
+    # Calculate costs (rough estimates)
+    monthly_cost = monthly_requests * COST_PER_REQUEST.get(tier, DEFAULT_COST_PER_REQUEST)
     
     return {
         "provider": provider,
@@ -382,25 +1216,52 @@ def calculate_hosting_impact(provider: str, region: str, tier: str, monthly_requ
         "yearly_co2_kg": round((monthly_co2_grams * 12) / 1000, 2),
         "estimated_monthly_cost_usd": round(monthly_cost, 2),
         "carbon_intensity_region": intensity,
+        "carbon_intensity_source": source,
+        **hourly,
         "provider_efficiency_score": efficiency,
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
-async def generate_ai_optimization(code: str, language: str, analysis: Dict) -> Dict[str, Any]:
+def parse_ai_response(result_text: str) -> Tuple[Any, bool]:
     """
-    Use AI to generate optimization suggestions
+    The JSON answer in Gemini's output and True, or a free-text fallback
+    and False
     """
-    if not GEMINI_API_KEY:
+    # Try to parse JSON from response
+    try:
+        # Extract JSON from markdown code blocks if present
+        json_match = re.search(r'```json\s*(.*?)\s*```', result_text, re.DOTALL)
+        if json_match:
+            result_text = json_match.group(1)
+        
+        result = json.loads(result_text)
+    except:
+        # Fallback if not JSON
         return {
-            "suggestions": [
-                "AI optimization is not configured. Please add GEMINI_API_KEY to enable AI-powered suggestions."
-            ],
-            "optimized_code": None
-        }
+            "inefficiencies": ["See full analysis below"],
+            "suggestions": [result_text[:500]],
+            "optimized_code": None,
+            "explanations": ["See suggestions for details"]
+        }, False
     
-    try:
-        prompt = f"""
+    return result, True
+
+
+async def request_ai_analysis(prompt: str, prompt_hash: str) -> Dict[str, Any]:
+    """
+    Call Gemini and parse its JSON answer. Only parsed answers are cached;
+    free-text fallbacks and errors are retried on the next request.
+    """
+    result, parsed = parse_ai_response(await call_gemini(prompt))
+    if parsed:
+        ai_cache.set(prompt_hash, result)
+    return result
+
+
+def build_optimization_prompt(code: str, language: str, analysis: Dict) -> str:
+    """The Gemini prompt asking for optimizations of code, given its analysis"""
+    return f"""
 You are an expert code optimizer focused on reducing carbon footprint and improving efficiency.
 
 Analyze this {language} code and provide:
@@ -429,69 +1290,219 @@ Provide response in JSON format:
   "explanations": ["explanation1", "explanation2", ...]
 }}
 """
-        
-        response = model.generate_content(prompt)
-        result_text = response.text
-        
-        # Try to parse JSON from response
-        try:
-            # Extract JSON from markdown code blocks if present
-            json_match = re.search(r'```json\s*(.*?)\s*```', result_text, re.DOTALL)
-            if json_match:
-                result_text = json_match.group(1)
-            
-            result = json.loads(result_text)
-        except:
-            # Fallback if not JSON
-            result = {
-                "inefficiencies": ["See full analysis below"],
-                "suggestions": [result_text[:500]],
-                "optimized_code": None,
-                "explanations": ["See suggestions for details"]
-            }
+
+
+def ai_optimization_error(message: str) -> Dict[str, Any]:
+    return {
+        "error": message,
+        "suggestions": ["Unable to generate AI suggestions at this time"],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+async def generate_ai_optimization(code: str, language: str, analysis: Dict) -> Dict[str, Any]:
+    """
+    Use AI to generate optimization suggestions
+    """
+    if not GEMINI_API_KEY:
+        return {
+            "suggestions": [
+                "AI optimization is not configured. Please add GEMINI_API_KEY to enable AI-powered suggestions."
+            ],
+            "optimized_code": None
+        }
+    
+    try:
+        prompt = build_optimization_prompt(code, language, analysis)
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        result = ai_cache.get(prompt_hash)
+        if result is None:
+            result = await ai_single_flight.do(prompt_hash, lambda: request_ai_analysis(prompt, prompt_hash))
         
         return {
             "ai_analysis": result,
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except asyncio.TimeoutError:
+        return ai_optimization_error(f"AI optimization timed out after {GEMINI_TIMEOUT:g} seconds")
     except Exception as e:
-        return {
-            "error": f"AI optimization failed: {str(e)}",
-            "suggestions": ["Unable to generate AI suggestions at this time"],
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        return ai_optimization_error(f"AI optimization failed: {str(e)}")
 
 
 def save_to_supabase(table: str, data: Dict[str, Any]):
-    """Save analysis results to Supabase"""
-    if not supabase:
+    """Queue analysis results for a batched write to Supabase"""
+    if not supabase_configured():
         return {"error": "Supabase not configured"}
     
-    try:
-        result = supabase.table(table).insert(data).execute()
-        return {"success": True, "id": result.data[0]['id'] if result.data else None}
-    except Exception as e:
-        return {"error": str(e)}
+    if not write_queue.put(table, data):
+        return {"error": "Write queue is full"}
+    return {"success": True, "queued": True}
+
+
+# Only the fields the history summary shows, pulled out of the JSONB blobs
+HISTORY_COLUMNS = {
+    "code_analyses": (
+        "id, language, code_hash, created_at, "
+        "green_score:analysis_results->green_score, "
+        "co2_estimate_grams:analysis_results->co2_estimate_grams, "
+        "rating:analysis_results->>rating"
+    ),
+    "github_analyses": (
+        "id, repo_url, created_at, "
+        "repo_info:analysis_results->repo_info, "
+        "total_co2_monthly_grams:analysis_results->impact_estimate->total_co2_monthly_grams"
+    )
+}
+
+# History is ordered newest first by (created_at, table, id); a cursor is
+# "<created_at>~<table>~<id>" of the last row shown. A bare created_at (the
+# old cursor format) is still accepted and pages strictly before it.
+HISTORY_CURSOR_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}(?:[T ][\d:.]+)?(?:Z|[+-]\d{2}(?::?\d{2})?)?)(?:~(code|github)~([0-9A-Fa-f-]+))?$'
+)
+# Tie-break order of the tables for rows with the same created_at, lowest first
+HISTORY_TABLES = ("github_analyses", "code_analyses")
+HISTORY_CURSOR_NAMES = {"code_analyses": "code", "github_analyses": "github"}
+
+
+def history_sort_key(table: str, row: Dict[str, Any]) -> Tuple[str, int, Any]:
+    return row["created_at"], HISTORY_TABLES.index(table), row["id"]
+
+
+def fetch_history_rows(
+    table: str,
+    user_id: str,
+    before: Optional[Tuple[str, Optional[str], Optional[str]]],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """
+    Newest summary rows for a user, after the (created_at, table, id)
+    cursor `before` in history order if given
+    """
+    query = get_supabase().table(table).select(HISTORY_COLUMNS[table]).eq("user_id", user_id)
+    if before:
+        created_at, cursor_table, cursor_id = before
+        if cursor_table is None or HISTORY_TABLES.index(table) > HISTORY_TABLES.index(cursor_table):
+            query = query.lt("created_at", created_at)
+        elif HISTORY_TABLES.index(table) < HISTORY_TABLES.index(cursor_table):
+            query = query.lte("created_at", created_at)
+        else:
+            # Rows sharing the cursor's timestamp (a batch is saved with one) continue by id
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{cursor_id}")')
+    with metrics.track("upstream_duration_seconds", "supabase"):
+        return query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute().data
+
+
+def save_github_analysis(user_id: Optional[str], repo_url: str, analysis: Dict[str, Any]):
+    """Queue a repository analysis for the user's history"""
+    if user_id and supabase_configured():
+        save_data = {
+            "user_id": user_id,
+            "repo_url": repo_url,
+            "analysis_results": analysis,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        save_to_supabase("github_analyses", save_data)
+
+
+def job_accepted(job, deduplicated: bool) -> FastJSONResponse:
+    """202 response for a submitted (or joined) background job"""
+    return FastJSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": deduplicated,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    })
+
+
+def history_item(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the nested analysis_results shape the dashboard reads"""
+    if table == "code_analyses":
+        summary = {
+            "green_score": row.pop("green_score", None),
+            "co2_estimate_grams": row.pop("co2_estimate_grams", None),
+            "rating": row.pop("rating", None)
+        }
+    else:
+        summary = {
+            "repo_info": row.pop("repo_info", None),
+            "impact_estimate": {"total_co2_monthly_grams": row.pop("total_co2_monthly_grams", None)}
+        }
+    return {**row, "analysis_results": summary}
+
+
+def analyze_sanitized_code(
+    route: str,
+    sanitized_code: str,
+    code_hash: str,
+    language: str,
+    user_id: Optional[str]
+) -> Dict[str, Any]:
+    """Cached analysis of validated, sanitized code, queued for history if user_id is set"""
+    # Calculate metrics, reusing results for identical code
+    cache_key = f"{code_hash}-{language}"
+    with metrics.time("stage_duration_seconds", route, "cache_lookup"):
+        analysis = analysis_cache.get(cache_key)
+    if analysis is None:
+        with metrics.time("stage_duration_seconds", route, "code_metrics"):
+            analysis = calculate_code_metrics(sanitized_code, language)
+        analysis_cache.set(cache_key, analysis)
+    analysis = {**analysis, "timestamp": datetime.utcnow().isoformat()}
+    
+    # Save to database if user_id provided
+    if user_id and supabase_configured():
+        save_data = {
+            "user_id": user_id,
+            "language": language,
+            "code_hash": code_hash[:16],
+            "analysis_results": analysis,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        with metrics.time("stage_duration_seconds", route, "save"):
+            save_to_supabase("code_analyses", save_data)
+    
+    return {
+        "success": True,
+        "analysis": analysis,
+        "language": language
+    }
 
 
 # ==================== API Routes ====================
 
+# The service description never changes, so it is serialized once
+ROOT_BODY = dumps({
+    "service": "EcoCode Carbon Footprint Analyzer API",
+    "version": "1.0.0",
+    "status": "operational",
+    "endpoints": [
+        "/analyze-code",
+        "/analyze-code/batch",
+        "/analyze-code/incremental",
+        "/analyze-code/raw",
+        "/analyze-code/stream",
+        "/analyze-github",
+        "/analyze-github/org",
+        "/ai-optimize",
+        "/ai-optimize/stream",
+        "/hosting-impact",
+        "/hosting-impact/matrix",
+        "/hosting-impact/low-carbon-windows",
+        "/history/{user_id}",
+        "/jobs/analyze-github",
+        "/jobs/ai-optimize",
+        "/jobs/{job_id}"
+    ]
+})
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "service": "EcoCode Carbon Footprint Analyzer API",
-        "version": "1.0.0",
-        "status": "operational",
-        "endpoints": [
-            "/analyze-code",
-            "/analyze-github",
-            "/ai-optimize",
-            "/hosting-impact",
-            "/history/{user_id}"
-        ]
-    }
+    return Response(ROOT_BODY, media_type="application/json")
 
 
 @app.post("/analyze-code")
@@ -500,32 +1511,304 @@ async def analyze_code(request: Request, payload: CodeAnalysisRequest):
     """
     Analyze code and calculate carbon footprint
     """
+    # Body read, JSON decoding and CodeAnalysisRequest validation happen before the handler runs
+    metrics.since("stage_duration_seconds", request.scope.get("metrics_start"), "/analyze-code", "validate")
     try:
         # Sanitize input
-        sanitized_code = sanitize_input(payload.code)
+        with metrics.time("stage_duration_seconds", "/analyze-code", "sanitize"):
+            sanitized_code = sanitize_input(payload.code)
         
-        # Calculate metrics
-        analysis = calculate_code_metrics(sanitized_code, payload.language)
+        with metrics.time("stage_duration_seconds", "/analyze-code", "hash"):
+            code_hash = hashlib.sha256(sanitized_code.encode()).hexdigest()
         
-        # Save to database if user_id provided
-        if payload.user_id and supabase:
-            save_data = {
-                "user_id": payload.user_id,
-                "language": payload.language,
-                "code_hash": hashlib.sha256(sanitized_code.encode()).hexdigest()[:16],
-                "analysis_results": analysis,
-                "created_at": datetime.utcnow().isoformat()
+        return FastJSONResponse(
+            analyze_sanitized_code("/analyze-code", sanitized_code, code_hash, payload.language, payload.user_id)
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/analyze-code/raw")
+@limiter.limit("20/minute")
+async def analyze_code_raw(request: Request, language: str, user_id: Optional[str] = None):
+    """
+    Analyze code sent as the raw body (text/plain or application/octet-stream,
+    UTF-8) instead of JSON; same limits and results as /analyze-code
+    """
+    language = language.lower()
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(status_code=422, detail=f'Language must be one of {SUPPORTED_LANGUAGES}')
+    
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(("text/plain", "application/octet-stream")):
+        raise HTTPException(status_code=415, detail="Body must be text/plain or application/octet-stream")
+    
+    # A UTF-8 character is at most 4 bytes, so anything longer is over the limit
+    max_bytes = CODE_MAX_LENGTH * 4
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail="Code exceeds maximum size")
+    
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail="Code exceeds maximum size")
+        chunks.append(chunk)
+    body = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    metrics.since("stage_duration_seconds", request.scope.get("metrics_start"), "/analyze-code/raw", "read")
+    
+    with metrics.time("stage_duration_seconds", "/analyze-code/raw", "validate_sanitize_hash"):
+        sanitized_code, code_hash = ingest_raw_code(body)
+    
+    try:
+        return FastJSONResponse(
+            analyze_sanitized_code("/analyze-code/raw", sanitized_code, code_hash, language, user_id)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/analyze-code/incremental")
+@limiter.limit("60/minute")
+async def analyze_code_incremental(request: Request, payload: IncrementalAnalysisRequest):
+    """
+    Analyze code sent whole, or as a unified diff against an earlier
+    submission identified by its code_hash. For a diff only the regions
+    around the edit are rescanned; the result is the same as for the
+    whole code.
+    """
+    route = "/analyze-code/incremental"
+    language = payload.language
+    document = None
+    if payload.code is not None:
+        code = payload.code
+    elif payload.code_hash and payload.diff is not None:
+        document = document_cache.get(f"{payload.code_hash}-{language}")
+        if document is None:
+            raise HTTPException(status_code=409, detail="Unknown code_hash; send the whole code")
+        try:
+            with metrics.time("stage_duration_seconds", route, "apply_diff"):
+                code = apply_unified_diff(document["code"], payload.diff)
+        except DiffError as e:
+            raise HTTPException(status_code=422, detail=f"Diff does not apply: {e}")
+        try:
+            check_code(code)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    else:
+        raise HTTPException(status_code=422, detail="Send either code, or code_hash and diff")
+    
+    with metrics.time("stage_duration_seconds", route, "sanitize"):
+        sanitized_code = sanitize_input(code)
+    
+    with metrics.time("stage_duration_seconds", route, "code_metrics"):
+        if document is None:
+            regions = analyze_regions(sanitized_code, language)
+            rescanned = len(regions)
+        else:
+            # Sanitized code is cut to a maximum length, so the text after
+            # the edit moves by the change in escaped length
+            shift = escaped_length(code) - escaped_length(document["code"])
+            regions, rescanned = reanalyze_regions(
+                sanitize_input(document["code"]), document["regions"], sanitized_code, language, shift
+            )
+        analysis = score_metrics(regions_counts(regions))
+    
+    with metrics.time("stage_duration_seconds", route, "hash"):
+        code_hash = hashlib.sha256(code.encode()).hexdigest()
+    document_cache.set(f"{code_hash}-{language}", {"code": code, "regions": regions})
+    
+    if payload.user_id and supabase_configured():
+        save_to_supabase("code_analyses", {
+            "user_id": payload.user_id,
+            "language": language,
+            "code_hash": hashlib.sha256(sanitized_code.encode()).hexdigest()[:16],
+            "analysis_results": analysis,
+            "created_at": datetime.utcnow().isoformat()
+        })
+    
+    return FastJSONResponse({
+        "success": True,
+        "analysis": analysis,
+        "language": language,
+        "code_hash": code_hash,
+        "regions": {"total": len(regions), "rescanned": rescanned}
+    })
+
+
+@app.post("/analyze-code/batch")
+@limiter.limit("10/minute")
+async def analyze_code_batch(request: Request, payload: BatchCodeAnalysisRequest):
+    """
+    Analyze many code items in one request using the process pool
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(payload.items)
+    analyzed: Dict[int, Tuple[CodeAnalysisRequest, str, Dict[str, Any]]] = {}
+    pending: List[Tuple[int, CodeAnalysisRequest, str, str]] = []
+    
+    # Validate, sanitize and check the cache for every item
+    for index, item in enumerate(payload.items):
+        if not isinstance(item, dict):
+            results[index] = {
+                "index": index,
+                "success": False,
+                "errors": [{"field": "item", "message": "Item must be a JSON object"}]
             }
-            save_to_supabase("code_analyses", save_data)
+            continue
+        try:
+            item_request = CodeAnalysisRequest(**item)
+        except ValidationError as e:
+            results[index] = {
+                "index": index,
+                "success": False,
+                "errors": [
+                    {"field": ".".join(str(part) for part in error["loc"]), "message": error["msg"]}
+                    for error in e.errors()
+                ]
+            }
+            continue
         
-        return {
+        sanitized_code = sanitize_input(item_request.code)
+        code_hash = hashlib.sha256(sanitized_code.encode()).hexdigest()
+        analysis = analysis_cache.get(f"{code_hash}-{item_request.language}")
+        if analysis is None:
+            pending.append((index, item_request, sanitized_code, code_hash))
+        else:
+            analyzed[index] = (item_request, code_hash, analysis)
+    
+    # Fan the cache misses out to the process pool
+    if pending:
+        analyses = await analyze_in_pool([(code, item_request.language) for _, item_request, code, _ in pending])
+        for (index, item_request, _, code_hash), analysis in zip(pending, analyses):
+            if isinstance(analysis, Exception):
+                results[index] = {
+                    "index": index,
+                    "success": False,
+                    "errors": [{"field": "code", "message": f"Analysis failed: {analysis}"}]
+                }
+                continue
+            analysis_cache.set(f"{code_hash}-{item_request.language}", analysis)
+            analyzed[index] = (item_request, code_hash, analysis)
+    
+    # Build per-item responses and aggregate totals
+    timestamp = datetime.utcnow().isoformat()
+    totals = {
+        "items": len(results),
+        "succeeded": len(analyzed),
+        "failed": len(results) - len(analyzed),
+        "lines_of_code": 0,
+        "loops": 0,
+        "nested_loops": 0,
+        "api_calls": 0,
+        "file_io_operations": 0,
+        "recursion_count": 0,
+        "db_queries": 0,
+        "co2_estimate_grams": 0.0,
+        "average_green_score": 0.0
+    }
+    
+    for index, (item_request, code_hash, analysis) in analyzed.items():
+        analysis = {**analysis, "timestamp": timestamp}
+        results[index] = {
+            "index": index,
             "success": True,
             "analysis": analysis,
-            "language": payload.language
+            "language": item_request.language
         }
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        for metric in BATCH_TOTAL_METRICS:
+            totals[metric] += analysis["metrics"][metric]
+        totals["co2_estimate_grams"] += analysis["co2_estimate_grams"]
+        totals["average_green_score"] += analysis["green_score"]
+        
+        if item_request.user_id and supabase_configured():
+            save_to_supabase("code_analyses", {
+                "user_id": item_request.user_id,
+                "language": item_request.language,
+                "code_hash": code_hash[:16],
+                "analysis_results": analysis,
+                "created_at": timestamp
+            })
+    
+    totals["co2_estimate_grams"] = round(totals["co2_estimate_grams"], 4)
+    if analyzed:
+        totals["average_green_score"] = round(totals["average_green_score"] / len(analyzed), 2)
+    
+    return FastJSONResponse({
+        "success": True,
+        "results": results,
+        "totals": totals
+    })
+
+
+@app.post("/analyze-code/stream")
+@limiter.limit("10/minute")
+async def analyze_code_stream(request: Request, language: str, user_id: Optional[str] = None):
+    """
+    Analyze a source file of any size, streamed either as a chunked text
+    body or as NDJSON records of {"code": "..."}. Metrics are updated chunk
+    by chunk, so memory use does not grow with the file.
+    """
+    language = language.lower()
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(status_code=422, detail=f'Language must be one of {SUPPORTED_LANGUAGES}')
+    
+    content_type = request.headers.get("content-type", "")
+    ndjson = content_type.startswith(("application/x-ndjson", "application/ndjson"))
+    
+    analyzer = StreamingCodeAnalyzer(language)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    code_hash = hashlib.sha256()
+    bytes_received = 0
+    pending_line = b""
+    # Tail of the previous chunk, so dangerous patterns split across
+    # chunks are still caught
+    overlap = ""
+    
+    def consume(text: str):
+        nonlocal overlap
+        window = overlap + text
+        if has_dangerous_pattern(window):
+            raise HTTPException(status_code=422, detail="Code contains potentially dangerous patterns")
+        overlap = window[-(len("__import__") - 1):]
+        code_hash.update(text.encode())
+        analyzer.feed(text)
+    
+    async for chunk in request.stream():
+        bytes_received += len(chunk)
+        if bytes_received > STREAM_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Code exceeds maximum stream size")
+        
+        if ndjson:
+            *lines, pending_line = (pending_line + chunk).split(b"\n")
+            if len(pending_line) > STREAM_MAX_LINE_LENGTH:
+                raise HTTPException(status_code=413, detail="NDJSON line exceeds maximum size")
+            for line in lines:
+                consume(parse_ndjson_code(line))
+        else:
+            consume(decoder.decode(chunk))
+    
+    consume(parse_ndjson_code(pending_line) if ndjson else decoder.decode(b"", final=True))
+    analysis = score_metrics(analyzer.finish())
+    
+    if user_id and supabase_configured():
+        save_to_supabase("code_analyses", {
+            "user_id": user_id,
+            "language": language,
+            "code_hash": code_hash.hexdigest()[:16],
+            "analysis_results": analysis,
+            "created_at": datetime.utcnow().isoformat()
+        })
+    
+    return FastJSONResponse({
+        "success": True,
+        "analysis": analysis,
+        "language": language,
+        "bytes_received": bytes_received
+    })
 
 
 @app.post("/analyze-github")
@@ -535,27 +1818,70 @@ async def analyze_github(request: Request, payload: GitHubAnalysisRequest):
     Analyze a GitHub repository
     """
     try:
-        analysis = await analyze_github_repo(payload.repo_url)
+        analysis = await analyze_github_repo(payload.repo_url, deep=payload.deep)
         
         # Save to database if user_id provided
-        if payload.user_id and supabase:
-            save_data = {
-                "user_id": payload.user_id,
-                "repo_url": payload.repo_url,
-                "analysis_results": analysis,
-                "created_at": datetime.utcnow().isoformat()
-            }
-            save_to_supabase("github_analyses", save_data)
+        save_github_analysis(payload.user_id, payload.repo_url, analysis)
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "analysis": analysis
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/analyze-github/org")
+@limiter.limit("2/minute")
+async def analyze_github_org(request: Request, payload: GitHubOrgScanRequest):
+    """
+    Analyze every repository of a GitHub organization or user, streamed as
+    NDJSON: one line per repository as soon as it is done, then a summary
+    """
+    owner = payload.owner
+    max_repos = min(payload.max_repos or ORG_SCAN_MAX_REPOS, ORG_SCAN_MAX_REPOS)
+    try:
+        status, first_page, listing_path = await list_owner_repos(owner, 1)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Could not list repositories: {e}")
+    if status == 404:
+        raise HTTPException(status_code=404, detail="Organization or user not found")
+    if status != 200 or not isinstance(first_page, list):
+        raise HTTPException(status_code=502, detail=f"Could not list repositories (GitHub status {status})")
+    
+    async def lines():
+        start = time.perf_counter()
+        counts = {"analyzed": 0, "failed": 0}
+        total_co2 = 0.0
+        async for repo_data, outcome in scan_owner_repos(owner, listing_path, first_page, payload.deep, max_repos):
+            if repo_data is None:
+                summary = {
+                    "type": "summary",
+                    "owner": owner,
+                    **counts,
+                    "total_co2_monthly_grams": round(total_co2, 4),
+                    "duration_seconds": round(time.perf_counter() - start, 3)
+                }
+                if outcome is not None:
+                    summary["error"] = f"Listing stopped early: {outcome}"
+                yield dumps(summary) + b"\n"
+                continue
+            
+            repo_url = f"https://github.com/{owner}/{repo_data['name']}"
+            if isinstance(outcome, Exception):
+                counts["failed"] += 1
+                error = str(outcome) or type(outcome).__name__
+                yield dumps({"type": "error", "repo_url": repo_url, "error": error}) + b"\n"
+            else:
+                counts["analyzed"] += 1
+                total_co2 += outcome["impact_estimate"]["total_co2_monthly_grams"]
+                save_github_analysis(payload.user_id, repo_url, outcome)
+                yield dumps({"type": "repo", "repo_url": repo_url, "analysis": outcome}) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @app.post("/ai-optimize")
 @limiter.limit("5/minute")
 async def ai_optimize(request: Request, payload: AIOptimizeRequest):
@@ -565,21 +1891,167 @@ async def ai_optimize(request: Request, payload: AIOptimizeRequest):
     try:
         sanitized_code = sanitize_input(payload.code)
         
-        optimization = await generate_ai_optimization(
+        optimization = await run_until_disconnected(request, generate_ai_optimization(
             sanitized_code,
             payload.language,
             payload.analysis_results
-        )
+        ))
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "optimization": optimization
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ai-optimize/stream")
+@limiter.limit("5/minute")
+async def ai_optimize_stream(request: Request, payload: AIOptimizeRequest):
+    """
+    AI optimization suggestions as server-sent events: "delta" events carry
+    the model's text as it arrives and "item" / "field" events each part of
+    the JSON answer once it is complete. The last event is "result", with
+    the same optimization object as /ai-optimize, or "error".
+    """
+    sanitized_code = sanitize_input(payload.code)
+    
+    def event(name: str, data: Dict[str, Any]) -> str:
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+    
+    async def events():
+        if not GEMINI_API_KEY:
+            yield event("result", await generate_ai_optimization(
+                sanitized_code, payload.language, payload.analysis_results
+            ))
+            return
+        
+        try:
+            prompt = build_optimization_prompt(sanitized_code, payload.language, payload.analysis_results)
+            prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+            result = ai_cache.get(prompt_hash)
+            if result is not None:
+                for field, value in (result.items() if isinstance(result, dict) else ()):
+                    yield event("field", {"field": field, "value": value})
+            else:
+                parser = StreamingJSONParser()
+                async for text in stream_gemini(prompt):
+                    if not parser.buffer:
+                        metrics.since("stage_duration_seconds", request.scope.get("metrics_start"),
+                                      "/ai-optimize/stream", "first_chunk")
+                    yield event("delta", {"text": text})
+                    for name, data in parser.feed(text):
+                        yield event(name, data)
+                # The final answer is parsed exactly as /ai-optimize parses it
+                result, parsed = parse_ai_response(parser.buffer)
+                if parsed:
+                    ai_cache.set(prompt_hash, result)
+        except asyncio.TimeoutError:
+            yield event("error", ai_optimization_error(f"AI optimization timed out after {GEMINI_TIMEOUT:g} seconds"))
+            return
+        except Exception as e:
+            yield event("error", ai_optimization_error(f"AI optimization failed: {str(e)}"))
+            return
+        
+        yield event("result", {"ai_analysis": result, "timestamp": datetime.utcnow().isoformat()})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/jobs/analyze-github")
+@limiter.limit("10/minute")
+async def submit_github_job(request: Request, payload: GitHubJobRequest):
+    """
+    Queue a GitHub analysis and return its job ID at once; poll
+    /jobs/{job_id} or subscribe to /jobs/{job_id}/events for the result
+    """
+    repo_url, deep = payload.repo_url, payload.deep
+    key = f"{repo_url.rstrip('/').lower()}|deep={deep}"
+    try:
+        job, deduplicated = job_queue.submit(
+            "analyze-github",
+            key,
+            lambda job: analyze_github_repo(repo_url, deep=deep, progress=job.report),
+            priority=JOB_PRIORITIES[payload.priority],
+            on_success=lambda analysis: save_github_analysis(payload.user_id, repo_url, analysis)
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}")
+    return job_accepted(job, deduplicated)
+
+
+@app.post("/jobs/ai-optimize")
+@limiter.limit("5/minute")
+async def submit_ai_job(request: Request, payload: AIOptimizeJobRequest):
+    """
+    Queue AI optimization suggestions and return the job ID at once
+    """
+    sanitized_code = sanitize_input(payload.code)
+    key = hashlib.sha256(json.dumps(
+        [sanitized_code, payload.language, payload.analysis_results], sort_keys=True, default=str
+    ).encode()).hexdigest()
+    
+    async def optimize(job):
+        job.report("waiting_for_model")
+        return await generate_ai_optimization(sanitized_code, payload.language, payload.analysis_results)
+    
+    try:
+        job, deduplicated = job_queue.submit(
+            "ai-optimize", key, optimize, priority=JOB_PRIORITIES[payload.priority]
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}")
+    return job_accepted(job, deduplicated)
+
+
+@app.get("/jobs/{job_id}")
+@limiter.limit("120/minute")
+async def get_job(request: Request, job_id: str):
+    """
+    Status, progress and (once finished) result or error of a job
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return FastJSONResponse(job.snapshot())
+
+
+@app.get("/jobs/{job_id}/events")
+@limiter.limit("30/minute")
+async def job_events(request: Request, job_id: str):
+    """
+    Server-sent events with the job's state on every change, ending once
+    it has finished
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    async def events():
+        async for snapshot in job.updates(heartbeat=JOB_EVENTS_HEARTBEAT):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.delete("/jobs/{job_id}")
+@limiter.limit("30/minute")
+async def cancel_job(request: Request, job_id: str):
+    """
+    Cancel a queued or running job
+    """
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return FastJSONResponse(job.snapshot())
+
+
 @app.post("/hosting-impact")
 @limiter.limit("30/minute")
 async def hosting_impact(request: Request, payload: HostingImpactRequest):
@@ -591,66 +2063,200 @@ async def hosting_impact(request: Request, payload: HostingImpactRequest):
             payload.provider,
             payload.region,
             payload.tier,
-            payload.monthly_requests
+            payload.monthly_requests,
+            payload.traffic_profile
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "impact": impact
-        }
+        })
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/hosting-impact/matrix")
+@limiter.limit("10/minute")
+async def hosting_impact_matrix_endpoint(request: Request, payload: HostingMatrixRequest):
+    """
+    Hosting carbon footprint for every provider x region x tier combination
+    """
+    try:
+        matrix = hosting_impact_matrix(
+            payload.monthly_requests,
+            providers=payload.providers,
+            regions=payload.regions,
+            tiers=payload.tiers,
+            sort_by=payload.sort_by
+        )
+        
+        return FastJSONResponse({
+            "success": True,
+            "matrix": matrix,
+            "timestamp": datetime.utcnow().isoformat()
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/hosting-impact/low-carbon-windows")
+@limiter.limit("30/minute")
+async def low_carbon_windows(request: Request, payload: LowCarbonWindowsRequest):
+    """
+    Lowest-carbon start times for a batch workload of a given duration,
+    from the region's hourly carbon intensity curve
+    """
+    curves = get_carbon_curves()
+    if curves is None:
+        raise HTTPException(status_code=503, detail="No hourly carbon intensity curves file is configured")
+    if payload.region not in curves:
+        raise HTTPException(status_code=404, detail=f"No hourly carbon intensity for region {payload.region}")
+    
+    earliest = payload.earliest_start or datetime.utcnow()
+    if earliest.tzinfo is not None:
+        earliest = earliest.astimezone(timezone.utc).replace(tzinfo=None)
+    # Windows start on the hour
+    start = earliest.replace(minute=0, second=0, microsecond=0)
+    if start < earliest:
+        start += timedelta(hours=1)
+    
+    windows, run_now = curves.low_carbon_windows(
+        payload.region, hour_of_year(start), payload.duration_hours, payload.horizon_hours, payload.count
+    )
+    
+    def window(offset: int, mean_intensity: float) -> Dict[str, Any]:
+        begins = start + timedelta(hours=offset)
+        result = {
+            "start": begins.isoformat(),
+            "end": (begins + timedelta(hours=payload.duration_hours)).isoformat(),
+            "average_intensity": round(mean_intensity, 2),
+            "savings_percent": round(100 * (1 - mean_intensity / run_now), 2) if run_now else 0.0
+        }
+        if payload.energy_kwh is not None:
+            result["co2_grams"] = round(payload.energy_kwh * mean_intensity, 2)
+        return result
+    
+    result = {
+        "success": True,
+        "region": payload.region,
+        "duration_hours": payload.duration_hours,
+        "horizon_hours": payload.horizon_hours,
+        "carbon_intensity_source": curves.source,
+        "run_now": window(0, run_now),
+        "windows": [window(offset, mean_intensity) for offset, mean_intensity in windows],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if curves.source == "modelled":
+        result["carbon_intensity_note"] = MODELLED_CURVES_NOTE
+    return FastJSONResponse(result)
+
+
 @app.get("/history/{user_id}")
 @limiter.limit("30/minute")
-async def get_history(request: Request, user_id: str):
+async def get_history(request: Request, user_id: str, limit: int = HISTORY_PAGE_SIZE, before: Optional[str] = None):
     """
-    Get analysis history for a user
+    Get analysis history for a user, newest first. Pass the returned
+    next_cursor as `before` to fetch the following page.
     """
-    if not supabase:
+    if not supabase_configured():
         raise HTTPException(status_code=503, detail="Database not configured")
     
+    cursor = None
+    if before:
+        match = HISTORY_CURSOR_PATTERN.match(before)
+        if not match:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        created_at, table, row_id = match.groups()
+        cursor = (created_at, table and f"{table}_analyses", row_id)
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    
+    page_key = f"{before or ''}|{limit}"
+    pages = history_cache.get(user_id) or {}
+    if page_key in pages:
+        return FastJSONResponse(pages[page_key])
+    inflight = history_inflight.setdefault(user_id, [0, 0])
+    inflight[0] += 1
+    writes = inflight[1]
+    
     try:
-        # Get code analyses
-        code_analyses = supabase.table("code_analyses")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .order("created_at", desc=True)\
-            .limit(20)\
-            .execute()
-        
-        # Get GitHub analyses
-        github_analyses = supabase.table("github_analyses")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .order("created_at", desc=True)\
-            .limit(20)\
-            .execute()
-        
-        return {
-            "success": True,
-            "code_analyses": code_analyses.data,
-            "github_analyses": github_analyses.data
-        }
-        
+        # One extra row per table tells us whether another page exists
+        code_rows, github_rows = await asyncio.gather(
+            asyncio.to_thread(fetch_history_rows, "code_analyses", user_id, cursor, limit + 1),
+            asyncio.to_thread(fetch_history_rows, "github_analyses", user_id, cursor, limit + 1)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        inflight[0] -= 1
+        if not inflight[0]:
+            del history_inflight[user_id]
+    stale = inflight[1] != writes
+    
+    # Both tables share one timeline so a single cursor pages them
+    rows = [("code_analyses", row) for row in code_rows] + [("github_analyses", row) for row in github_rows]
+    rows.sort(key=lambda item: history_sort_key(*item), reverse=True)
+    page = rows[:limit]
+    last_table, last_row = page[-1] if page else (None, None)
+    
+    result = {
+        "success": True,
+        "code_analyses": [history_item(table, row) for table, row in page if table == "code_analyses"],
+        "github_analyses": [history_item(table, row) for table, row in page if table == "github_analyses"],
+        "next_cursor": (
+            f'{last_row["created_at"]}~{HISTORY_CURSOR_NAMES[last_table]}~{last_row["id"]}'
+            if len(rows) > limit else None
+        )
+    }
+    
+    if not stale:
+        pages[page_key] = result
+        history_cache.set(user_id, pages)
+    return FastJSONResponse(result)
 
 
-@app.get("/health")
-async def health_check():
-    """Detailed health check"""
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics for this worker"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def health_status() -> Dict[str, Any]:
+    """The /health payload"""
     return {
         "status": "healthy",
-        "supabase": "configured" if supabase else "not configured",
+        "supabase": "configured" if supabase_configured() else "not configured",
         "gemini": "configured" if GEMINI_API_KEY else "not configured",
         "github": "configured" if GITHUB_TOKEN else "not configured",
+        "carbon_intensity": carbon_intensity_status(),
+        "analysis_cache": analysis_cache.stats(),
+        "document_cache": document_cache.stats(),
+        "ai_cache": {**ai_cache.stats(), **ai_single_flight.stats()},
+        "github_cache": github_cache.stats(),
+        "write_queue": write_queue.stats(),
+        "jobs": job_queue.stats(),
+        "history_cache": history_cache.stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+# (expires at, body) of the last /health response
+health_body: Tuple[float, bytes] = (0.0, b"")
+
+
+@app.get("/health")
+async def health_check():
+    """Detailed health check, rebuilt at most every HEALTH_CACHE_TTL seconds"""
+    global health_body
+    now = time.monotonic()
+    if health_body[0] <= now:
+        health_body = (now + HEALTH_CACHE_TTL, dumps(health_status()))
+    return Response(health_body[1], media_type="application/json")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,278 @@
+"""
+EcoCode metrics
+Low-overhead in-process counters and latency histograms in Prometheus text format
+"""
+
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Optional, Dict, Any, List, Tuple, Sequence
+
+# Upper bounds in seconds, sized for sub-millisecond hot-path stages up to
+# slow upstream calls
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+UPSTREAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                    30.0, 60.0)
+
+# (metric name, type, help, [(labels, value)]) as returned by collectors
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+class Histogram:
+    """Bucketed observations; counts[i] holds values in (buckets[i-1], buckets[i]]"""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(perf_counter() - self.start)
+        return False
+
+
+class _OutcomeTimer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = "ok" if exc_type is None else "error"
+        self.registry.observe(self.name, perf_counter() - self.start, *self.labels, outcome)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed by label values, rendered in the
+    Prometheus text exposition format.
+
+    Metric families are declared once with `counter()` / `histogram()`;
+    recording then costs a dict lookup and a short lock, so it can stay on
+    in production. Label values are passed positionally in declaration
+    order. Values are per process: with several workers each one reports
+    its own. `collectors` are called at render time for values that other
+    components already track (cache and queue stats).
+    """
+
+    def __init__(self, namespace: str = "ecocode", enabled: bool = True):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._families: Dict[str, Tuple[str, str, Tuple[str, ...], Tuple[float, ...]]] = {}
+        self._histograms: Dict[Tuple[str, Tuple[str, ...]], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self._collectors: List[Callable[[], List[Family]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self._families[name] = ("counter", help, tuple(labelnames), ())
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        self._families[name] = ("histogram", help, tuple(labelnames), tuple(buckets))
+
+    def add_collector(self, collector: Callable[[], List[Family]]):
+        self._collectors.append(collector)
+
+    def inc(self, name: str, *labels: str, amount: float = 1):
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, *labels: str):
+        if self.enabled:
+            self._histogram(name, labels).observe(value)
+
+    def time(self, name: str, *labels: str):
+        """Context manager observing the elapsed seconds of its block"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._histogram(name, labels))
+
+    def track(self, name: str, *labels: str):
+        """Like time(), with a final "ok" / "error" label from how the block exited"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _OutcomeTimer(self, name, labels)
+
+    def _histogram(self, name: str, labels: Tuple[str, ...]) -> Histogram:
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault((name, labels), Histogram(self._families[name][3]))
+        return histogram
+
+    def since(self, name: str, start: Optional[float], *labels: str):
+        """Observe the seconds elapsed since a perf_counter() reading, if there is one"""
+        if start is not None:
+            self.observe(name, perf_counter() - start, *labels)
+
+    def httpx_event_hooks(self, name: str, upstream: str) -> Dict[str, List[Callable[[Any], Any]]]:
+        """
+        Event hooks for an httpx.AsyncClient that observe the time to
+        response headers of every request (redirects included), labelled
+        with the upstream name and status class
+        """
+        async def on_request(request):
+            request.extensions["metrics_start"] = perf_counter()
+
+        async def on_response(response):
+            start = response.request.extensions.get("metrics_start")
+            if start is not None:
+                self.observe(name, perf_counter() - start, upstream, f"{response.status_code // 100}xx")
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+
+        lines: List[str] = []
+        for name, (kind, help, labelnames, _) in self._families.items():
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {help}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in counters:
+                    if metric == name:
+                        lines.append(f"{full_name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+
+            for (metric, labels), histogram in histograms:
+                if metric != name:
+                    continue
+                with histogram._lock:
+                    counts = list(histogram.counts)
+                    total = histogram.sum
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{full_name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}')
+                lines.append(f"{full_name}_sum{_format_labels(labelnames, labels)} {repr(total)}")
+                lines.append(f"{full_name}_count{_format_labels(labelnames, labels)} {cumulative}")
+
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                full_name = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {full_name} {help}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{full_name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests by method, route template and status
+    and observing their duration. Route templates (e.g. /history/{user_id})
+    keep label cardinality bounded; unrouted paths are labelled "unmatched".
+    The request start time is left in the scope under "metrics_start".
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, counter: str, histogram: str):
+        self.app = app
+        self.registry = registry
+        self.counter = counter
+        self.histogram = histogram
+        self._routes: Dict[Any, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        scope["metrics_start"] = start
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self._route(scope)
+            self.registry.inc(self.counter, scope["method"], route, str(status))
+            self.registry.observe(self.histogram, perf_counter() - start, scope["method"], route)
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            self._routes = {
+                getattr(r, "endpoint", None): r.path for r in getattr(app, "routes", ()) if hasattr(r, "path")
+            }
+            route = self._routes.get(endpoint, "unmatched")
+        return route
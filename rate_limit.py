@@ -0,0 +1,259 @@
+"""
+EcoCode rate limiting
+Token buckets shared by every worker process on a host through a memory-mapped file
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+from limits import RateLimitItem
+from limits.strategies import RateLimiter
+from limits.util import WindowStats
+from slowapi import Limiter
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are only shared between threads of one process
+    fcntl = None
+
+
+MAGIC = b"ECRL"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")  # magic, version, sets, ways
+HEADER_SIZE = 64
+
+# A slot is (key hash, time at which the bucket is full again); a key
+# hashes to one set of WAYS slots
+SLOT = struct.Struct("<Qd")
+WAYS = 8
+SET = struct.Struct("<" + "Qd" * WAYS)
+
+# Slack for float error in epoch-second arithmetic
+EPSILON = 1e-6
+
+
+@lru_cache(maxsize=8192)
+def _key_hash(key: str) -> int:
+    """Nonzero 64-bit hash of a limit key, the same in every process"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+def default_table_path() -> str:
+    """On tmpfs (/dev/shm) where available, so the table lives in shared memory"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "ecocode-ratelimit")
+
+
+class SharedTokenBuckets:
+    """
+    Fixed-size table of token buckets in a memory-mapped file; every
+    process that opens the same path shares the same buckets.
+
+    A bucket is stored as a single timestamp, the moment it will be full
+    again (GCRA), so taking a token is one read and one write. Only the
+    set of slots a key hashes to is locked (an fcntl record lock) while it
+    is updated, so workers contend only when their keys share a set. When
+    a set is full, the slot closest to refilled is reused; at worst that
+    gives an evicted key a fresh bucket.
+
+    The file is created and mapped by open(), or by the first bucket
+    operation if open() was not called.
+    """
+
+    def __init__(self, path: Optional[str] = None, slots: int = 65536):
+        self.path = path or default_table_path()
+        self.slots = slots
+        self.sets = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def open(self):
+        """Create or map the table file, if that has not happened yet"""
+        if self._map is not None:
+            return
+        with self._lock:
+            if self._map is not None:
+                return
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                self._lock_range(0, HEADER_SIZE)
+                try:
+                    table, self.sets = self._open_table(max(1, self.slots // WAYS))
+                finally:
+                    self._unlock_range(0, HEADER_SIZE)
+            except BaseException:
+                os.close(self._fd)
+                self._fd = None
+                raise
+            self._map = table
+
+    def _open_table(self, sets: int) -> Tuple[mmap.mmap, int]:
+        """Create the table, or map the existing one (whose size wins)"""
+        if os.fstat(self._fd).st_size == 0:
+            os.ftruncate(self._fd, HEADER_SIZE + sets * SET.size)
+            table = mmap.mmap(self._fd, HEADER_SIZE + sets * SET.size)
+            HEADER.pack_into(table, 0, MAGIC, VERSION, sets, WAYS)
+            return table, sets
+
+        header = mmap.mmap(self._fd, HEADER_SIZE)
+        try:
+            magic, version, sets, ways = HEADER.unpack_from(header, 0)
+        finally:
+            header.close()
+        if magic != MAGIC or version != VERSION or ways != WAYS:
+            raise ValueError(f"{self.path} is not an EcoCode rate limit table")
+        return mmap.mmap(self._fd, HEADER_SIZE + sets * SET.size), sets
+
+    def acquire(self, key: str, limit: int, period: float, cost: int = 1) -> Tuple[bool, int, float]:
+        """
+        Take `cost` tokens from the bucket for `key`, which holds `limit`
+        tokens and refills completely over `period` seconds (cost 0 only
+        inspects it). Returns (allowed, tokens left, epoch seconds at
+        which the next token is available).
+        """
+        interval = period / limit
+        self.open()
+        key_hash, offset = self._locate(key)
+
+        with self._lock:
+            self._lock_range(offset, SET.size)
+            try:
+                now = time.time()
+                way, full_at = self._find(SET.unpack_from(self._map, offset), key_hash, now)
+                # Time the bucket needs to refill, after taking this request's tokens
+                new_full_at = max(full_at, now) + interval * cost
+                allowed = new_full_at - now <= period + EPSILON
+                if allowed and cost:
+                    SLOT.pack_into(self._map, offset + way * SLOT.size, key_hash, new_full_at)
+                    full_at = new_full_at
+            finally:
+                self._unlock_range(offset, SET.size)
+
+        debt = max(full_at, now) - now
+        remaining = max(0, int((period - debt + EPSILON) / interval))
+        next_token = now if remaining else now + debt - period + interval
+        return allowed, remaining, next_token
+
+    def forget(self, key: str):
+        """Refill the bucket for key"""
+        self.open()
+        key_hash, offset = self._locate(key)
+        with self._lock:
+            self._lock_range(offset, SET.size)
+            try:
+                values = SET.unpack_from(self._map, offset)
+                for way in range(WAYS):
+                    if values[2 * way] == key_hash:
+                        SLOT.pack_into(self._map, offset + way * SLOT.size, 0, 0.0)
+            finally:
+                self._unlock_range(offset, SET.size)
+
+    def clear(self):
+        """Refill every bucket"""
+        self.open()
+        with self._lock:
+            self._lock_range(HEADER_SIZE, self.sets * SET.size)
+            try:
+                self._map[HEADER_SIZE:] = bytes(self.sets * SET.size)
+            finally:
+                self._unlock_range(HEADER_SIZE, self.sets * SET.size)
+
+    def close(self):
+        """Unmap and close the table; the file stays for the other workers"""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                os.close(self._fd)
+                self._map = self._fd = None
+
+    def _locate(self, key: str) -> Tuple[int, int]:
+        """Hash of key and the byte offset of its set"""
+        key_hash = _key_hash(key)
+        return key_hash, HEADER_SIZE + (key_hash % self.sets) * SET.size
+
+    def _find(self, values: Tuple, key_hash: int, now: float) -> Tuple[int, float]:
+        """Slot holding key_hash, else the one to reuse (empty slots read as full buckets)"""
+        hashes = values[0::2]
+        if key_hash in hashes:
+            way = hashes.index(key_hash)
+            return way, values[2 * way + 1]
+        full_at = values[1::2]
+        victim = full_at.index(min(full_at))
+        if full_at[victim] > now:
+            self.evictions += 1
+        return victim, 0.0
+
+    def _lock_range(self, start: int, length: int):
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start, os.SEEK_SET)
+
+    def _unlock_range(self, start: int, length: int):
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start, os.SEEK_SET)
+
+
+class TokenBucketRateLimiter(RateLimiter):
+    """
+    `limits` strategy over SharedTokenBuckets: "20/minute" is a bucket of
+    20 tokens that refills over a minute, so bursts up to the limit are
+    allowed and tokens come back steadily instead of at a window edge
+    """
+
+    def __init__(self, storage, buckets: SharedTokenBuckets):
+        super().__init__(storage)
+        self.buckets = buckets
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return self.buckets.acquire(item.key_for(*identifiers), item.amount, item.get_expiry(), cost)[0]
+
+    def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return self.buckets.acquire(item.key_for(*identifiers), item.amount, item.get_expiry(), 0)[1] >= cost
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        _, remaining, next_token = self.buckets.acquire(item.key_for(*identifiers), item.amount, item.get_expiry(), 0)
+        return WindowStats(int(next_token), remaining)
+
+    def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        self.buckets.forget(item.key_for(*identifiers))
+
+
+class SharedLimiter(Limiter):
+    """slowapi Limiter whose limits are token buckets shared across worker processes"""
+
+    def __init__(self, key_func: Callable[..., str], buckets: SharedTokenBuckets, **kwargs):
+        super().__init__(key_func=key_func, **kwargs)
+        self.buckets = buckets
+        self._limiter = TokenBucketRateLimiter(self._storage, buckets)
+
+    def open(self):
+        self.buckets.open()
+
+    def close(self):
+        self.buckets.close()
+
+    def reset(self):
+        self.buckets.clear()
+        super().reset()
+
+
+def create_limiter(key_func: Callable[..., str], backend: str = "shared", path: Optional[str] = None, slots: int = 65536) -> Limiter:
+    """
+    Limiter for the app: "shared" (token buckets shared by all workers on
+    the host) or "memory" (slowapi's per-process fixed windows). The shared
+    table file is not touched until SharedLimiter.open() or the first
+    request.
+    """
+    if backend == "memory":
+        return Limiter(key_func=key_func)
+    if backend != "shared":
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    return SharedLimiter(key_func, SharedTokenBuckets(path, slots))
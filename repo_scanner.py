@@ -0,0 +1,324 @@
+"""
+EcoCode repository scanner
+Deep analysis of a repository tarball, decompressed as a stream
+"""
+
+import asyncio
+import io
+import queue
+import tarfile
+import threading
+import zlib
+from concurrent.futures import Executor, Future
+from typing import AsyncIterator, Callable, Optional, Dict, Any, List, Tuple
+
+from code_metrics import calculate_code_metrics_batch
+
+
+# Source files analyzed in deep mode, routed by extension
+EXTENSION_LANGUAGES = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.mjs': 'javascript',
+    '.cjs': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.java': 'java',
+    '.c': 'cpp',
+    '.h': 'cpp',
+    '.cc': 'cpp',
+    '.cpp': 'cpp',
+    '.cxx': 'cpp',
+    '.hpp': 'cpp',
+}
+
+SUMMED_METRICS = (
+    "lines_of_code", "loops", "nested_loops", "api_calls",
+    "file_io_operations", "recursion_count", "db_queries"
+)
+
+# Files sent to a pool worker per task
+BATCH_FILES = 32
+BATCH_BYTES = 512 * 1024
+
+
+def language_for_path(path: str) -> Optional[str]:
+    """Language of a source file from its extension, or None to skip it"""
+    dot = path.rfind('.')
+    if dot <= path.rfind('/'):
+        return None
+    return EXTENSION_LANGUAGES.get(path[dot:].lower())
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    Blocking file object over byte chunks pushed from the event loop, so
+    tarfile can decompress a download while it is still arriving. The
+    bounded queue applies back-pressure to the download: put() waits on
+    the loop, never in a thread, while the queue is full.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int = 16):
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(max_chunks)
+        self._chunk = memoryview(b'')
+        self._eof = False
+        self._loop = loop
+        self._space = asyncio.Event()
+        self.stopped = threading.Event()
+        self.truncated = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk and not self._eof:
+            try:
+                chunk = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    raise EOFError("Download was abandoned")
+                continue
+            self._wake()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._chunk = memoryview(chunk)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    async def put(self, chunk: Optional[bytes]) -> bool:
+        """Queue a chunk (None for end of data); False once the reader has stopped"""
+        while not self.stopped.is_set():
+            try:
+                self._queue.put_nowait(chunk)
+                return True
+            except queue.Full:
+                self._space.clear()
+                # The reader may have taken a chunk since put_nowait failed
+                if self._queue.full() and not self.stopped.is_set():
+                    await self._space.wait()
+        return False
+
+    def stop(self):
+        self.stopped.set()
+        self._wake()
+
+    def _wake(self):
+        """Tell a put() waiting on the event loop that there is room (or that reading stopped)"""
+        try:
+            self._loop.call_soon_threadsafe(self._space.set)
+        except RuntimeError:  # the loop has closed; nobody is waiting
+            pass
+
+
+def _start_thread(function: Callable[..., Any], *args) -> "asyncio.Future[Any]":
+    """
+    Run function(*args) on a new daemon thread. The archive reader blocks
+    until data arrives, so it must not hold a shared executor thread that
+    the rest of the app (or the download feeding it) is waiting for.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result: Any, error: Optional[BaseException]):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run():
+        try:
+            result, error = function(*args), None
+        except BaseException as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, result, error)
+        except RuntimeError:  # the loop has closed
+            pass
+
+    threading.Thread(target=run, name="tarball-reader", daemon=True).start()
+    return future
+
+
+def _read_archive(
+    reader: _ChunkReader,
+    executor: Optional[Executor],
+    max_files: int,
+    max_bytes: int,
+    max_file_bytes: int
+) -> Dict[str, Any]:
+    """
+    Walk the tar stream in a worker thread, submitting batches of source
+    files to the executor as they are decompressed
+    """
+    summary = {"files_skipped": 0, "bytes_analyzed": 0, "truncated": None, "batches": []}
+    batch: List[Tuple[str, str, int, str]] = []
+    batch_bytes = 0
+    files = 0
+
+    def flush():
+        nonlocal batch, batch_bytes
+        if not batch:
+            return
+        items = [(code, language) for _, language, _, code in batch]
+        if executor is None:
+            future: Future = Future()
+            future.set_result(calculate_code_metrics_batch(items))
+        else:
+            future = executor.submit(calculate_code_metrics_batch, items)
+        summary["batches"].append(([(path, language, size) for path, language, size, _ in batch], future))
+        batch, batch_bytes = [], 0
+
+    try:
+        with tarfile.open(fileobj=reader, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                # Tarballs from GitHub wrap everything in "<owner>-<repo>-<sha>/"
+                path = member.name.split('/', 1)[-1]
+                language = language_for_path(path)
+                if language is None:
+                    continue
+                if member.size > max_file_bytes:
+                    summary["files_skipped"] += 1
+                    continue
+                if files >= max_files:
+                    summary["truncated"] = "max_files"
+                    break
+                if summary["bytes_analyzed"] + member.size > max_bytes:
+                    summary["truncated"] = "max_bytes"
+                    break
+
+                code = archive.extractfile(member).read().decode('utf-8', errors='replace')
+                files += 1
+                summary["bytes_analyzed"] += member.size
+                batch.append((path, language, member.size, code))
+                batch_bytes += member.size
+                if len(batch) >= BATCH_FILES or batch_bytes >= BATCH_BYTES:
+                    flush()
+    except (tarfile.TarError, EOFError, zlib.error, OSError):
+        # A download cut short at the byte limit ends mid-archive
+        if reader.truncated:
+            summary["truncated"] = "max_download_bytes"
+        elif not summary["truncated"]:
+            raise ValueError("Repository archive is not a valid tarball")
+    finally:
+        reader.stop()
+
+    flush()
+    return summary
+
+
+def _aggregate(summary: Dict[str, Any], results: List[Tuple[Tuple[str, str, int], Any]]) -> Dict[str, Any]:
+    """Per-file results plus per-language and overall aggregates"""
+    files = []
+    languages: Dict[str, Dict[str, Any]] = {}
+    failed = 0
+
+    for (path, language, size), analysis in results:
+        if isinstance(analysis, Exception):
+            failed += 1
+            continue
+        files.append({
+            "path": path,
+            "language": language,
+            "bytes": size,
+            "metrics": analysis["metrics"],
+            "green_score": analysis["green_score"],
+            "co2_estimate_grams": analysis["co2_estimate_grams"],
+            "rating": analysis["rating"]
+        })
+
+        totals = languages.setdefault(language, {
+            "files": 0,
+            "bytes": 0,
+            **{metric: 0 for metric in SUMMED_METRICS},
+            "co2_estimate_grams": 0.0,
+            "average_green_score": 0.0
+        })
+        totals["files"] += 1
+        totals["bytes"] += size
+        for metric in SUMMED_METRICS:
+            totals[metric] += analysis["metrics"][metric]
+        totals["co2_estimate_grams"] += analysis["co2_estimate_grams"]
+        totals["average_green_score"] += analysis["green_score"]
+
+    for totals in languages.values():
+        totals["co2_estimate_grams"] = round(totals["co2_estimate_grams"], 4)
+        totals["average_green_score"] = round(totals["average_green_score"] / totals["files"], 2)
+
+    return {
+        "files_analyzed": len(files),
+        "files_failed": failed,
+        "files_skipped": summary["files_skipped"],
+        "bytes_analyzed": summary["bytes_analyzed"],
+        "truncated": summary["truncated"],
+        "total_co2_estimate_grams": round(sum(f["co2_estimate_grams"] for f in files), 4),
+        "languages": languages,
+        "files": files
+    }
+
+
+async def analyze_tarball_stream(
+    chunks: AsyncIterator[bytes],
+    executor: Optional[Executor] = None,
+    max_files: int = 2000,
+    max_bytes: int = 50 * 1024 * 1024,
+    max_file_bytes: int = 1024 * 1024,
+    max_download_bytes: int = 200 * 1024 * 1024,
+    progress: Optional[Callable[[int], Any]] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Analyze every source file in a (gzip/bz2/xz) tarball delivered as an
+    async stream of bytes. Nothing is written to disk: the archive is
+    decompressed on a dedicated thread as it downloads and files are
+    analyzed on the executor (inline if None). Stops at the file, byte and
+    download limits and reports which one was hit in "truncated". progress,
+    if given, is called with the bytes downloaded so far after each chunk.
+    Raises asyncio.TimeoutError if download and decompression together
+    take longer than timeout seconds.
+    """
+    reader = _ChunkReader(asyncio.get_running_loop())
+
+    async def download():
+        received = 0
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_download_bytes:
+                # Decompress what fits under the limit, then stop downloading
+                reader.truncated = True
+                await reader.put(chunk[:len(chunk) - (received - max_download_bytes)])
+                break
+            if not await reader.put(chunk):
+                return
+            if progress is not None:
+                progress(received)
+        await reader.put(None)
+
+    async def read():
+        await download()
+        return await asyncio.shield(read_task)
+
+    read_task = _start_thread(_read_archive, reader, executor, max_files, max_bytes, max_file_bytes)
+    try:
+        summary = await asyncio.wait_for(read(), timeout)
+    except BaseException:
+        reader.stop()
+        await asyncio.gather(read_task, return_exceptions=True)
+        raise
+
+    results = []
+    for batch_files, future in summary["batches"]:
+        try:
+            analyses = await asyncio.wrap_future(future)
+        except Exception as e:
+            analyses = [e] * len(batch_files)
+        results.extend(zip(batch_files, analyses))
+
+    return _aggregate(summary, results)
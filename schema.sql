@@ -26,6 +26,8 @@ CREATE TABLE IF NOT EXISTS code_analyses (
 -- Create index for faster queries
 CREATE INDEX IF NOT EXISTS idx_code_analyses_user_id ON code_analyses(user_id);
 CREATE INDEX IF NOT EXISTS idx_code_analyses_created_at ON code_analyses(created_at DESC);
+-- Keyset pagination of /history: (created_at, id) after a user's cursor
+CREATE INDEX IF NOT EXISTS idx_code_analyses_user_created_id ON code_analyses(user_id, created_at DESC, id DESC);
 
 -- GitHub repository analyses table
 CREATE TABLE IF NOT EXISTS github_analyses (
@@ -39,6 +41,8 @@ CREATE TABLE IF NOT EXISTS github_analyses (
 -- Create index for faster queries
 CREATE INDEX IF NOT EXISTS idx_github_analyses_user_id ON github_analyses(user_id);
 CREATE INDEX IF NOT EXISTS idx_github_analyses_created_at ON github_analyses(created_at DESC);
+-- Keyset pagination of /history: (created_at, id) after a user's cursor
+CREATE INDEX IF NOT EXISTS idx_github_analyses_user_created_id ON github_analyses(user_id, created_at DESC, id DESC);
 
 -- Hosting impact calculations table
 CREATE TABLE IF NOT EXISTS hosting_calculations (
@@ -0,0 +1,90 @@
+"""
+EcoCode unified diffs
+Applies `diff -u` / `git diff` style patches to source text
+"""
+
+import re
+from typing import List
+
+HUNK_HEADER = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+NO_NEWLINE_MARKER = '\\'
+
+
+class DiffError(ValueError):
+    """The diff is malformed or does not match the text it is applied to"""
+
+
+def _lines(text: str) -> List[str]:
+    """Lines split on \\n only, each keeping its line ending"""
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _same_line(a: str, b: str) -> bool:
+    """Equal apart from the line ending, so LF diffs apply to CRLF files"""
+    return a.rstrip('\r\n') == b.rstrip('\r\n')
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """
+    Apply the hunks of a unified diff to text. Lines outside hunks (file
+    headers, git metadata) are ignored; context and removed lines must
+    match text. Hunks must be in order and may have any amount of context.
+    """
+    old = _lines(text)
+    diff_lines = _lines(diff)
+    result: List[str] = []
+    position = 0  # next line of old to copy
+    i = 0
+
+    while i < len(diff_lines):
+        header = HUNK_HEADER.match(diff_lines[i])
+        i += 1
+        if header is None:
+            continue
+
+        old_start, old_count, _, new_count = (
+            int(value) if value is not None else 1 for value in header.groups()
+        )
+        # A hunk that removes nothing starts after line old_start
+        target = old_start if old_count == 0 else old_start - 1
+        if target < position or target > len(old):
+            raise DiffError(f"Hunk {header.group(0)} is out of order or past the end of the code")
+        result.extend(old[position:target])
+        position = target
+
+        old_seen = new_seen = 0
+        while old_seen < old_count or new_seen < new_count:
+            if i >= len(diff_lines):
+                raise DiffError(f"Hunk {header.group(0)} is truncated")
+            line = diff_lines[i]
+            i += 1
+            kind, content = (line[0], line[1:]) if line not in ('\n', '\r\n') else (' ', line)
+            if kind == NO_NEWLINE_MARKER:
+                continue
+            if kind in ' -':
+                if position >= len(old) or not _same_line(old[position], content):
+                    raise DiffError(f"Line {position + 1} does not match the diff")
+                if kind == ' ':
+                    result.append(old[position])
+                    new_seen += 1
+                position += 1
+                old_seen += 1
+            elif kind == '+':
+                if i < len(diff_lines) and diff_lines[i].startswith(NO_NEWLINE_MARKER):
+                    content = content.rstrip('\r\n')
+                elif not content.endswith('\n'):
+                    content += '\n'  # diff text without a final newline
+                result.append(content)
+                new_seen += 1
+            else:
+                raise DiffError(f"Unexpected line in hunk {header.group(0)}: {line[:40]!r}")
+
+        if old_seen != old_count or new_seen != new_count:
+            raise DiffError(f"Hunk {header.group(0)} line counts do not match its body")
+
+    result.extend(old[position:])
+    return ''.join(result)
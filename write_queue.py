@@ -0,0 +1,146 @@
+"""
+EcoCode write-behind persistence
+Bounded queue that batches analysis records into bulk inserts off the request path
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+
+class WriteBehindQueue:
+    """
+    Accepts records without blocking and writes them in bulk.
+
+    Records are buffered per table and flushed when `batch_size` records
+    are waiting or `flush_interval` seconds have passed. `insert(table,
+    rows)` is a blocking call (e.g. a Supabase bulk insert) and runs in a
+    thread. Failed inserts are retried with exponential backoff up to
+    `max_retries` times before the batch is dropped. Once `max_size`
+    records are waiting, new records are rejected rather than queued.
+    `on_written(table, rows)` is called after each successful insert; if
+    it raises, the rows are not inserted again.
+    """
+
+    def __init__(
+        self,
+        insert: Callable[[str, List[Dict[str, Any]]], Any],
+        max_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        on_written: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None
+    ):
+        self.insert = insert
+        self.on_written = on_written
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._pending: "deque[Tuple[str, Dict[str, Any]]]" = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.counters = {
+            "enqueued": 0, "written": 0, "rejected": 0, "failed": 0, "retries": 0, "flushes": 0, "hook_errors": 0
+        }
+        self.flush_ms_total = 0.0
+        self.flush_ms_max = 0.0
+        self.last_flush_ms = 0.0
+
+    def put(self, table: str, record: Dict[str, Any]) -> bool:
+        """Queue a record for `table`; False if the queue is full or closed"""
+        if self._closing or len(self._pending) >= self.max_size:
+            self.counters["rejected"] += 1
+            return False
+        self._ensure_started()
+        self._pending.append((table, record))
+        self.counters["enqueued"] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop accepting records and flush everything still queued (up to timeout seconds)"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._task = None
+            self._closing = False
+
+    def stats(self) -> Dict[str, Any]:
+        flushes = self.counters["flushes"]
+        return {
+            "depth": len(self._pending),
+            "max_size": self.max_size,
+            **self.counters,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.flush_ms_total / flushes, 2) if flushes else 0.0,
+            "max_flush_ms": round(self.flush_ms_max, 2)
+        }
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                await self._flush()
+                if not self._closing and len(self._pending) < self.batch_size:
+                    break
+            if self._closing and not self._pending:
+                return
+
+    def _written(self, table: str, rows: List[Dict[str, Any]]):
+        """Run the on_written hook; the rows are stored, so its failure never retries them"""
+        if self.on_written is None:
+            return
+        try:
+            self.on_written(table, rows)
+        except Exception:
+            self.counters["hook_errors"] += 1
+
+    async def _flush(self):
+        """Write up to batch_size queued records, one bulk insert per table"""
+        batches: Dict[str, List[Dict[str, Any]]] = {}
+        for _ in range(min(self.batch_size, len(self._pending))):
+            table, record = self._pending.popleft()
+            batches.setdefault(table, []).append(record)
+
+        start = time.perf_counter()
+        for table, rows in batches.items():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await asyncio.to_thread(self.insert, table, rows)
+                except Exception:
+                    if attempt == self.max_retries:
+                        self.counters["failed"] += len(rows)
+                        break
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                    continue
+                self.counters["written"] += len(rows)
+                self._written(table, rows)
+                break
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.counters["flushes"] += 1
+        self.last_flush_ms = elapsed
+        self.flush_ms_total += elapsed
+        self.flush_ms_max = max(self.flush_ms_max, elapsed)